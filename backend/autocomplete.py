@@ -0,0 +1,201 @@
+"""
+Otomatik Tamamlama (Typeahead)
+- Bellek içi sıralı diziler + bisect ile önek araması (DB sorgusu yok)
+- Türler: kullanıcı isimleri, meslekler, beceriler, şehirler
+- Profil güncellemelerinde artımlı güncellenir; periyodik tam yenileme
+  diğer worker'lardaki değişiklikleri de yansıtır
+"""
+
+import bisect
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from user_search import fold_turkish
+
+AUTOCOMPLETE_KINDS = ("users", "occupations", "skills", "cities")
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+AUTOCOMPLETE_USER_PROJECTION = {"uid": 1, "firstName": 1, "lastName": 1, "occupation": 1,
+                                "skills": 1, "profileImageUrl": 1, "city": 1}
+
+
+class CountedPrefixIndex:
+    """Değer -> kullanım sayısı; sonuçlar popülerliğe göre sıralanır (meslek, beceri, şehir)"""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._entries: Dict[str, dict] = {}
+
+    def add(self, value: Optional[str], count: int = 1, permanent: bool = False):
+        """permanent=True olan değerler sayı sıfıra düşse de silinmez (ör. 81 il)"""
+        if not value or not value.strip():
+            return
+        key = fold_turkish(value).strip()
+        entry = self._entries.get(key)
+        if entry:
+            entry["count"] += count
+            entry["permanent"] = entry["permanent"] or permanent
+            return
+        self._entries[key] = {"value": value.strip(), "count": count, "permanent": permanent}
+        bisect.insort(self._keys, key)
+
+    def remove(self, value: Optional[str], count: int = 1):
+        if not value or not value.strip():
+            return
+        key = fold_turkish(value).strip()
+        entry = self._entries.get(key)
+        if not entry:
+            return
+        entry["count"] -= count
+        if entry["count"] <= 0 and not entry["permanent"]:
+            del self._entries[key]
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                self._keys.pop(index)
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        """Önek aralığının tamamı sayıya göre sıralanır (alfabetik ilk N değil)"""
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\uffff", start)
+        top = heapq.nlargest(
+            limit, (self._entries[self._keys[i]] for i in range(start, end)), key=lambda e: e["count"]
+        )
+        return [{"value": e["value"], "count": e["count"]} for e in top]
+
+
+class UserPrefixIndex:
+    """Kullanıcı isimleri: hem 'ad soyad' hem de 'soyad' önekleriyle bulunur"""
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        self._users: Dict[str, dict] = {}
+
+    @staticmethod
+    def _name_keys(user: dict) -> List[str]:
+        full_name = fold_turkish(f"{user.get('firstName') or ''} {user.get('lastName') or ''}").split()
+        return [" ".join(full_name[i:]) for i in range(len(full_name))]
+
+    def upsert(self, user: dict, keep_sorted: bool = True):
+        """keep_sorted=False toplu yüklemede kullanılır; sonunda finalize() çağrılmalı"""
+        uid = user.get('uid')
+        if not uid:
+            return
+        if keep_sorted:
+            self.remove(uid)
+        keys = self._name_keys(user)
+        if not keys:
+            return
+        image = user.get('profileImageUrl')
+        self._users[uid] = {
+            "uid": uid,
+            "name": f"{user.get('firstName') or ''} {user.get('lastName') or ''}".strip(),
+            "occupation": user.get('occupation') or '',
+            # base64 (data:) görseller bellekte tutulmaz; istemci profilden alır
+            "profileImageUrl": image if image and not image.startswith('data:') else None,
+            "keys": keys,
+        }
+        for key in keys:
+            if keep_sorted:
+                bisect.insort(self._keys, (key, uid))
+            else:
+                self._keys.append((key, uid))
+
+    def finalize(self):
+        self._keys.sort()
+
+    def remove(self, uid: str):
+        existing = self._users.pop(uid, None)
+        if not existing:
+            return
+        for key in existing["keys"]:
+            index = bisect.bisect_left(self._keys, (key, uid))
+            if index < len(self._keys) and self._keys[index] == (key, uid):
+                self._keys.pop(index)
+
+    def search(self, prefix: str, limit: int, exclude_uid: Optional[str] = None) -> List[dict]:
+        start = bisect.bisect_left(self._keys, (prefix, ""))
+        results = []
+        seen = set()
+        # Dilim kopyası yok: bisect konumundan önek bitene kadar indeksle yürü
+        for index in range(start, len(self._keys)):
+            key, uid = self._keys[index]
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            if uid in seen or uid == exclude_uid:
+                continue
+            seen.add(uid)
+            user = self._users[uid]
+            results.append({k: user[k] for k in ("uid", "name", "occupation", "profileImageUrl")})
+        return results
+
+
+class AutocompleteIndex:
+    """Tüm otomatik tamamlama türlerini bir arada tutar"""
+
+    def __init__(self, cities: List[str]):
+        self.cities = cities
+        self._reset()
+
+    def _reset(self):
+        self.users = UserPrefixIndex()
+        self.occupations = CountedPrefixIndex()
+        self.skills = CountedPrefixIndex()
+        self.city_index = CountedPrefixIndex()
+        for city in self.cities:
+            self.city_index.add(city, 0, permanent=True)
+        self.ready = False
+
+    def add_user(self, user: dict, keep_sorted: bool = True):
+        self.users.upsert(user, keep_sorted)
+        self.occupations.add(user.get('occupation'))
+        self.city_index.add(user.get('city'))
+        for skill in set(user.get('skills') or []):
+            self.skills.add(skill)
+
+    def _remove_counts(self, user: dict):
+        self.occupations.remove(user.get('occupation'))
+        self.city_index.remove(user.get('city'))
+        for skill in set(user.get('skills') or []):
+            self.skills.remove(skill)
+
+    def update_user(self, previous: Optional[dict], current: dict):
+        """Profil güncellemesinde eski değerleri düş, yenilerini ekle"""
+        if previous:
+            self._remove_counts(previous)
+        self.add_user(current)
+
+    def remove_user(self, user: dict):
+        """Yasaklanan kullanıcı: isim ve meslek / beceri / şehir sayıları düşer"""
+        self.users.remove(user.get('uid'))
+        self._remove_counts(user)
+
+    async def rebuild(self, db):
+        """Kullanıcı koleksiyonundan baştan oluştur (açılışta ve periyodik)"""
+        fresh = AutocompleteIndex(self.cities)
+        cursor = db.users.find({"isBanned": {"$ne": True}}, {"_id": 0, **AUTOCOMPLETE_USER_PROJECTION})
+        async for user in cursor:
+            fresh.add_user(user, keep_sorted=False)
+        fresh.users.finalize()
+        self.users, self.occupations, self.skills, self.city_index = (
+            fresh.users, fresh.occupations, fresh.skills, fresh.city_index
+        )
+        self.ready = True
+
+    def search(self, q: str, kind: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+               exclude_uid: Optional[str] = None) -> Dict[str, List[dict]]:
+        prefix = fold_turkish(q).strip()
+        limit = max(1, min(limit, MAX_LIMIT))
+        kinds = [kind] if kind in AUTOCOMPLETE_KINDS else list(AUTOCOMPLETE_KINDS)
+        results = {}
+        if not prefix:
+            return {k: [] for k in kinds}
+        for k in kinds:
+            if k == "users":
+                results[k] = self.users.search(prefix, limit, exclude_uid)
+            elif k == "occupations":
+                results[k] = self.occupations.search(prefix, limit)
+            elif k == "skills":
+                results[k] = self.skills.search(prefix, limit)
+            elif k == "cities":
+                results[k] = self.city_index.search(prefix, limit)
+        return results
@@ -0,0 +1,307 @@
+"""
+Toplu Duyuru Motoru (admin broadcast)
+- İstek yolu sadece iş kaydını (broadcast_jobs) oluşturur; gönderim arka planda yürür
+- Hedef gruplar ve toplulukları iki $in sorgusuyla çözülür; mesajlar tek insert_many
+  ile yazılır, topluluk duyuru kanalına broadcast başına tek mesaj gider
+- Socket yayınları sınırlı eşzamanlılıkla (Semaphore) paralel gönderilir
+- Push bildirimi hedef grupların üyelerine kullanıcı başına tek kez gider
+- İlerleme iş kaydında tutulur: GET /admin/broadcast-jobs/{id} ile izlenir
+- İş süreç içi görevdir; worker yeniden başlarsa yarım kalan iş, ilerlemesi
+  BROADCAST_STALE_SECONDS boyunca güncellenmeyince 'failed' olarak kapatılır
+  ve geçmişe yazılır (mesajlar başta yazıldığı için kısmen gönderilmiş olabilir)
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+import notification_store
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_EMIT_CONCURRENCY = 20
+BROADCAST_PROGRESS_EVERY = 50
+BROADCAST_USER_BATCH = 1000
+# Tamamlanan iş kayıtları bir hafta saklanır
+BROADCAST_JOB_TTL_SECONDS = 7 * 24 * 3600
+# Bu süre boyunca ilerlemesi güncellenmeyen kuyruktaki / çalışan iş yarım kalmış sayılır
+BROADCAST_STALE_SECONDS = 600
+BROADCAST_REAPER_INTERVAL_SECONDS = 300
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def _push_token(user: dict) -> Optional[str]:
+    return user.get('expoPushToken') or user.get('pushToken')
+
+
+class BroadcastEngine:
+    def __init__(self, db, room_events, send_batch: Callable[[List[dict]], Awaitable[None]], stats_counters,
+                 concurrency: int = BROADCAST_EMIT_CONCURRENCY):
+        self.db = db
+        self.room_events = room_events
+        self.send_batch = send_batch
+        self.stats_counters = stats_counters
+        self.concurrency = concurrency
+        self._tasks = set()
+
+    @property
+    def jobs(self):
+        return self.db.broadcast_jobs
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.jobs, [("id", 1)], unique=True)
+        await create_index(self.jobs, [("createdAt", 1)], expireAfterSeconds=BROADCAST_JOB_TTL_SECONDS)
+        await create_index(self.jobs, [("status", 1), ("updatedAt", 1)])
+        await create_index(self.db.messages, [("broadcastId", 1)], sparse=True)
+        # Geçmiş kaydı broadcastId başına tek (upsert)
+        await create_index(self.db.broadcasts, [("id", 1)], unique=True, sparse=True)
+
+    async def start(self, sender_id: str, sender_name: str, title: str, content: str, target_groups: List[str],
+                    send_as_announcement: bool, send_as_message: bool, send_push: bool) -> dict:
+        """İş kaydını oluştur ve gönderimi arka planda başlat"""
+        now = datetime.utcnow()
+        target_groups = list(dict.fromkeys(target_groups))
+        job = {
+            "id": str(uuid.uuid4()),
+            "broadcastId": str(uuid.uuid4()),
+            "status": JOB_QUEUED,
+            "title": title,
+            "content": content,
+            "targetGroups": target_groups,
+            "senderId": sender_id,
+            "senderName": sender_name,
+            "sendAsAnnouncement": send_as_announcement,
+            "sendAsMessage": send_as_message,
+            "sendPushNotification": send_push,
+            "totalGroups": len(target_groups),
+            "processedGroups": 0,
+            "sentCount": 0,
+            "messageCount": 0,
+            "pushCount": 0,
+            "error": None,
+            "createdAt": now,
+            "updatedAt": now,
+            "finishedAt": None,
+        }
+        await self.jobs.insert_one(job)
+        job.pop('_id', None)
+
+        task = asyncio.create_task(self._safe_run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self.jobs.find_one(
+            {"id": job_id}, {"_id": 0, "content": 0, "targetGroups": 0}
+        )
+
+    async def _update(self, job_id: str, **fields):
+        await self.jobs.update_one({"id": job_id}, {"$set": {**fields, "updatedAt": datetime.utcnow()}})
+
+    async def _safe_run(self, job: dict):
+        try:
+            await self._run(job)
+        except Exception as e:
+            logger.error(f"Broadcast job {job['id']} failed: {e}")
+            finished = datetime.utcnow()
+            # Zaman aşımı temizliği işi zaten kapattıysa tekrar yazılmaz
+            current = await self.jobs.find_one_and_update(
+                {"id": job['id'], "status": {"$in": [JOB_QUEUED, JOB_RUNNING]}},
+                {"$set": {"status": JOB_FAILED, "error": str(e), "finishedAt": finished, "updatedAt": finished}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+            if current:
+                await self._record_history(current, current.get('processedGroups') or 0,
+                                           current.get('pushCount') or 0, finished, JOB_FAILED)
+
+    async def fail_stale_jobs(self) -> int:
+        """Worker yeniden başladığı için yarım kalan işleri 'failed' yap ve geçmişe yaz"""
+        cutoff = datetime.utcnow() - timedelta(seconds=BROADCAST_STALE_SECONDS)
+        stale_query = {"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}, "updatedAt": {"$lt": cutoff}}
+        failed = 0
+        for job in await self.jobs.find(stale_query, {"_id": 0}).to_list(100):
+            finished = datetime.utcnow()
+            # Koşullu güncelleme: işi sadece bir worker kapatır
+            result = await self.jobs.update_one(
+                {**stale_query, "id": job['id']},
+                {"$set": {"status": JOB_FAILED, "error": "Gönderim yarıda kesildi (sunucu yeniden başladı)",
+                          "finishedAt": finished, "updatedAt": finished}}
+            )
+            if result.modified_count:
+                await self._record_history(job, job.get('processedGroups') or 0,
+                                           job.get('pushCount') or 0, finished, JOB_FAILED)
+                failed += 1
+        return failed
+
+    async def run_stale_reaper(self):
+        while True:
+            try:
+                failed = await self.fail_stale_jobs()
+                if failed:
+                    logger.warning(f"Stale broadcast jobs marked failed: {failed}")
+            except Exception as e:
+                logger.error(f"Broadcast job reaper error: {e}")
+            await asyncio.sleep(BROADCAST_REAPER_INTERVAL_SECONDS)
+
+    async def _resolve(self, target_groups: List[str]) -> tuple:
+        """(alt gruplar, topluluk id -> duyuru kanalı) - iki sorgu"""
+        subgroups = await self.db.subgroups.find(
+            {"id": {"$in": target_groups}},
+            {"_id": 0, "id": 1, "communityId": 1, "members": 1, "mutedMembers": 1}
+        ).to_list(len(target_groups))
+        community_ids = list({sg['communityId'] for sg in subgroups if sg.get('communityId')})
+        channels = {}
+        if community_ids:
+            communities = await self.db.communities.find(
+                {"id": {"$in": community_ids}}, {"_id": 0, "id": 1, "announcementChannelId": 1}
+            ).to_list(len(community_ids))
+            channels = {c['id']: c['announcementChannelId'] for c in communities if c.get('announcementChannelId')}
+        return subgroups, channels
+
+    async def _run(self, job: dict):
+        job_id = job['id']
+        await self._update(job_id, status=JOB_RUNNING)
+        subgroups, channels = await self._resolve(job['targetGroups'])
+
+        title, content = job['title'], job['content']
+        text = f"**{title}**\n\n{content}" if title else content
+        now = datetime.utcnow()
+
+        def build(group_id: str, sender_name: str) -> dict:
+            return {
+                "id": str(uuid.uuid4()),
+                "groupId": group_id,
+                "senderId": job['senderId'],
+                "senderName": sender_name,
+                "content": text,
+                "type": "announcement",
+                "timestamp": now,
+                "updatedAt": now,
+                "isBroadcast": True,
+                "broadcastId": job['broadcastId'],
+            }
+
+        # Grup mesajları yayınlanır; duyuru kanalı mesajları topluluk başına tek kayıt
+        group_messages = []
+        if job['sendAsMessage']:
+            group_messages = [build(sg['id'], f"📢 {job['senderName']}") for sg in subgroups]
+        announcements = []
+        if job['sendAsAnnouncement']:
+            channel_ids = dict.fromkeys(
+                channels[sg['communityId']] for sg in subgroups if sg.get('communityId') in channels
+            )
+            announcements = [build(channel_id, job['senderName']) for channel_id in channel_ids]
+
+        messages = group_messages + announcements
+        if messages:
+            await self.db.messages.insert_many(messages, ordered=False)
+            await self.stats_counters.inc(totalMessages=len(messages))
+        await self._update(job_id, messageCount=len(messages))
+
+        await self._emit_all(job_id, group_messages, len(subgroups))
+
+        push_count = 0
+        if job['sendPushNotification']:
+            push_count = await self._push(job, subgroups)
+
+        finished = datetime.utcnow()
+        # Sadece hâlâ 'running' ise tamamlanır; zaman aşımıyla 'failed' yapılmışsa geçmiş ikinci kez yazılmaz
+        result = await self.jobs.update_one(
+            {"id": job_id, "status": JOB_RUNNING},
+            {"$set": {"status": JOB_COMPLETED, "processedGroups": len(subgroups), "sentCount": len(subgroups),
+                      "pushCount": push_count, "finishedAt": finished, "updatedAt": finished}}
+        )
+        if not result.modified_count:
+            logger.warning(f"Broadcast job {job_id} finished after being marked failed")
+            return
+        await self._record_history(job, len(subgroups), push_count, finished, JOB_COMPLETED)
+
+    async def _record_history(self, job: dict, sent_count: int, push_count: int, finished: datetime, status: str):
+        """Geçmiş kaydı (GET /admin/broadcast-history); broadcastId üzerinde upsert, tekrar yazımda tek satır"""
+        await self.db.broadcasts.update_one({"id": job['broadcastId']}, {"$set": {
+            "jobId": job['id'],
+            "status": status,
+            "title": job['title'],
+            "content": job['content'],
+            "targetGroups": job['targetGroups'],
+            "sentCount": sent_count,
+            "pushCount": push_count,
+            "senderId": job['senderId'],
+            "senderName": job['senderName'],
+            "sentAt": finished.isoformat(),
+            "sendAsAnnouncement": job['sendAsAnnouncement'],
+            "sendAsMessage": job['sendAsMessage'],
+            "sendPushNotification": job['sendPushNotification'],
+        }}, upsert=True)
+
+    async def _emit_all(self, job_id: str, messages: List[dict], total: int):
+        """Oda yayınlarını en fazla self.concurrency eşzamanlı gönder; ilerlemeyi aralıklarla yaz"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = 0
+
+        async def emit(message: dict):
+            nonlocal done
+            payload = {k: v for k, v in message.items() if k != '_id'}
+            payload['timestamp'] = payload['timestamp'].isoformat()
+            payload['updatedAt'] = payload['updatedAt'].isoformat()
+            async with semaphore:
+                try:
+                    await self.room_events.emit('new_message', payload, room=message['groupId'])
+                except Exception as e:
+                    logger.error(f"Broadcast emit error for group {message['groupId']}: {e}")
+            done += 1
+            if done % BROADCAST_PROGRESS_EVERY == 0:
+                await self._update(job_id, processedGroups=done, sentCount=done)
+
+        await asyncio.gather(*(emit(m) for m in messages))
+        if total:
+            await self._update(job_id, processedGroups=total, sentCount=total)
+
+    async def _push(self, job: dict, subgroups: List[dict]) -> int:
+        """Hedef grupların üyelerine kullanıcı başına tek bildirim + push"""
+        recipients: Dict[str, None] = {}
+        for sg in subgroups:
+            muted = sg.get('mutedMembers') or {}
+            for uid in sg.get('members') or []:
+                if uid != job['senderId'] and uid not in muted:
+                    recipients[uid] = None
+        user_ids = list(recipients)
+
+        title = job['title'] or "📢 Duyuru"
+        body = job['content'][:100]
+        data = {"type": "broadcast", "broadcastId": job['broadcastId']}
+        pushed = 0
+        for i in range(0, len(user_ids), BROADCAST_USER_BATCH):
+            batch = user_ids[i:i + BROADCAST_USER_BATCH]
+            await notification_store.create_notifications(self.db, batch, "broadcast", title, body, data)
+            users = await self.db.users.find(
+                {"uid": {"$in": batch}},
+                {"_id": 0, "uid": 1, "expoPushToken": 1, "pushToken": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+            ).to_list(len(batch))
+            messages = []
+            for user in users:
+                token = _push_token(user)
+                if not token:
+                    continue
+                messages.append({
+                    "to": token,
+                    "sound": "default",
+                    "title": title,
+                    "body": body,
+                    "data": data,
+                    "badge": user.get(notification_store.UNREAD_COUNTER_FIELD) or 0,
+                })
+            await self.send_batch(messages)
+            pushed += len(messages)
+            await self._update(job['id'], pushCount=pushed)
+        return pushed
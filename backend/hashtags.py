@@ -0,0 +1,169 @@
+"""
+Hashtag İndeksi ve Trend Hesaplama
+- Gönderilerde katlanmış 'hashtagKeys' dizisi: hashtag -> gönderiler (multikey index)
+- 10 dakikalık zaman kovalarında sayaçlar ($inc); 1s / 24s / 7g kayan pencereler
+  bu kovaların toplamından hesaplanır, gönderiler yeniden taranmaz
+- Sayaçlar genel ('all') ve her şehir topluluğu için ayrı tutulur
+- Eski kovalar TTL index ile silinir
+"""
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from user_search import fold_turkish
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_BUCKET_MINUTES = 10
+TRENDING_WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+}
+# En uzun pencereden biraz fazla tutulur
+HASHTAG_COUNTS_TTL_SECONDS = 8 * 24 * 3600
+MAX_HASHTAGS_PER_POST = 10
+MAX_HASHTAG_LENGTH = 50
+TRENDING_CACHE_SECONDS = 60
+# Önbellekteki en fazla (pencere, kapsam, limit) kaydı
+TRENDING_CACHE_MAX_ENTRIES = 256
+GLOBAL_SCOPE = "all"
+
+_HASHTAG_RE = re.compile(r"#(\w+)", re.UNICODE)
+
+
+def hashtag_key(tag: str) -> str:
+    """'#İstanbul', 'istanbul', 'ISTANBUL' -> 'istanbul'"""
+    return fold_turkish(tag.lstrip('#').strip())[:MAX_HASHTAG_LENGTH]
+
+
+def extract_hashtags(content: Optional[str], explicit: Optional[List] = None) -> List[str]:
+    """İstemcinin gönderdiği etiketler + içerikteki #etiketler (görünen hâliyle, tekrarsız)"""
+    tags = [t for t in (explicit or []) if isinstance(t, str)]
+    tags += _HASHTAG_RE.findall(content or "")
+    result: Dict[str, str] = {}
+    for tag in tags:
+        display = tag.lstrip('#').strip()[:MAX_HASHTAG_LENGTH]
+        key = hashtag_key(display)
+        if key and key not in result:
+            result[key] = display
+    return list(result.values())[:MAX_HASHTAGS_PER_POST]
+
+
+def bucket_start(ts: datetime) -> datetime:
+    return ts.replace(minute=ts.minute - ts.minute % HASHTAG_BUCKET_MINUTES, second=0, microsecond=0)
+
+
+class HashtagEngine:
+    def __init__(self, db):
+        self.db = db
+        self._tasks = set()
+        self._trending_cache: Dict[tuple, tuple] = {}
+
+    @property
+    def counts(self):
+        return self.db.hashtag_counts
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.db.posts, [("hashtagKeys", 1), ("timestamp", -1), ("id", -1)])
+        await create_index(self.counts, [("scope", 1), ("bucket", 1), ("tag", 1)])
+        await create_index(self.counts, [("bucket", 1)], expireAfterSeconds=HASHTAG_COUNTS_TTL_SECONDS)
+
+    async def _apply(self, post: dict, delta: int):
+        hashtags = post.get('hashtags') or []
+        ts = post.get('timestamp')
+        if not hashtags or not isinstance(ts, datetime):
+            return
+        if datetime.utcnow() - ts > TRENDING_WINDOWS["7d"]:
+            return
+        bucket = bucket_start(ts)
+        scopes = [GLOBAL_SCOPE] + list(post.get('communityIds') or [])
+        operations = []
+        for display in hashtags:
+            tag = hashtag_key(display)
+            for scope in scopes:
+                operations.append(UpdateOne(
+                    {"scope": scope, "bucket": bucket, "tag": tag},
+                    {"$inc": {"count": delta}, "$set": {"display": display}},
+                    upsert=True,
+                ))
+        if operations:
+            await self.counts.bulk_write(operations, ordered=False)
+
+    def record(self, post: dict):
+        """Yeni gönderinin etiketlerini arka planda say"""
+        task = asyncio.create_task(self._safe_apply(post, 1))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def unrecord(self, post: dict):
+        await self._safe_apply(post, -1)
+
+    async def _safe_apply(self, post: dict, delta: int):
+        try:
+            await self._apply(post, delta)
+        except Exception as e:
+            logger.error(f"Hashtag counter error for post {post.get('id')}: {e}")
+
+    async def trending(self, window: str, scope: str = GLOBAL_SCOPE, limit: int = 20) -> List[dict]:
+        """Penceredeki kovaların toplamına göre en popüler etiketler (kısa süreli önbellekli)"""
+        cache_key = (window, scope, limit)
+        cached = self._trending_cache.get(cache_key)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            return cached[0]
+
+        since = bucket_start(datetime.utcnow() - TRENDING_WINDOWS[window])
+        pipeline = [
+            {"$match": {"scope": scope, "bucket": {"$gte": since}}},
+            {"$group": {"_id": "$tag", "count": {"$sum": "$count"}, "display": {"$last": "$display"},
+                        "lastSeen": {"$max": "$bucket"}}},
+            {"$match": {"count": {"$gt": 0}}},
+            {"$sort": {"count": -1, "lastSeen": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+        results = [
+            {"tag": r["_id"], "display": r.get("display") or r["_id"], "count": r["count"]}
+            for r in await self.counts.aggregate(pipeline).to_list(limit)
+        ]
+        self._cache_put(cache_key, results, now)
+        return results
+
+    def _cache_put(self, key: tuple, results: List[dict], now: float):
+        """Süresi dolanları at; hâlâ doluysa en eski kayıtları çıkar"""
+        cache = self._trending_cache
+        if len(cache) >= TRENDING_CACHE_MAX_ENTRIES:
+            for stale in [k for k, (_, expires) in cache.items() if expires <= now]:
+                del cache[stale]
+            while len(cache) >= TRENDING_CACHE_MAX_ENTRIES:
+                del cache[next(iter(cache))]
+        cache.pop(key, None)
+        cache[key] = (results, now + TRENDING_CACHE_SECONDS)
+
+    async def backfill(self, batch_size: int = 500) -> int:
+        """hashtagKeys'i olmayan gönderileri doldur; son 7 gündekileri sayaçlara ekle.
+        Her worker çalıştırır: gönderi koşullu güncellemeyle sahiplenilir, sadece
+        sahiplenen worker sayar (sayaçlar iki kez artmaz)"""
+        updated = 0
+        while True:
+            posts = await self.db.posts.find(
+                {"hashtagKeys": {"$exists": False}},
+                {"_id": 1, "id": 1, "content": 1, "hashtags": 1, "timestamp": 1, "communityIds": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not posts:
+                return updated
+            for post in posts:
+                post['hashtags'] = extract_hashtags(post.get('content'), post.get('hashtags'))
+                result = await self.db.posts.update_one(
+                    {"_id": post['_id'], "hashtagKeys": {"$exists": False}},
+                    {"$set": {"hashtags": post['hashtags'], "hashtagKeys": [hashtag_key(t) for t in post['hashtags']]}}
+                )
+                if result.modified_count == 1:
+                    await self._safe_apply(post, 1)
+                    updated += 1
@@ -0,0 +1,239 @@
+"""
+Bildirim Birleştirme (coalescing) ve Özet Modu
+- Aynı kullanıcıya aynı kaynaktan (ör. grup) pencere içinde gelen bildirimler
+  tek belgede toplanır: "N yeni mesaj"; yeni belge eklenmez, mevcut belge güncellenir
+- Penceredeki ilk bildirim hemen push edilir; sonrakiler biriktirilir ve pencere
+  dolunca tek push olarak gider (Expo collapseId / threadId ile cihazda tek bildirim)
+- Aynı anahtar için bildirimler sırayla işlenir (anahtar başına asyncio.Lock); art arda
+  gelen iki mesaj aynı anda "açık belge yok" görüp iki ayrı bildirim oluşturmaz
+- Özet modundaki kullanıcılara anlık push gitmez; periyodik tek bir özet push'u gider
+- Push'lar Expo'ya 100'lük paketler hâlinde gönderilir
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import notification_store
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', 120))
+DIGEST_INTERVAL_SECONDS = int(os.environ.get('NOTIFICATION_DIGEST_SECONDS', 3600))
+FLUSH_INTERVAL_SECONDS = 15
+FLUSH_BATCH_SIZE = 500
+
+DELIVERY_INSTANT = "instant"
+DELIVERY_DIGEST = "digest"
+
+
+def _push_token(user: dict) -> Optional[str]:
+    return user.get('expoPushToken') or user.get('pushToken')
+
+
+class NotificationCoalescer:
+    def __init__(self, db, send_batch: Callable[[List[dict]], Awaitable[None]],
+                 window_seconds: int = COALESCE_WINDOW_SECONDS,
+                 digest_interval_seconds: int = DIGEST_INTERVAL_SECONDS):
+        self.db = db
+        self.send_batch = send_batch
+        self.window = timedelta(seconds=window_seconds)
+        self.digest_interval_seconds = digest_interval_seconds
+        self._tasks = set()
+        # collapse_id -> [Lock, bekleyen iş sayısı]; iş kalmayınca silinir
+        self._locks: Dict[str, list] = {}
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.db.notifications, [("collapseId", 1), ("userId", 1), ("isRead", 1)])
+        await create_index(
+            self.db.notifications, [("pendingPush", 1), ("delivery", 1), ("lastPushAt", 1)],
+            partialFilterExpression={"pendingPush": True}
+        )
+        await create_index(self.db.notifications, [("claimToken", 1)], sparse=True)
+
+    def notify(self, user_ids: List[str], collapse_id: str, type: str, title: str, body: str,
+               summary_title: str, data: Optional[dict] = None):
+        """Arka planda birleştirerek bildir; istek yolunu bekletmez"""
+        task = asyncio.create_task(self._safe_notify(user_ids, collapse_id, type, title, body, summary_title, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _safe_notify(self, *args):
+        collapse_id = args[1]
+        entry = self._locks.setdefault(collapse_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._notify(*args)
+        except Exception as e:
+            logger.error(f"Notification coalescing error for {collapse_id}: {e}")
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(collapse_id, None)
+
+    async def _notify(self, user_ids: List[str], collapse_id: str, type: str, title: str, body: str,
+                      summary_title: str, data: Optional[dict]):
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return
+        now = datetime.utcnow()
+        open_filter = {
+            "collapseId": collapse_id,
+            "isRead": False,
+            "windowStart": {"$gte": now - self.window},
+        }
+
+        # Penceresi açık belgesi olanlar: sayacı artır, özet metnine çevir, push'u beklet
+        open_users = {d['userId'] for d in await self.db.notifications.find(
+            {**open_filter, "userId": {"$in": user_ids}}, {"_id": 0, "userId": 1}
+        ).to_list(len(user_ids))}
+        if open_users:
+            await self.db.notifications.update_many(
+                {**open_filter, "userId": {"$in": list(open_users)}},
+                [
+                    {"$set": {
+                        "count": {"$add": [{"$ifNull": ["$count", 1]}, 1]},
+                        "title": {"$literal": summary_title},
+                        "data": {"$literal": data or {}},
+                        "createdAt": now,
+                        "pendingPush": True,
+                    }},
+                    {"$set": {"body": {"$concat": [{"$toString": "$count"}, " yeni mesaj"]}}},
+                ]
+            )
+
+        new_users = [u for u in user_ids if u not in open_users]
+        if not new_users:
+            return
+        users = await self.db.users.find(
+            {"uid": {"$in": new_users}},
+            {"_id": 0, "uid": 1, "expoPushToken": 1, "pushToken": 1,
+             "notificationSettings.groupMessageDigest": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+        ).to_list(len(new_users))
+        digest_users, instant_users = [], []
+        for user in users:
+            if (user.get('notificationSettings') or {}).get('groupMessageDigest'):
+                digest_users.append(user)
+            else:
+                instant_users.append(user)
+
+        extra = {"collapseId": collapse_id, "count": 1, "windowStart": now}
+        if instant_users:
+            await notification_store.create_notifications(
+                self.db, [u['uid'] for u in instant_users], type, title, body, data,
+                extra={**extra, "delivery": DELIVERY_INSTANT, "pendingPush": False, "lastPushAt": now}
+            )
+            await self.send_batch([
+                self._push(_push_token(u), title, body, data, collapse_id,
+                           (u.get(notification_store.UNREAD_COUNTER_FIELD) or 0) + 1)
+                for u in instant_users if _push_token(u)
+            ])
+        if digest_users:
+            await notification_store.create_notifications(
+                self.db, [u['uid'] for u in digest_users], type, title, body, data,
+                extra={**extra, "delivery": DELIVERY_DIGEST, "pendingPush": True, "lastPushAt": None}
+            )
+
+    @staticmethod
+    def _push(token: str, title: str, body: str, data: Optional[dict], collapse_id: str,
+              badge: Optional[int] = None) -> dict:
+        message = {
+            "to": token,
+            "sound": "default",
+            "title": title,
+            "body": body,
+            "data": data or {},
+            # Android aynı anahtarlı bildirimi değiştirir, iOS aynı başlık altında toplar
+            "collapseId": collapse_id,
+            "threadId": collapse_id,
+        }
+        if badge is not None:
+            message["badge"] = badge
+        return message
+
+    async def _claim(self, query: dict) -> List[dict]:
+        """Bekleyen push'ları sahiplen (birden çok worker aynı belgeyi göndermesin)"""
+        ids = [d['_id'] for d in await self.db.notifications.find(query, {"_id": 1}).limit(FLUSH_BATCH_SIZE).to_list(FLUSH_BATCH_SIZE)]
+        if not ids:
+            return []
+        token = str(uuid.uuid4())
+        await self.db.notifications.update_many(
+            {"_id": {"$in": ids}, "pendingPush": True},
+            {"$set": {"pendingPush": False, "lastPushAt": datetime.utcnow(), "claimToken": token}}
+        )
+        return await self.db.notifications.find(
+            {"claimToken": token}, {"_id": 0, "userId": 1, "title": 1, "body": 1, "data": 1, "collapseId": 1, "count": 1}
+        ).to_list(len(ids))
+
+    async def _recipients(self, user_ids) -> Dict[str, dict]:
+        user_ids = list(set(user_ids))
+        users = await self.db.users.find(
+            {"uid": {"$in": user_ids}},
+            {"_id": 0, "uid": 1, "expoPushToken": 1, "pushToken": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+        ).to_list(len(user_ids))
+        return {u['uid']: u for u in users if _push_token(u)}
+
+    async def flush_pending(self) -> int:
+        """Penceresi dolan birleştirilmiş bildirimler için tek push"""
+        docs = await self._claim({
+            "pendingPush": True,
+            "delivery": DELIVERY_INSTANT,
+            "lastPushAt": {"$lte": datetime.utcnow() - self.window},
+        })
+        recipients = await self._recipients(d['userId'] for d in docs)
+        messages = [
+            self._push(_push_token(recipients[d['userId']]), d['title'], d['body'], d.get('data'),
+                       d['collapseId'], recipients[d['userId']].get(notification_store.UNREAD_COUNTER_FIELD))
+            for d in docs if d['userId'] in recipients
+        ]
+        await self.send_batch(messages)
+        return len(messages)
+
+    async def send_digests(self) -> int:
+        """Özet modundaki kullanıcılara biriken bildirimler için kullanıcı başına tek push"""
+        sent = 0
+        while True:
+            docs = await self._claim({"pendingPush": True, "delivery": DELIVERY_DIGEST})
+            if not docs:
+                return sent
+            per_user = defaultdict(list)
+            for doc in docs:
+                per_user[doc['userId']].append(doc)
+            recipients = await self._recipients(per_user)
+            messages = []
+            for uid, user_docs in per_user.items():
+                if uid not in recipients:
+                    continue
+                total = sum(d.get('count') or 1 for d in user_docs)
+                sources = {d['collapseId'] for d in user_docs}
+                body = (f"{user_docs[0]['title']}: {total} yeni mesaj" if len(sources) == 1
+                        else f"{len(sources)} grupta {total} yeni mesaj")
+                messages.append(self._push(
+                    _push_token(recipients[uid]), "Mesaj özeti", body, {"type": "digest"},
+                    "digest", recipients[uid].get(notification_store.UNREAD_COUNTER_FIELD)
+                ))
+            await self.send_batch(messages)
+            sent += len(messages)
+
+    async def run_flusher(self):
+        while True:
+            try:
+                await self.flush_pending()
+            except Exception as e:
+                logger.error(f"Notification flush error: {e}")
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+
+    async def run_digests(self):
+        while True:
+            await asyncio.sleep(self.digest_interval_seconds)
+            try:
+                sent = await self.send_digests()
+                if sent:
+                    logger.info(f"Notification digests sent: {sent}")
+            except Exception as e:
+                logger.error(f"Notification digest error: {e}")
@@ -0,0 +1,286 @@
+"""
+Bildirim Kayıtları
+- Tüm bildirimler tek şemayla yazılır:
+  {id, userId, type, title, body, data, isRead, createdAt}
+- Okunmamış sayısı kullanıcı belgesinde (unreadNotificationCount) $inc ile tutulur;
+  rozet okuması count_documents yerine tek belge okumasıdır
+- Eski şemalar (timestamp / message / read) açılıştaki göçle dönüştürülür
+- Saklama: okunmuş bildirimler TTL index ile silinir; çok eski okunmamışlar
+  kullanıcı başına tek bir özet kaydında toplanır
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+UNREAD_COUNTER_FIELD = "unreadNotificationCount"
+
+READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30))
+UNREAD_ROLLUP_DAYS = int(os.environ.get('NOTIFICATION_UNREAD_ROLLUP_DAYS', 90))
+ROLLUP_INTERVAL_SECONDS = 6 * 3600
+ROLLUP_USER_BATCH = 500
+SUMMARY_TYPE = "notification_summary"
+# Sayaç düzeltmesi açılışta tüm worker'larda değil, bu aralıkta bir kez çalışır
+RECONCILE_LEASE_ID = "unread_reconcile_lease"
+RECONCILE_INTERVAL_SECONDS = 24 * 3600
+RECONCILE_BATCH = 500
+
+
+def build_notification(user_id: str, type: str, title: str, body: str, data: Optional[dict] = None) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": user_id,
+        "type": type or "general",
+        "title": title,
+        "body": body,
+        "data": data or {},
+        "isRead": False,
+        "createdAt": datetime.utcnow(),
+    }
+
+
+def serialize_notification(notification: dict) -> dict:
+    """API çıktısı; eski uygulama sürümleri için 'message' ve 'timestamp' takma adları"""
+    notification.pop('_id', None)
+    notification['message'] = notification.get('body')
+    notification['timestamp'] = notification.get('createdAt')
+    return notification
+
+
+async def create_notification(db, user_id: str, type: str, title: str, body: str,
+                              data: Optional[dict] = None) -> dict:
+    """Bildirimi kaydet ve okunmamış sayacını artır"""
+    notification = build_notification(user_id, type, title, body, data)
+    await db.notifications.insert_one(notification)
+    await db.users.update_one({"uid": user_id}, {"$inc": {UNREAD_COUNTER_FIELD: 1}})
+    notification.pop('_id', None)
+    return notification
+
+
+async def create_notifications(db, user_ids: Iterable[str], type: str, title: str, body: str,
+                               data: Optional[dict] = None, extra: Optional[dict] = None) -> List[dict]:
+    """Aynı bildirimi birden çok kullanıcıya tek insert_many + update_many ile yaz.
+    extra: şemaya eklenecek ek alanlar (ör. birleştirme anahtarı)"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return []
+    notifications = [{**build_notification(uid, type, title, body, data), **(extra or {})} for uid in user_ids]
+    await db.notifications.insert_many(notifications, ordered=False)
+    await db.users.update_many({"uid": {"$in": user_ids}}, {"$inc": {UNREAD_COUNTER_FIELD: 1}})
+    for notification in notifications:
+        notification.pop('_id', None)
+    return notifications
+
+
+async def _decrement_unread(db, user_id: str, amount: int = 1):
+    """Sayacı amount kadar düşür (0'ın altına inmez)"""
+    if amount > 0:
+        await db.users.update_one(
+            {"uid": user_id, UNREAD_COUNTER_FIELD: {"$gt": 0}},
+            [{"$set": {UNREAD_COUNTER_FIELD: {"$max": [0, {"$subtract": [f"${UNREAD_COUNTER_FIELD}", amount]}]}}}]
+        )
+
+
+async def mark_read(db, user_id: str, notification_id: str) -> Optional[dict]:
+    """Bildirim yoksa None; sayaç sadece okunmamıştan okunmuşa geçişte düşer"""
+    notification = await db.notifications.find_one_and_update(
+        {"id": notification_id, "userId": user_id},
+        {"$set": {"isRead": True}},
+        projection={"_id": 0, "isRead": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if notification and not notification.get('isRead'):
+        await _decrement_unread(db, user_id)
+    return notification
+
+
+async def mark_all_read(db, user_id: str):
+    """Sayaç sadece okunmuşa geçenler kadar düşer; arada gelen yeni bildirim sayılı kalır"""
+    result = await db.notifications.update_many({"userId": user_id, "isRead": False}, {"$set": {"isRead": True}})
+    await _decrement_unread(db, user_id, result.modified_count)
+
+
+async def delete_notification(db, user_id: str, notification_id: str) -> bool:
+    notification = await db.notifications.find_one_and_delete(
+        {"id": notification_id, "userId": user_id}, projection={"_id": 0, "isRead": 1}
+    )
+    if not notification:
+        return False
+    if not notification.get('isRead'):
+        await _decrement_unread(db, user_id)
+    return True
+
+
+async def clear_all(db, user_id: str):
+    unread = await db.notifications.delete_many({"userId": user_id, "isRead": False})
+    await db.notifications.delete_many({"userId": user_id})
+    await _decrement_unread(db, user_id, unread.deleted_count)
+
+
+async def unread_count(db, user_id: str) -> int:
+    user = await db.users.find_one({"uid": user_id}, {"_id": 0, UNREAD_COUNTER_FIELD: 1})
+    return max(0, (user or {}).get(UNREAD_COUNTER_FIELD) or 0)
+
+
+async def list_notifications(db, user_id: str, limit: int = 50, type: Optional[str] = None,
+                             unread_only: bool = False) -> List[dict]:
+    query = {"userId": user_id}
+    if type:
+        query["type"] = type
+    if unread_only:
+        query["isRead"] = False
+    notifications = await db.notifications.find(query).sort(
+        [("createdAt", -1), ("id", -1)]
+    ).limit(limit).to_list(limit)
+    return [serialize_notification(n) for n in notifications]
+
+
+async def ensure_indexes(db, create_index):
+    await create_index(db.notifications, [("userId", 1), ("createdAt", -1), ("id", -1)])
+    await create_index(db.notifications, [("userId", 1), ("isRead", 1)])
+    # Sadece okunmuşlar süresi dolunca silinir
+    await create_index(
+        db.notifications, [("createdAt", 1)],
+        expireAfterSeconds=READ_RETENTION_DAYS * 24 * 3600,
+        partialFilterExpression={"isRead": True},
+        name="read_notifications_ttl",
+    )
+    await create_index(db.notifications, [("isRead", 1), ("createdAt", 1)])
+
+
+async def migrate_legacy_notifications(db) -> int:
+    """timestamp / message / read alanlarını tek şemaya çevir"""
+    result = await db.notifications.update_many(
+        {"$or": [
+            {"createdAt": {"$exists": False}},
+            {"body": {"$exists": False}},
+            {"isRead": {"$exists": False}},
+            {"timestamp": {"$exists": True}},
+            {"message": {"$exists": True}},
+            {"read": {"$exists": True}},
+        ]},
+        [
+            {"$set": {
+                "createdAt": {"$ifNull": ["$createdAt", {"$ifNull": ["$timestamp", {"$toDate": "$_id"}]}]},
+                "body": {"$ifNull": ["$body", {"$ifNull": ["$message", ""]}]},
+                "isRead": {"$ifNull": ["$isRead", {"$ifNull": ["$read", False]}]},
+                "type": {"$ifNull": ["$type", {"$ifNull": ["$data.type", "general"]}]},
+            }},
+            {"$unset": ["timestamp", "message", "read"]},
+        ]
+    )
+    return result.modified_count
+
+
+async def acquire_reconcile_lease(db, interval_seconds: int = RECONCILE_INTERVAL_SECONDS) -> bool:
+    """Süresi dolmuş kirayı al; aralık başına sadece bir worker True alır"""
+    now = datetime.utcnow()
+    try:
+        result = await db.notification_leases.update_one(
+            {"_id": RECONCILE_LEASE_ID, "expiresAt": {"$lte": now}},
+            {"$set": {"expiresAt": now + timedelta(seconds=interval_seconds), "acquiredAt": now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Kira başka bir worker'da ve süresi dolmamış
+        return False
+    return bool(result.modified_count or result.upserted_id)
+
+
+async def _set_counts(db, counts: dict) -> int:
+    """Sayacı, okunduğu değerden değişmemişse yaz (arada gelen $inc ezilmez)"""
+    current = {
+        u['uid']: u.get(UNREAD_COUNTER_FIELD) for u in await db.users.find(
+            {"uid": {"$in": list(counts)}}, {"_id": 0, "uid": 1, UNREAD_COUNTER_FIELD: 1}
+        ).to_list(len(counts))
+    }
+    operations = [
+        UpdateOne({"uid": uid, UNREAD_COUNTER_FIELD: value}, {"$set": {UNREAD_COUNTER_FIELD: counts[uid]}})
+        for uid, value in current.items() if value != counts[uid]
+    ]
+    if not operations:
+        return 0
+    return (await db.users.bulk_write(operations, ordered=False)).modified_count
+
+
+async def reconcile_unread_counts(db) -> int:
+    """Sayaçları notifications koleksiyonundan yeniden hesapla; düzeltilen kullanıcı sayısı.
+    Kira altında çalışır; diğer worker'lar 0 döner"""
+    if not await acquire_reconcile_lease(db):
+        return 0
+    counts = {
+        r['_id']: r['count'] async for r in db.notifications.aggregate([
+            {"$match": {"isRead": False}},
+            {"$group": {"_id": "$userId", "count": {"$sum": 1}}},
+        ])
+    }
+    fixed = 0
+    uids = list(counts)
+    for i in range(0, len(uids), RECONCILE_BATCH):
+        fixed += await _set_counts(db, {uid: counts[uid] for uid in uids[i:i + RECONCILE_BATCH]})
+
+    # Okunmamış bildirimi kalmayanlar: sayacı 0 olmayan kullanıcılar _id sırasıyla taranır
+    last_id = None
+    while True:
+        query = {UNREAD_COUNTER_FIELD: {"$gt": 0}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        users = await db.users.find(query, {"_id": 1, "uid": 1}).sort("_id", 1).limit(
+            RECONCILE_BATCH).to_list(RECONCILE_BATCH)
+        if not users:
+            return fixed
+        last_id = users[-1]['_id']
+        stale = {u['uid']: 0 for u in users if u.get('uid') not in counts}
+        if stale:
+            fixed += await _set_counts(db, stale)
+
+
+async def rollup_old_unread(db, days: int = UNREAD_ROLLUP_DAYS) -> int:
+    """days günden eski okunmamışları kullanıcı başına tek özet kaydına topla; toplanan bildirim sayısı"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    old_unread = {"isRead": False, "createdAt": {"$lt": cutoff}, "type": {"$ne": SUMMARY_TYPE}}
+    rolled = 0
+    while True:
+        groups = await db.notifications.aggregate([
+            {"$match": old_unread},
+            {"$group": {"_id": {"userId": "$userId", "type": "$type"}, "count": {"$sum": 1},
+                        "latest": {"$max": "$createdAt"}}},
+            {"$group": {"_id": "$_id.userId", "types": {"$push": {"k": "$_id.type", "v": "$count"}},
+                        "latest": {"$max": "$latest"}}},
+            {"$limit": ROLLUP_USER_BATCH},
+        ]).to_list(ROLLUP_USER_BATCH)
+        if not groups:
+            return rolled
+
+        for group in groups:
+            user_id = group['_id']
+            deleted = (await db.notifications.delete_many({**old_unread, "userId": user_id})).deleted_count
+            if not deleted:
+                continue
+            inc = {"data.count": deleted}
+            for t in group['types']:
+                inc[f"data.types.{t['k'] or 'general'}"] = t['v']
+            result = await db.notifications.update_one(
+                {"userId": user_id, "type": SUMMARY_TYPE, "isRead": False},
+                {
+                    "$inc": inc,
+                    "$max": {"createdAt": group['latest']},
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "title": "Eski bildirimler"},
+                },
+                upsert=True,
+            )
+            summary = await db.notifications.find_one(
+                {"userId": user_id, "type": SUMMARY_TYPE, "isRead": False}, {"_id": 1, "data.count": 1}
+            )
+            if summary:
+                await db.notifications.update_one(
+                    {"_id": summary['_id']},
+                    {"$set": {"body": f"{summary['data']['count']} okunmamış eski bildirim"}}
+                )
+            # Silinenler sayaçtan düşer, yeni özet kaydı bir okunmamış ekler
+            await _decrement_unread(db, user_id, deleted - (1 if result.upserted_id else 0))
+            rolled += deleted
@@ -0,0 +1,51 @@
+"""
+İmleç Tabanlı Sayfalama Yardımcıları
+- Opak imleç: son öğenin sıralama anahtarları (datetime / ObjectId destekli)
+- fields= parametresinden izinli alanlarla sınırlı projection
+"""
+
+import base64
+from typing import Iterable, List, Optional
+
+from bson import json_util
+from bson.json_util import JSONOptions
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Saklanan tarihler naive UTC; imleçteki tarihler de öyle çözülür
+_CURSOR_JSON_OPTIONS = JSONOptions(tz_aware=False)
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(token: str) -> list:
+    """Geçersiz imleçte ValueError"""
+    try:
+        values = json_util.loads(
+            base64.urlsafe_b64decode(token.encode()).decode(), json_options=_CURSOR_JSON_OPTIONS
+        )
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    if not limit:
+        return default
+    return max(1, min(limit, maximum))
+
+
+def build_projection(fields: Optional[str], allowed: Iterable[str], default: Iterable[str],
+                     required: Iterable[str] = ("uid",)) -> dict:
+    """fields='a,b,c' -> {'_id': 0, 'a': 1, ...}; izinli olmayan alanlar sessizce atlanır"""
+    allowed = set(allowed)
+    requested: List[str] = [f.strip() for f in fields.split(",")] if fields else list(default)
+    selected = [f for f in requested if f in allowed] or list(default)
+    projection = {"_id": 0}
+    for field in list(required) + selected:
+        projection[field] = 1
+    return projection
@@ -0,0 +1,97 @@
+"""
+Popüler Meslek / Beceri İstatistikleri
+- stats_occupations / stats_skills: {_id: değer, count} küçük koleksiyonları
+- Profil güncellemesinde eski/yeni farkı $inc ile uygulanır
+- Periyodik tam yeniden hesaplama ($out) sapmaları düzeltir
+- Okumalar kısa ömürlü süreç içi önbellekten
+"""
+
+import time
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+POPULAR_STATS_CACHE_SECONDS = 60
+POPULAR_STATS_REBUILD_SECONDS = 3600
+
+
+def _normalize(values: Iterable) -> Counter:
+    """Boş / geçersiz değerleri at; liste alanlarında kullanıcı başına bir kez say"""
+    return Counter({v.strip() for v in values if isinstance(v, str) and v.strip()})
+
+
+class PopularStats:
+    """users koleksiyonundaki tek bir alanın (tekil veya liste) değer sayıları"""
+
+    def __init__(self, db, collection_name: str, field: str, is_list: bool = False):
+        self.db = db
+        self.collection_name = collection_name
+        self.field = field
+        self.is_list = is_list
+        self._cache: Optional[List[dict]] = None
+        self._cache_limit = 0
+        self._cache_expires = 0.0
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    def _values(self, user: Optional[dict]) -> Counter:
+        if not user:
+            return Counter()
+        value = user.get(self.field)
+        if self.is_list:
+            return _normalize(value if isinstance(value, list) else [])
+        return _normalize([value])
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.collection, [("count", -1)])
+
+    async def apply_change(self, previous: Optional[dict], current: Optional[dict]):
+        """Kullanıcının eski ve yeni değerleri arasındaki farkı $inc ile uygula"""
+        diff = self._values(current)
+        diff.subtract(self._values(previous))
+        operations = [
+            UpdateOne({"_id": value}, {"$inc": {"count": delta}}, upsert=True)
+            for value, delta in diff.items() if delta
+        ]
+        if not operations:
+            return
+        await self.collection.bulk_write(operations, ordered=False)
+        if any(delta < 0 for delta in diff.values()):
+            await self.collection.delete_many({"count": {"$lte": 0}})
+        self._cache = None
+
+    async def rebuild(self):
+        """users koleksiyonundan baştan hesapla ve koleksiyonu atomik olarak değiştir"""
+        pipeline = [{"$match": {self.field: {"$exists": True, "$nin": [None, "", []]}}}]
+        if self.is_list:
+            pipeline += [
+                {"$unwind": f"${self.field}"},
+                {"$match": {self.field: {"$type": "string", "$ne": ""}}},
+                {"$group": {"_id": {"uid": "$uid", "value": {"$trim": {"input": f"${self.field}"}}}}},
+                {"$group": {"_id": "$_id.value", "count": {"$sum": 1}}},
+            ]
+        else:
+            pipeline += [
+                {"$match": {self.field: {"$type": "string"}}},
+                {"$group": {"_id": {"$trim": {"input": f"${self.field}"}}, "count": {"$sum": 1}}},
+            ]
+        pipeline += [
+            {"$match": {"_id": {"$ne": ""}}},
+            {"$out": self.collection_name},
+        ]
+        await self.db.users.aggregate(pipeline).to_list(None)
+        self._cache = None
+
+    async def top(self, limit: int) -> List[dict]:
+        """En popüler değerler - önbellekten, süresi dolduysa koleksiyondan"""
+        now = time.monotonic()
+        if self._cache is None or now >= self._cache_expires or limit > self._cache_limit:
+            self._cache = await self.collection.find(
+                {"count": {"$gt": 0}}
+            ).sort([("count", -1), ("_id", 1)]).limit(limit).to_list(limit)
+            self._cache_limit = limit
+            self._cache_expires = now + POPULAR_STATS_CACHE_SECONDS
+        return self._cache[:limit]
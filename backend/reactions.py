@@ -0,0 +1,117 @@
+"""
+Mesaj Reaksiyonları - Atomik Güncelleme
+- Tek belge üzerinde $addToSet / $pull + $inc (yarış durumunda kayıp güncelleme yok)
+- Emoji başına sayaçlar (reactionCounts) her işlemde güncel döner
+- Kullanıcı başına tek reaksiyon: aynı emoji kaldırır, farklı emoji değiştirir
+"""
+
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+MAX_EMOJI_LENGTH = 16
+# Eşzamanlı değişiklikte koşullu güncelleme tekrar denenir
+MAX_REACTION_RETRIES = 10
+
+
+def is_valid_emoji(emoji) -> bool:
+    """Emoji alan adı olarak kullanılacağı için '.' ve '$' içeremez"""
+    if not emoji or not isinstance(emoji, str):
+        return False
+    if len(emoji) > MAX_EMOJI_LENGTH:
+        return False
+    return '.' not in emoji and not emoji.startswith('$')
+
+
+def find_user_reaction(reactions: dict, uid: str) -> Optional[str]:
+    for emoji, users in (reactions or {}).items():
+        if uid in users:
+            return emoji
+    return None
+
+
+async def _ensure_counts(collection, doc_filter: dict, doc: dict):
+    """Sayaçları olmayan eski belgeler için reactionCounts'u bir kez doldur"""
+    if 'reactionCounts' in doc:
+        return
+    counts = {emoji: len(users) for emoji, users in (doc.get('reactions') or {}).items() if users}
+    await collection.update_one(
+        {**doc_filter, "reactionCounts": {"$exists": False}},
+        {"$set": {"reactionCounts": counts}}
+    )
+
+
+async def toggle_reaction(collection, doc_filter: dict, uid: str, emoji: str, updated_at=None) -> Optional[dict]:
+    """Reaksiyonu atomik olarak ekle / kaldır / değiştir.
+
+    Dönen değer (belge yoksa None):
+        {"reactions", "counts", "myReaction", "added", "removed", "delta"}
+    delta sadece değişen emojilerin yeni sayılarını içerir (socket yayını için).
+    """
+    projection = {"_id": 0, "reactions": 1, "reactionCounts": 1}
+
+    for _ in range(MAX_REACTION_RETRIES):
+        doc = await collection.find_one(doc_filter, projection)
+        if doc is None:
+            return None
+        await _ensure_counts(collection, doc_filter, doc)
+
+        reactions = doc.get('reactions') or {}
+        current = find_user_reaction(reactions, uid)
+
+        guard = dict(doc_filter)
+        update = {"$inc": {}}
+        if current == emoji:
+            # Aynı emoji - kaldır
+            guard[f"reactions.{emoji}"] = uid
+            update["$pull"] = {f"reactions.{emoji}": uid}
+            update["$inc"][f"reactionCounts.{emoji}"] = -1
+            added, removed = None, emoji
+        else:
+            # Yeni emoji ekle; önceki varsa aynı güncellemede kaldır
+            guard[f"reactions.{emoji}"] = {"$ne": uid}
+            update["$addToSet"] = {f"reactions.{emoji}": uid}
+            update["$inc"][f"reactionCounts.{emoji}"] = 1
+            if current:
+                guard[f"reactions.{current}"] = uid
+                update["$pull"] = {f"reactions.{current}": uid}
+                update["$inc"][f"reactionCounts.{current}"] = -1
+            else:
+                # Okuduğumuzdan bu yana başka emojiye tepki verilmediğinden emin ol
+                for other in reactions:
+                    if other != emoji:
+                        guard[f"reactions.{other}"] = {"$ne": uid}
+            added, removed = emoji, current
+
+        if updated_at is not None:
+            update["$set"] = {"updatedAt": updated_at}
+
+        result = await collection.find_one_and_update(
+            guard, update, projection=projection, return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            # Arada değişti - güncel durumla tekrar dene
+            continue
+
+        counts = result.get('reactionCounts') or {}
+        # Sıfıra inen emojileri temizle (koşullu, yarışta güvenli)
+        emptied = [e for e in (added, removed) if e and counts.get(e, 0) <= 0]
+        for e in emptied:
+            await collection.update_one(
+                {**doc_filter, f"reactionCounts.{e}": {"$lte": 0}},
+                {"$unset": {f"reactions.{e}": "", f"reactionCounts.{e}": ""}}
+            )
+            counts.pop(e, None)
+            (result.get('reactions') or {}).pop(e, None)
+
+        delta = {e: counts.get(e, 0) for e in (added, removed) if e}
+        return {
+            "reactions": result.get('reactions') or {},
+            "counts": counts,
+            "myReaction": added,
+            "added": added,
+            "removed": removed,
+            "delta": delta,
+        }
+
+    raise RuntimeError("Reaksiyon güncellenemedi (çok fazla eşzamanlı değişiklik)")
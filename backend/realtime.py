@@ -0,0 +1,252 @@
+"""
+Gerçek Zamanlı Yardımcılar - Socket.IO
+- Yazıyor (typing) durumu için paylaşımlı TTL deposu (MongoDB TTL index)
+- Sunucu tarafı debounce / throttle
+- Görünen isim önbelleği
+- Socket.IO paketleri için JSON kodlayıcı ve olay hız sınırlayıcı
+- Oda başına sıra numarası (seq) ve yeniden bağlanma için tekrar oynatma tamponu
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Yazıyor durumu bu süre yenilenmezse düşer (saniye)
+TYPING_TTL_SECONDS = 5
+# Aynı kullanıcı için aynı odaya en sık bu aralıkla "yazıyor" yayını yapılır
+TYPING_THROTTLE_SECONDS = 2
+# Görünen isimlerin süreç içi önbellekte tutulma süresi
+DISPLAY_NAME_TTL_SECONDS = 300
+# Oda başına tutulan son olay sayısı (resume ile tekrar oynatılabilir)
+ROOM_EVENT_BUFFER_SIZE = 200
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SocketJSON:
+    """datetime alanlarını ISO formatına çeviren json modülü.
+    AsyncServer(json=SocketJSON) ile verilir; MongoDB belgeleri doğrudan yayınlanabilir."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        kwargs.setdefault('default', _json_default)
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(*args, **kwargs):
+        return json.loads(*args, **kwargs)
+
+
+class SocketRateLimiter:
+    """Kullanıcı başına kayan pencere hız sınırı (REST'teki slowapi limitinin socket karşılığı)"""
+
+    def __init__(self, limit: int, period: int = 60):
+        self.limit = limit
+        self.period = period
+        self._hits: Dict[str, deque] = {}
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        hits = self._hits.setdefault(key, deque())
+        while hits and now - hits[0] >= self.period:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return False
+        hits.append(now)
+        return True
+
+
+class DisplayNameCache:
+    """uid -> görünen isim önbelleği (her typing olayında users sorgusunu önler)"""
+
+    def __init__(self, db, ttl: int = DISPLAY_NAME_TTL_SECONDS):
+        self.db = db
+        self.ttl = ttl
+        self._cache: Dict[str, tuple] = {}
+
+    async def get(self, uid: str) -> dict:
+        cached = self._cache.get(uid)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            return cached[0]
+
+        user = await self.db.users.find_one({"uid": uid}, {"firstName": 1, "lastName": 1})
+        first_name = (user.get('firstName') or '') if user else ''
+        last_name = (user.get('lastName') or '') if user else ''
+        names = {
+            "name": f"{first_name} {last_name}".strip() or "Kullanıcı",
+            "firstName": first_name.strip() or "Kullanıcı",
+        }
+        self._cache[uid] = (names, now + self.ttl)
+        return names
+
+    def invalidate(self, uid: str):
+        self._cache.pop(uid, None)
+
+
+class TypingStore:
+    """Yazıyor durumlarını tüm worker'ların gördüğü TTL koleksiyonunda tutar.
+
+    MongoDB TTL monitörü ~60 saniyede bir çalıştığı için okumalar her zaman
+    expiresAt > now filtresiyle yapılır; TTL index sadece boşta kalan
+    odaların kayıtlarını temizler.
+    """
+
+    def __init__(self, db, ttl: int = TYPING_TTL_SECONDS):
+        self.collection = db.typing_status
+        self.ttl = ttl
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("room", 1), ("uid", 1)], unique=True)
+        await self.collection.create_index("expiresAt", expireAfterSeconds=0)
+
+    async def set(self, room: str, uid: str, names: dict):
+        await self.collection.update_one(
+            {"room": room, "uid": uid},
+            {"$set": {
+                "name": names["name"],
+                "firstName": names["firstName"],
+                "expiresAt": datetime.utcnow() + timedelta(seconds=self.ttl),
+            }},
+            upsert=True
+        )
+
+    async def clear(self, room: str, uid: str):
+        await self.collection.delete_one({"room": room, "uid": uid})
+
+    async def get_active(self, room: str, exclude_uid: Optional[str] = None) -> List[dict]:
+        query = {"room": room, "expiresAt": {"$gt": datetime.utcnow()}}
+        if exclude_uid:
+            query["uid"] = {"$ne": exclude_uid}
+        return await self.collection.find(
+            query, {"_id": 0, "uid": 1, "name": 1, "firstName": 1}
+        ).to_list(50)
+
+
+class TypingManager:
+    """Typing olaylarını debounce/throttle ederek yayınlar.
+
+    - start: aynı (oda, kullanıcı) için TYPING_THROTTLE_SECONDS içinde tekrar
+      gelen olaylar ne DB'ye yazılır ne de yayınlanır; sadece durdurma
+      zamanlayıcısı ertelenir.
+    - Kullanıcı TTL süresince yeni olay göndermezse otomatik olarak
+      isTyping=False yayınlanır (debounce edilmiş stop).
+    """
+
+    def __init__(self, sio, store: TypingStore, names: DisplayNameCache,
+                 throttle: int = TYPING_THROTTLE_SECONDS):
+        self.sio = sio
+        self.store = store
+        self.names = names
+        self.throttle = throttle
+        self._last_emit: Dict[tuple, float] = {}
+        self._stop_timers: Dict[tuple, asyncio.Task] = {}
+
+    async def _emit(self, room: str, uid: str, names: dict, is_typing: bool, skip_sid: Optional[str] = None):
+        await self.sio.emit('typing', {
+            "room": room,
+            "userId": uid,
+            "userName": names["name"],
+            "isTyping": is_typing,
+        }, room=room, skip_sid=skip_sid)
+
+    def _schedule_stop(self, key: tuple):
+        timer = self._stop_timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._stop_timers[key] = asyncio.create_task(self._expire(key))
+
+    async def _expire(self, key: tuple):
+        try:
+            await asyncio.sleep(self.store.ttl)
+        except asyncio.CancelledError:
+            return
+        self._stop_timers.pop(key, None)
+        await self.stop(key[0], key[1])
+
+    async def start(self, room: str, uid: str, skip_sid: Optional[str] = None):
+        key = (room, uid)
+        self._schedule_stop(key)
+
+        now = time.monotonic()
+        last = self._last_emit.get(key)
+        if last and now - last < self.throttle:
+            return
+
+        self._last_emit[key] = now
+        names = await self.names.get(uid)
+        await self.store.set(room, uid, names)
+        await self._emit(room, uid, names, True, skip_sid)
+
+    async def stop(self, room: str, uid: str, skip_sid: Optional[str] = None):
+        key = (room, uid)
+        timer = self._stop_timers.pop(key, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+        self._last_emit.pop(key, None)
+
+        names = await self.names.get(uid)
+        await self.store.clear(room, uid)
+        await self._emit(room, uid, names, False, skip_sid)
+
+    async def set_typing(self, room: str, uid: str, is_typing: bool, skip_sid: Optional[str] = None):
+        if is_typing:
+            await self.start(room, uid, skip_sid)
+        else:
+            await self.stop(room, uid, skip_sid)
+
+    async def get_typing_users(self, room: str, exclude_uid: Optional[str] = None) -> List[dict]:
+        return await self.store.get_active(room, exclude_uid)
+
+
+class RoomEventLog:
+    """Oda olaylarına artan sıra numarası verip yayınlar ve son olayları
+    sınırlı bir halka tamponda (deque maxlen) tutar.
+
+    Socket.IO yayınları süreç içi olduğundan tampon ve sayaçlar da süreç
+    içidir; sunucu yeniden başlarsa 'epoch' değişir ve istemci REST'e döner.
+    """
+
+    def __init__(self, sio, buffer_size: int = ROOM_EVENT_BUFFER_SIZE):
+        self.sio = sio
+        self.buffer_size = buffer_size
+        self.epoch = str(uuid.uuid4())
+        self._seq: Dict[str, int] = {}
+        self._buffers: Dict[str, deque] = {}
+
+    def current_seq(self, room: str) -> int:
+        return self._seq.get(room, 0)
+
+    async def emit(self, event: str, data: dict, room: str, skip_sid: Optional[str] = None) -> dict:
+        seq = self._seq.get(room, 0) + 1
+        self._seq[room] = seq
+        payload = {**data, "room": room, "seq": seq, "epoch": self.epoch}
+
+        buffer = self._buffers.get(room)
+        if buffer is None:
+            buffer = self._buffers[room] = deque(maxlen=self.buffer_size)
+        buffer.append({"seq": seq, "event": event, "data": payload})
+
+        await self.sio.emit(event, payload, room=room, skip_sid=skip_sid)
+        return payload
+
+    def replay(self, room: str, last_seq: int, epoch: Optional[str] = None) -> Optional[List[dict]]:
+        """last_seq sonrasındaki olayları döndürür; boşluk tamponda yoksa None (REST'e dönülmeli).
+        epoch zorunludur: yeniden başlatmada seq sıfırlanır, epoch'suz last_seq güvenilmez"""
+        if not epoch or epoch != self.epoch:
+            return None
+        current = self._seq.get(room, 0)
+        if last_seq >= current:
+            return []
+        buffer = self._buffers.get(room)
+        if not buffer or buffer[0]["seq"] > last_seq + 1:
+            return None
+        return [item for item in buffer if item["seq"] > last_seq]
@@ -6,6 +6,8 @@ import string
 from typing import Optional
 from pydantic import BaseModel
 
+import notification_store
+
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 class TwoFactorSetup(BaseModel):
@@ -55,17 +57,14 @@ def setup_auth_routes(db, get_current_user):
         }
         
         # Bildirim oluştur (gerçek uygulamada e-posta/SMS gönderilir)
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": current_user['uid'],
-            "type": "2fa_code",
-            "title": "İki Faktörlü Doğrulama Kodu",
-            "message": f"Doğrulama kodunuz: {code} (10 dakika geçerli)",
-            "data": {"code": code},
-            "isRead": False,
-            "timestamp": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification)
+        await notification_store.create_notification(
+            db,
+            current_user['uid'],
+            "2fa_code",
+            "İki Faktörlü Doğrulama Kodu",
+            f"Doğrulama kodunuz: {code} (10 dakika geçerli)",
+            {"code": code}
+        )
         
         return {
             "message": "Doğrulama kodu gönderildi",
@@ -154,17 +153,14 @@ def setup_auth_routes(db, get_current_user):
         }
         
         # Bildirim
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": current_user['uid'],
-            "type": "2fa_login_code",
-            "title": "Giriş Doğrulama Kodu",
-            "message": f"Giriş doğrulama kodunuz: {code}",
-            "data": {"code": code},
-            "isRead": False,
-            "timestamp": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification)
+        await notification_store.create_notification(
+            db,
+            current_user['uid'],
+            "2fa_login_code",
+            "Giriş Doğrulama Kodu",
+            f"Giriş doğrulama kodunuz: {code}",
+            {"code": code}
+        )
         
         return {
             "message": "Doğrulama kodu gönderildi",
@@ -3,6 +3,8 @@ from datetime import datetime
 import uuid
 from typing import List, Optional
 
+import notification_store
+
 badges_router = APIRouter(prefix="/badges", tags=["badges"])
 
 # Badge tanımları
@@ -190,17 +192,14 @@ def setup_badges_routes(db, get_current_user, check_global_admin):
         )
         
         # Bildirim oluştur
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": user_id,
-            "type": "badge_earned",
-            "title": "Yeni Rozet Kazandınız!",
-            "message": f"{BADGE_DEFINITIONS[badge_id]['icon']} {BADGE_DEFINITIONS[badge_id]['name']} rozeti kazandınız!",
-            "data": {"badgeId": badge_id},
-            "isRead": False,
-            "timestamp": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification)
+        await notification_store.create_notification(
+            db,
+            user_id,
+            "badge_earned",
+            "Yeni Rozet Kazandınız!",
+            f"{BADGE_DEFINITIONS[badge_id]['icon']} {BADGE_DEFINITIONS[badge_id]['name']} rozeti kazandınız!",
+            {"badgeId": badge_id}
+        )
         
         return {"message": "Rozet verildi", "badge": BADGE_DEFINITIONS[badge_id]}
     
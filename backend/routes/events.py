@@ -4,6 +4,8 @@ import uuid
 from typing import List, Optional
 from pydantic import BaseModel
 
+import notification_store
+
 events_router = APIRouter(prefix="/events", tags=["events"])
 
 class EventCreate(BaseModel):
@@ -173,17 +175,14 @@ def setup_events_routes(db, get_current_user, check_global_admin):
         
         # Etkinlik sahibine bildirim
         user = await db.users.find_one({"uid": current_user['uid']})
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": event['createdBy'],
-            "type": "event_join",
-            "title": "Yeni Katılımcı",
-            "message": f"{user.get('firstName', '')} etkinliğinize katıldı: {event['title']}",
-            "data": {"eventId": event_id},
-            "isRead": False,
-            "timestamp": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification)
+        await notification_store.create_notification(
+            db,
+            event['createdBy'],
+            "event_join",
+            "Yeni Katılımcı",
+            f"{user.get('firstName', '')} etkinliğinize katıldı: {event['title']}",
+            {"eventId": event_id}
+        )
         
         return {"message": "Etkinliğe katıldınız"}
     
@@ -249,19 +248,14 @@ def setup_events_routes(db, get_current_user, check_global_admin):
         )
         
         # Katılımcılara bildirim gönder
-        for attendee_id in event.get('attendees', []):
-            if attendee_id != current_user['uid']:
-                notification = {
-                    "id": str(uuid.uuid4()),
-                    "userId": attendee_id,
-                    "type": "event_cancelled",
-                    "title": "Etkinlik İptal Edildi",
-                    "message": f"{event['title']} etkinliği iptal edildi",
-                    "data": {"eventId": event_id},
-                    "isRead": False,
-                    "timestamp": datetime.utcnow()
-                }
-                await db.notifications.insert_one(notification)
+        await notification_store.create_notifications(
+            db,
+            [a for a in event.get('attendees', []) if a != current_user['uid']],
+            "event_cancelled",
+            "Etkinlik İptal Edildi",
+            f"{event['title']} etkinliği iptal edildi",
+            {"eventId": event_id}
+        )
         
         return {"message": "Etkinlik iptal edildi"}
     
@@ -5,6 +5,8 @@ from typing import List, Optional
 from pydantic import BaseModel
 import json
 
+import notification_store
+
 notifications_router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 class PushNotification(BaseModel):
@@ -17,18 +19,8 @@ def setup_notifications_routes(db, get_current_user):
     @notifications_router.get("/")
     async def get_notifications(current_user: dict = Depends(get_current_user), limit: int = 50):
         """Kullanıcının bildirimlerini listele"""
-        notifications = await db.notifications.find(
-            {"userId": current_user['uid']}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
-        
-        for n in notifications:
-            if '_id' in n:
-                del n['_id']
-        
-        unread_count = await db.notifications.count_documents({
-            "userId": current_user['uid'],
-            "isRead": False
-        })
+        notifications = await notification_store.list_notifications(db, current_user['uid'], limit)
+        unread_count = await notification_store.unread_count(db, current_user['uid'])
         
         return {
             "notifications": notifications,
@@ -38,12 +30,9 @@ def setup_notifications_routes(db, get_current_user):
     @notifications_router.post("/mark-read/{notification_id}")
     async def mark_as_read(notification_id: str, current_user: dict = Depends(get_current_user)):
         """Bildirimi okundu işaretle"""
-        result = await db.notifications.update_one(
-            {"id": notification_id, "userId": current_user['uid']},
-            {"$set": {"isRead": True}}
-        )
+        notification = await notification_store.mark_read(db, current_user['uid'], notification_id)
         
-        if result.matched_count == 0:
+        if not notification:
             raise HTTPException(status_code=404, detail="Bildirim bulunamadı")
         
         return {"message": "Bildirim okundu işaretlendi"}
@@ -51,22 +40,16 @@ def setup_notifications_routes(db, get_current_user):
     @notifications_router.post("/mark-all-read")
     async def mark_all_as_read(current_user: dict = Depends(get_current_user)):
         """Tüm bildirimleri okundu işaretle"""
-        await db.notifications.update_many(
-            {"userId": current_user['uid'], "isRead": False},
-            {"$set": {"isRead": True}}
-        )
+        await notification_store.mark_all_read(db, current_user['uid'])
         
         return {"message": "Tüm bildirimler okundu işaretlendi"}
     
     @notifications_router.delete("/{notification_id}")
     async def delete_notification(notification_id: str, current_user: dict = Depends(get_current_user)):
         """Bildirimi sil"""
-        result = await db.notifications.delete_one({
-            "id": notification_id,
-            "userId": current_user['uid']
-        })
+        deleted = await notification_store.delete_notification(db, current_user['uid'], notification_id)
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Bildirim bulunamadı")
         
         return {"message": "Bildirim silindi"}
@@ -74,7 +57,7 @@ def setup_notifications_routes(db, get_current_user):
     @notifications_router.delete("/")
     async def clear_all_notifications(current_user: dict = Depends(get_current_user)):
         """Tüm bildirimleri temizle"""
-        await db.notifications.delete_many({"userId": current_user['uid']})
+        await notification_store.clear_all(db, current_user['uid'])
         return {"message": "Tüm bildirimler silindi"}
     
     return notifications_router
@@ -88,21 +71,15 @@ async def send_push_notification(db, user_id: str, title: str, body: str, data:
     """
     import httpx
     
-    # Veritabanına kaydet
-    notification = {
-        "id": str(uuid.uuid4()),
-        "userId": user_id,
-        "type": data.get('type', 'general') if data else 'general',
-        "title": title,
-        "message": body,
-        "data": data or {},
-        "isRead": False,
-        "timestamp": datetime.utcnow()
-    }
-    await db.notifications.insert_one(notification)
+    # Veritabanına kaydet (okunmamış sayacı da artar)
+    notification = await notification_store.create_notification(
+        db, user_id, (data or {}).get('type', 'general'), title, body, data
+    )
     
     # Push token kontrol et
-    user = await db.users.find_one({"uid": user_id})
+    user = await db.users.find_one(
+        {"uid": user_id}, {"_id": 0, "pushToken": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+    )
     push_token = user.get('pushToken') if user else None
     
     if push_token and push_token.startswith('ExponentPushToken'):
@@ -117,7 +94,7 @@ async def send_push_notification(db, user_id: str, title: str, body: str, data:
                         "body": body,
                         "data": data or {},
                         "sound": "default",
-                        "badge": 1
+                        "badge": max(1, user.get(notification_store.UNREAD_COUNTER_FIELD) or 0)
                     },
                     headers={"Content-Type": "application/json"}
                 )
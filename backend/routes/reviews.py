@@ -4,6 +4,8 @@ import uuid
 from typing import List, Optional
 from pydantic import BaseModel
 
+import notification_store
+
 reviews_router = APIRouter(prefix="/reviews", tags=["reviews"])
 
 class ReviewCreate(BaseModel):
@@ -61,17 +63,14 @@ def setup_reviews_routes(db, get_current_user):
         await update_service_rating(db, review_data.serviceId)
         
         # Hizmet sahibine bildirim gönder
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": service['userId'],
-            "type": "new_review",
-            "title": "Yeni Değerlendirme",
-            "message": f"{user.get('firstName', '')} hizmetinizi değerlendirdi: {'⭐' * review_data.rating}",
-            "data": {"serviceId": review_data.serviceId, "reviewId": review['id']},
-            "isRead": False,
-            "timestamp": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification)
+        await notification_store.create_notification(
+            db,
+            service['userId'],
+            "new_review",
+            "Yeni Değerlendirme",
+            f"{user.get('firstName', '')} hizmetinizi değerlendirdi: {'⭐' * review_data.rating}",
+            {"serviceId": review_data.serviceId, "reviewId": review['id']}
+        )
         
         del review['_id']
         return review
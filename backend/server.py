@@ -1,13 +1,19 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request as StarletteRequest
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, BulkWriteError, ExecutionTimeout
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import os
+import asyncio
+import time
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -21,8 +27,26 @@ import json
 import hashlib
 import hmac
 import re
+import csv
+import io
 import html
 from content_moderation import moderate_content, filter_profanity, is_safe_content
+from reactions import is_valid_emoji, toggle_reaction
+from user_search import (
+    build_search_index, build_filter_query, build_search_pipeline, parse_search_result, compute_experience_years
+)
+import user_search
+import notification_store
+from autocomplete import AutocompleteIndex, AUTOCOMPLETE_USER_PROJECTION
+from popular_stats import PopularStats, POPULAR_STATS_REBUILD_SECONDS
+from pagination import encode_cursor, decode_cursor, clamp_limit, build_projection
+from timelines import TimelineEngine
+from stories_tray import StoriesTray
+from notification_coalescer import NotificationCoalescer
+from stats_counters import StatsCounters, RECONCILE_INTERVAL_SECONDS, RECONCILE_CHECK_SECONDS
+from broadcasts import BroadcastEngine
+from hashtags import HashtagEngine, TRENDING_WINDOWS, GLOBAL_SCOPE, extract_hashtags, hashtag_key
+from realtime import DisplayNameCache, TypingStore, TypingManager, SocketJSON, SocketRateLimiter, RoomEventLog
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -52,7 +76,16 @@ db = client[get_db_name_from_url(mongo_url)]
 limiter = Limiter(key_func=get_remote_address)
 
 # Socket.IO setup
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', json=SocketJSON)
+
+# Gerçek zamanlı yardımcılar (typing TTL deposu + isim önbelleği)
+display_names = DisplayNameCache(db)
+typing_store = TypingStore(db)
+typing_manager = TypingManager(sio, typing_store, display_names)
+# Socket üzerinden mesaj gönderimi için REST ile aynı limit (dakikada 60)
+socket_message_limiter = SocketRateLimiter(limit=60, period=60)
+# Oda olayları için sıra numarası + tekrar oynatma tamponu (resume)
+room_events = RoomEventLog(sio)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -157,6 +190,22 @@ TURKISH_CITIES = [
     'Tekirdağ', 'Tokat', 'Trabzon', 'Tunceli', 'Uşak', 'Van', 'Yalova', 'Yozgat', 'Zonguldak'
 ]
 
+# Otomatik tamamlama için bellek içi önek indeksi (açılışta ve periyodik olarak yenilenir)
+autocomplete_index = AutocompleteIndex(TURKISH_CITIES)
+AUTOCOMPLETE_REFRESH_SECONDS = 600
+
+# Popüler meslek / beceri sayıları (stats_occupations / stats_skills)
+occupation_stats = PopularStats(db, "stats_occupations", "occupation")
+skill_stats = PopularStats(db, "stats_skills", "skills", is_list=True)
+# Topluluk akış kovaları (GET /posts?scope=my)
+timeline_engine = TimelineEngine(db)
+# Hashtag indeksi + zaman kovalı trend sayaçları
+hashtag_engine = HashtagEngine(db)
+# Kullanıcı başına hikaye tepsisi (GET /stories)
+stories_tray = StoriesTray(db)
+# Yönetim paneli sayaçları (stats_counters)
+stats_counters = StatsCounters(db)
+
 # Dependency to verify Firebase token
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
@@ -173,6 +222,54 @@ async def check_global_admin(current_user: dict):
         return False
     return user.get('isAdmin', False) or user.get('email', '').lower() == ADMIN_EMAIL.lower()
 
+# ============================================
+# IDEMPOTENT MESAJ GÖNDERİMİ - clientMessageId
+# ============================================
+
+def get_client_message_id(data: dict) -> Optional[str]:
+    """İstemcinin ürettiği mesaj kimliği (yeniden denemelerde aynı kalır)"""
+    client_message_id = (data or {}).get('clientMessageId')
+    if not client_message_id or not isinstance(client_message_id, str):
+        return None
+    return client_message_id[:100]
+
+async def insert_message_once(collection, message: dict):
+    """Mesajı (senderId, clientMessageId) tekil olacak şekilde ekle.
+    (True, mesaj) yeni kayıt; (False, mevcut_mesaj) tekrar denemedir ve
+    çağıran yan etkileri (yayın, bildirim, sayaç) atlamalıdır."""
+    client_message_id = message.get('clientMessageId')
+    if not client_message_id:
+        message.pop('clientMessageId', None)
+        await collection.insert_one(message)
+        await stats_counters.on_insert(collection.name)
+        return True, message
+
+    query = {"senderId": message['senderId'], "clientMessageId": client_message_id}
+    existing = await collection.find_one(query, {"_id": 0})
+    if existing:
+        return False, existing
+    try:
+        await collection.insert_one(message)
+    except DuplicateKeyError:
+        # Eşzamanlı tekrar deneme - ilk kaydı döndür
+        return False, await collection.find_one(query, {"_id": 0})
+    await stats_counters.on_insert(collection.name)
+    return True, message
+
+async def upsert_and_get_previous(collection, query: dict, update: dict, projection: dict):
+    """Tekil index'li upsert; önceki belgeyi (yoksa None) döndürür.
+    İki ilk istek yarışırsa biri DuplicateKeyError alır - o anda belge vardır,
+    güncelleme bir kez daha denenir ve normal güncellemeye döner."""
+    for attempt in range(2):
+        try:
+            return await collection.find_one_and_update(
+                query, update, upsert=True, projection=projection,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            if attempt:
+                raise
+
 # Create default subgroups for a community
 async def create_default_subgroups(community_id: str, community_name: str, creator_uid: str = "system"):
     subgroup_ids = []
@@ -200,7 +297,6 @@ async def create_default_subgroups(community_id: str, community_name: str, creat
             "bannedUsers": [],
             "restrictedUsers": [],
             "pinnedMessages": [],
-            "pendingRequests": [],
             "isPublic": sg_data['isPublic'],
             "requiresApproval": True,
             "createdBy": creator_uid,
@@ -209,6 +305,7 @@ async def create_default_subgroups(community_id: str, community_name: str, creat
         }
         await db.subgroups.insert_one(new_subgroup)
         subgroup_ids.append(subgroup_id)
+    await stats_counters.inc(totalSubgroups=len(subgroup_ids))
     return subgroup_ids
 
 # Initialize city communities
@@ -250,6 +347,7 @@ async def initialize_city_communities():
                 "createdAt": datetime.utcnow()
             }
             await db.communities.insert_one(community)
+            await stats_counters.inc(totalCommunities=1)
             
             # Create default subgroups
             subgroup_ids = await create_default_subgroups(community_id, f"{city} Girişimciler")
@@ -284,7 +382,6 @@ async def initialize_city_communities():
                         "bannedUsers": [],
                         "restrictedUsers": [],
                         "pinnedMessages": [],
-                        "pendingRequests": [],
                         "isPublic": sg_data['isPublic'],
                         "requiresApproval": True,
                         "createdBy": "system",
@@ -292,6 +389,7 @@ async def initialize_city_communities():
                         "createdAt": datetime.utcnow()
                     }
                     await db.subgroups.insert_one(new_subgroup)
+                    await stats_counters.inc(totalSubgroups=1)
                     subgroup_ids.append(subgroup_id)
 
                 if subgroup_ids:
@@ -330,10 +428,8 @@ async def get_cities():
 @api_router.post("/user/register")
 @api_router.post("/register-profile")  # Alias for backward compatibility
 async def register_user(user_data: dict, current_user: dict = Depends(get_current_user)):
-    existing_user = await db.users.find_one({"uid": current_user['uid']})
+    existing_user = await db.users.find_one({"uid": current_user['uid']}, {"_id": 0, "searchIndex": 0})
     if existing_user:
-        if '_id' in existing_user:
-            del existing_user['_id']
         return existing_user
 
     email = user_data.get('email', '')
@@ -378,8 +474,14 @@ async def register_user(user_data: dict, current_user: dict = Depends(get_curren
         "communities": user_communities,
         "createdAt": datetime.utcnow()
     }
+    user_profile["searchIndex"] = build_search_index(user_profile)
 
     await db.users.insert_one(user_profile)
+    await stats_counters.on_user_created()
+    
+    user_profile.pop('searchIndex', None)
+    autocomplete_index.add_user(user_profile)
+    await occupation_stats.apply_change(None, user_profile)
     
     if '_id' in user_profile:
         del user_profile['_id']
@@ -387,7 +489,7 @@ async def register_user(user_data: dict, current_user: dict = Depends(get_curren
 
 @api_router.get("/user/profile")
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"uid": current_user['uid']})
+    user = await db.users.find_one({"uid": current_user['uid']}, {"searchIndex": 0})
     if not user:
         return {
             "uid": current_user['uid'],
@@ -459,10 +561,24 @@ async def update_user_profile(updates: dict, current_user: dict = Depends(get_cu
             allowed_socials = ['linkedin', 'twitter', 'instagram', 'website', 'github']
             filtered_updates['socialLinks'] = {k: v for k, v in links.items() if k in allowed_socials}
     
+    # Arama indeksini güncel profil ile yeniden hesapla
+    previous_user = await db.users.find_one({"uid": current_user['uid']}, {"_id": 0, "searchIndex": 0}) or {}
+    filtered_updates['searchIndex'] = build_search_index({**previous_user, **filtered_updates})
+    if 'workExperience' in filtered_updates:
+        filtered_updates['totalExperienceYears'] = compute_experience_years(filtered_updates['workExperience'])
+    
     await db.users.update_one(
         {"uid": current_user['uid']},
         {"$set": filtered_updates}
     )
+    if 'firstName' in filtered_updates or 'lastName' in filtered_updates:
+        display_names.invalidate(current_user['uid'])
+    current_profile = {**previous_user, **filtered_updates, "uid": current_user['uid']}
+    autocomplete_index.update_user(previous_user, current_profile)
+    if 'occupation' in filtered_updates:
+        await occupation_stats.apply_change(previous_user, current_profile)
+    if 'skills' in filtered_updates:
+        await skill_stats.apply_change(previous_user, current_profile)
     return {"message": "Profile updated"}
 
 @api_router.put("/user/profile-image")
@@ -626,12 +742,13 @@ async def get_community(community_id: str, current_user: dict = Depends(get_curr
         community['isSuperAdmin'] = True
     
     subgroups = await db.subgroups.find({"communityId": community_id}).to_list(100)
+    pending_subgroups = await pending_join_request_subgroups(current_user['uid'], [sg['id'] for sg in subgroups])
     for sg in subgroups:
         if '_id' in sg:
             del sg['_id']
         sg['memberCount'] = len(sg.get('members', []))
         sg['isMember'] = current_user['uid'] in sg.get('members', [])
-        sg['hasPendingRequest'] = any(r.get('uid') == current_user['uid'] for r in sg.get('pendingRequests', []))
+        sg['hasPendingRequest'] = sg['id'] in pending_subgroups
         # Okunmamış mesaj sayısını hesapla
         if sg['isMember']:
             unread_count = await db.messages.count_documents({
@@ -741,17 +858,111 @@ async def update_community_image(community_id: str, request: Request, current_us
 
 # ==================== SUBGROUPS ====================
 
-# Subgroup katılım istekleri için ayrı koleksiyon şeması (bilgi amaçlı)
+# Subgroup katılım istekleri ayrı koleksiyonda tutulur
 # subgroup_join_requests:
 #   - id
 #   - communityId
 #   - subgroupId
 #   - subgroupName
-#   - userId
+#   - userId, userName, profileImageUrl
 #   - status: pending | approved | rejected
+#   - requestedAt
+#   - decidedAt, decidedBy
 #   - createdAt
 #   - updatedAt
 
+JOIN_REQUEST_PENDING = "pending"
+JOIN_REQUEST_APPROVED = "approved"
+JOIN_REQUEST_REJECTED = "rejected"
+# Toplu onay / red isteğinde en fazla kayıt
+MAX_JOIN_REQUEST_BATCH = 500
+
+async def pending_join_request_subgroups(uid: str, subgroup_ids: list) -> set:
+    """Kullanıcının bekleyen isteği olan alt gruplar - tek sorgu"""
+    if not subgroup_ids:
+        return set()
+    requests = await db.subgroup_join_requests.find(
+        {"userId": uid, "status": JOIN_REQUEST_PENDING, "subgroupId": {"$in": subgroup_ids}},
+        {"_id": 0, "subgroupId": 1}
+    ).to_list(len(subgroup_ids))
+    return {r['subgroupId'] for r in requests}
+
+async def pending_join_request_counts(subgroup_ids: list) -> dict:
+    if not subgroup_ids:
+        return {}
+    rows = await db.subgroup_join_requests.aggregate([
+        {"$match": {"subgroupId": {"$in": subgroup_ids}, "status": JOIN_REQUEST_PENDING}},
+        {"$group": {"_id": "$subgroupId", "count": {"$sum": 1}}},
+    ]).to_list(len(subgroup_ids))
+    return {r['_id']: r['count'] for r in rows}
+
+async def decide_join_requests(query: dict, approve: bool, decided_by: str) -> int:
+    """Bekleyen istekleri toplu onayla / reddet; işlenen istek sayısı.
+    Eşzamanlı kararlar çakışmasın diye kayıtlar önce bir karar anahtarıyla sahiplenilir."""
+    ids = [r['id'] for r in await db.subgroup_join_requests.find(
+        {**query, "status": JOIN_REQUEST_PENDING}, {"_id": 0, "id": 1}
+    ).to_list(MAX_JOIN_REQUEST_BATCH)]
+    if not ids:
+        return 0
+
+    now = datetime.utcnow()
+    decision_id = str(uuid.uuid4())
+    await db.subgroup_join_requests.update_many(
+        {"id": {"$in": ids}, "status": JOIN_REQUEST_PENDING},
+        {"$set": {
+            "status": JOIN_REQUEST_APPROVED if approve else JOIN_REQUEST_REJECTED,
+            "decidedAt": now,
+            "decidedBy": decided_by,
+            "decisionId": decision_id,
+            "updatedAt": now,
+        }}
+    )
+    decided = await db.subgroup_join_requests.find(
+        {"decisionId": decision_id}, {"_id": 0, "subgroupId": 1, "userId": 1}
+    ).to_list(len(ids))
+    if not decided:
+        return 0
+
+    if approve:
+        members_by_subgroup = {}
+        for request in decided:
+            members_by_subgroup.setdefault(request['subgroupId'], []).append(request['userId'])
+        await db.subgroups.bulk_write([
+            UpdateOne({"id": subgroup_id}, {"$addToSet": {"members": {"$each": user_ids}}})
+            for subgroup_id, user_ids in members_by_subgroup.items()
+        ], ordered=False)
+    await stats_counters.inc(pendingRequests=-len(decided))
+    return len(decided)
+
+async def migrate_pending_join_requests() -> int:
+    """subgroups.pendingRequests dizilerini subgroup_join_requests koleksiyonuna taşı"""
+    migrated = 0
+    async for subgroup in db.subgroups.find(
+        {"pendingRequests": {"$exists": True}},
+        {"_id": 1, "id": 1, "communityId": 1, "name": 1, "pendingRequests": 1}
+    ):
+        requests = [{
+            "id": str(uuid.uuid4()),
+            "communityId": subgroup.get('communityId'),
+            "subgroupId": subgroup['id'],
+            "subgroupName": subgroup.get('name'),
+            "userId": r['uid'],
+            "userName": r.get('name'),
+            "profileImageUrl": r.get('profileImageUrl'),
+            "status": JOIN_REQUEST_PENDING,
+            "requestedAt": r.get('requestedAt') or datetime.utcnow(),
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
+        } for r in subgroup.get('pendingRequests') or [] if r.get('uid')]
+        if requests:
+            try:
+                await db.subgroup_join_requests.insert_many(requests, ordered=False)
+            except BulkWriteError:
+                pass  # Daha önce taşınmış istekler (tekil index)
+        await db.subgroups.update_one({"_id": subgroup['_id']}, {"$unset": {"pendingRequests": ""}})
+        migrated += len(requests)
+    return migrated
+
 
 @api_router.post("/communities/{community_id}/subgroups")
 async def create_subgroup(community_id: str, subgroup_data: dict, current_user: dict = Depends(get_current_user)):
@@ -778,7 +989,6 @@ async def create_subgroup(community_id: str, subgroup_data: dict, current_user:
         "bannedUsers": [],
         "restrictedUsers": [],
         "pinnedMessages": [],
-        "pendingRequests": [],
         "isPublic": subgroup_data.get('isPublic', True),
         "requiresApproval": subgroup_data.get('requiresApproval', True),
         "createdBy": current_user['uid'],
@@ -787,6 +997,7 @@ async def create_subgroup(community_id: str, subgroup_data: dict, current_user:
     }
 
     await db.subgroups.insert_one(new_subgroup)
+    await stats_counters.inc(totalSubgroups=1)
     await db.communities.update_one(
         {"id": community_id},
         {"$addToSet": {"subGroups": subgroup_id}}
@@ -808,7 +1019,7 @@ async def get_subgroup(subgroup_id: str, current_user: dict = Depends(get_curren
     subgroup['memberCount'] = len(subgroup.get('members', []))
     subgroup['isMember'] = current_user['uid'] in subgroup.get('members', [])
     subgroup['isGroupAdmin'] = current_user['uid'] in subgroup.get('groupAdmins', [])
-    subgroup['hasPendingRequest'] = any(r.get('uid') == current_user['uid'] for r in subgroup.get('pendingRequests', []))
+    subgroup['hasPendingRequest'] = bool(await pending_join_request_subgroups(current_user['uid'], [subgroup_id]))
 
     # Okunmamış mesaj sayısını hesapla
     unread_count = await db.messages.count_documents({
@@ -845,8 +1056,7 @@ async def request_join_subgroup(subgroup_id: str, current_user: dict = Depends(g
         raise HTTPException(status_code=400, detail="Zaten bu grubun üyesisiniz")
 
     # Check if already has pending request
-    pending = subgroup.get('pendingRequests', [])
-    if any(r.get('uid') == current_user['uid'] for r in pending):
+    if await pending_join_request_subgroups(current_user['uid'], [subgroup_id]):
         raise HTTPException(status_code=400, detail="Zaten katılma isteğiniz var")
 
     # Check if requires approval
@@ -855,15 +1065,23 @@ async def request_join_subgroup(subgroup_id: str, current_user: dict = Depends(g
         if not user:
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı. Lütfen profilinizi tamamlayın.")
         request = {
-            "uid": current_user['uid'],
-            "name": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip() or "Kullanıcı",
+            "id": str(uuid.uuid4()),
+            "communityId": subgroup.get('communityId'),
+            "subgroupId": subgroup_id,
+            "subgroupName": subgroup.get('name'),
+            "userId": current_user['uid'],
+            "userName": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip() or "Kullanıcı",
             "profileImageUrl": user.get('profileImageUrl'),
-            "requestedAt": datetime.utcnow()
+            "status": JOIN_REQUEST_PENDING,
+            "requestedAt": datetime.utcnow(),
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
         }
-        await db.subgroups.update_one(
-            {"id": subgroup_id},
-            {"$push": {"pendingRequests": request}}
-        )
+        try:
+            await db.subgroup_join_requests.insert_one(request)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Zaten katılma isteğiniz var")
+        await stats_counters.inc(pendingRequests=1)
         return {"message": "Katılma isteği gönderildi. Yönetici onayı bekleniyor.", "status": "pending"}
     else:
         # Direct join if no approval required
@@ -891,14 +1109,9 @@ async def approve_join_request(subgroup_id: str, user_id: str, current_user: dic
     if not is_group_admin and not is_super_admin and not is_global_admin:
         raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gerekiyor")
 
-    # Remove from pending and add to members
-    await db.subgroups.update_one(
-        {"id": subgroup_id},
-        {
-            "$pull": {"pendingRequests": {"uid": user_id}},
-            "$addToSet": {"members": user_id}
-        }
-    )
+    # İstek kapanır ve kullanıcı üyelere eklenir
+    if not await decide_join_requests({"subgroupId": subgroup_id, "userId": user_id}, True, current_user['uid']):
+        await db.subgroups.update_one({"id": subgroup_id}, {"$addToSet": {"members": user_id}})
 
     return {"message": "Katılma isteği onaylandı"}
 
@@ -920,10 +1133,7 @@ async def reject_join_request(subgroup_id: str, user_id: str, current_user: dict
     if not is_group_admin and not is_super_admin and not is_global_admin:
         raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gerekiyor")
 
-    await db.subgroups.update_one(
-        {"id": subgroup_id},
-        {"$pull": {"pendingRequests": {"uid": user_id}}}
-    )
+    await decide_join_requests({"subgroupId": subgroup_id, "userId": user_id}, False, current_user['uid'])
 
     return {"message": "Katılma isteği reddedildi"}
 
@@ -945,7 +1155,11 @@ async def get_pending_requests(subgroup_id: str, current_user: dict = Depends(ge
     if not is_group_admin and not is_super_admin and not is_global_admin:
         raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gerekiyor")
 
-    return subgroup.get('pendingRequests', [])
+    requests = await db.subgroup_join_requests.find(
+        {"subgroupId": subgroup_id, "status": JOIN_REQUEST_PENDING}, {"_id": 0}
+    ).sort([("requestedAt", -1), ("id", -1)]).to_list(MAX_JOIN_REQUEST_BATCH)
+    # Eski yanıt biçimi (uid / name) korunur
+    return [{**r, "uid": r['userId'], "name": r.get('userName')} for r in requests]
 
 @api_router.post("/subgroups/{subgroup_id}/join")
 async def join_subgroup(subgroup_id: str, current_user: dict = Depends(get_current_user)):
@@ -1170,6 +1384,7 @@ async def get_subgroup_messages(subgroup_id: str, skip: int = 0, limit: int = 20
         },
         {"$addToSet": {"readBy": current_user['uid']}}
     )
+    await update_read_cursor(current_user['uid'], subgroup_id, "subgroup")
 
     return messages
 
@@ -1189,12 +1404,19 @@ async def mark_subgroup_as_read(subgroup_id: str, current_user: dict = Depends(g
         },
         {"$addToSet": {"readBy": current_user['uid']}}
     )
+    await update_read_cursor(current_user['uid'], subgroup_id, "subgroup")
     
     return {"message": "Mesajlar okundu olarak işaretlendi"}
 
 @api_router.post("/subgroups/{subgroup_id}/messages")
 @limiter.limit("60/minute")  # Rate limiting - dakikada 60 mesaj
 async def send_subgroup_message(request: Request, subgroup_id: str, message_data: dict, current_user: dict = Depends(get_current_user)):
+    return await process_subgroup_message(current_user['uid'], subgroup_id, message_data)
+
+async def process_subgroup_message(uid: str, subgroup_id: str, message_data: dict) -> dict:
+    """Grup mesajı gönderme hattı (doğrulama, temizleme, kayıt, yayın, bildirim).
+    REST ucu ve Socket.IO 'send_message' olayı tarafından ortak kullanılır."""
+    current_user = {"uid": uid}
     subgroup = await db.subgroups.find_one({"id": subgroup_id})
     if not subgroup:
         raise HTTPException(status_code=404, detail="Alt grup bulunamadı")
@@ -1221,6 +1443,7 @@ async def send_subgroup_message(request: Request, subgroup_id: str, message_data
         "id": str(uuid.uuid4()),
         "groupId": subgroup_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(message_data),
         "senderName": sender_name,
         "senderProfileImage": user.get('profileImageUrl'),
         "senderOccupation": user.get('occupation', ''),
@@ -1237,15 +1460,18 @@ async def send_subgroup_message(request: Request, subgroup_id: str, message_data
         "status": "sent",
         "deliveredTo": [],
         "readBy": [current_user['uid']],
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow()
     }
 
-    await db.messages.insert_one(new_message)
+    created, new_message = await insert_message_once(db.messages, new_message)
+    if not created:
+        return new_message
     
     if '_id' in new_message:
         del new_message['_id']
     
-    await sio.emit('new_message', new_message, room=subgroup_id)
+    await room_events.emit('new_message', new_message, room=subgroup_id)
     
     # Push bildirimleri gönder (arka planda)
     try:
@@ -1278,10 +1504,10 @@ async def edit_subgroup_message(subgroup_id: str, message_id: str, data: dict, c
 
     await db.messages.update_one(
         {"id": message_id},
-        {"$set": {"content": new_content, "isEdited": True, "editedAt": datetime.utcnow()}}
+        {"$set": {"updatedAt": datetime.utcnow(), "content": new_content, "isEdited": True, "editedAt": datetime.utcnow()}}
     )
     
-    await sio.emit('message_edited', {"messageId": message_id, "content": new_content}, room=subgroup_id)
+    await room_events.emit('message_edited', {"messageId": message_id, "content": new_content}, room=subgroup_id)
     return {"message": "Mesaj düzenlendi", "success": True}
 
 @api_router.post("/subgroups/{subgroup_id}/messages/{message_id}/react")
@@ -1295,48 +1521,31 @@ async def react_to_subgroup_message(subgroup_id: str, message_id: str, data: dic
     if current_user['uid'] not in subgroup.get('members', []):
         raise HTTPException(status_code=403, detail="Bu grubun üyesi değilsiniz")
     
-    message = await db.messages.find_one({"id": message_id, "groupId": subgroup_id})
-    if not message:
-        raise HTTPException(status_code=404, detail="Mesaj bulunamadı")
-    
     emoji = data.get("emoji")
-    if not emoji:
-        raise HTTPException(status_code=400, detail="emoji gerekli")
-    
-    reactions = message.get("reactions", {})
-    user_id = current_user['uid']
-    
-    # Kullanıcının mevcut reaksiyonunu kontrol et
-    current_reaction = None
-    for em, users in reactions.items():
-        if user_id in users:
-            current_reaction = em
-            break
-    
-    # Aynı emoji ise kaldır, farklı ise güncelle
-    if current_reaction == emoji:
-        reactions[emoji].remove(user_id)
-        if not reactions[emoji]:
-            del reactions[emoji]
-    else:
-        if current_reaction:
-            reactions[current_reaction].remove(user_id)
-            if not reactions[current_reaction]:
-                del reactions[current_reaction]
-        
-        if emoji not in reactions:
-            reactions[emoji] = []
-        reactions[emoji].append(user_id)
+    if not is_valid_emoji(emoji):
+        raise HTTPException(status_code=400, detail="Geçerli bir emoji gerekli")
     
-    await db.messages.update_one(
-        {"id": message_id},
-        {"$set": {"reactions": reactions}}
+    # Atomik $addToSet/$pull + $inc (reactions.py)
+    result = await toggle_reaction(
+        db.messages,
+        {"id": message_id, "groupId": subgroup_id},
+        current_user['uid'],
+        emoji,
+        updated_at=datetime.utcnow()
     )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Mesaj bulunamadı")
     
-    # Socket ile bildir
-    await sio.emit('message_reaction', {"messageId": message_id, "reactions": reactions}, room=subgroup_id)
+    # Socket ile sadece değişikliği bildir
+    await room_events.emit('message_reaction', {
+        "messageId": message_id,
+        "userId": current_user['uid'],
+        "added": result['added'],
+        "removed": result['removed'],
+        "counts": result['delta'],
+    }, room=subgroup_id)
     
-    return {"reactions": reactions, "success": True}
+    return {"reactions": result['reactions'], "counts": result['counts'], "myReaction": result['myReaction'], "success": True}
 
 @api_router.delete("/subgroups/{subgroup_id}/messages/{message_id}")
 async def delete_subgroup_message(subgroup_id: str, message_id: str, delete_for_all: bool = False, current_user: dict = Depends(get_current_user)):
@@ -1357,7 +1566,7 @@ async def delete_subgroup_message(subgroup_id: str, message_id: str, delete_for_
     if delete_for_all or message['senderId'] == current_user['uid']:
         await db.messages.update_one(
             {"id": message_id},
-            {"$set": {"deletedForEveryone": True, "content": "Bu mesaj silindi", "isDeleted": True}}
+            {"$set": {"updatedAt": datetime.utcnow(), "deletedForEveryone": True, "content": "Bu mesaj silindi", "isDeleted": True}}
         )
     else:
         deleted_for = message.get("deletedFor", [])
@@ -1365,7 +1574,7 @@ async def delete_subgroup_message(subgroup_id: str, message_id: str, delete_for_
             deleted_for.append(current_user['uid'])
         await db.messages.update_one(
             {"id": message_id},
-            {"$set": {"deletedFor": deleted_for}}
+            {"$set": {"updatedAt": datetime.utcnow(), "deletedFor": deleted_for}}
         )
     
     return {"message": "Mesaj silindi", "success": True}
@@ -1392,7 +1601,7 @@ async def delete_message(message_id: str, current_user: dict = Depends(get_curre
 
     await db.messages.update_one(
         {"id": message_id},
-        {"$set": {"deletedForEveryone": True, "content": "Bu mesaj silindi", "isDeleted": True}}
+        {"$set": {"updatedAt": datetime.utcnow(), "deletedForEveryone": True, "content": "Bu mesaj silindi", "isDeleted": True}}
     )
     return {"message": "Mesaj silindi"}
 
@@ -1530,6 +1739,7 @@ async def send_private_message(message: dict, current_user: dict = Depends(get_c
         "id": str(uuid.uuid4()),
         "chatId": chat_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(message),
         "senderName": f"{user['firstName']} {user['lastName']}",
         "senderProfileImage": user.get('profileImageUrl'),
         "receiverId": receiver_id,
@@ -1543,15 +1753,18 @@ async def send_private_message(message: dict, current_user: dict = Depends(get_c
         "status": "sent",
         "deliveredTo": [],
         "readBy": [current_user['uid']],
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow()
     }
 
-    await db.messages.insert_one(new_message)
+    created, new_message = await insert_message_once(db.messages, new_message)
+    if not created:
+        return new_message
     
     if '_id' in new_message:
         del new_message['_id']
     
-    await sio.emit('new_private_message', new_message, room=chat_id)
+    await room_events.emit('new_private_message', new_message, room=chat_id)
     await sio.emit('new_private_message', new_message, room=f"user_{receiver_id}")
     return new_message
 
@@ -1577,19 +1790,23 @@ async def upload_media(media_data: dict, current_user: dict = Depends(get_curren
 async def typing_indicator(data: dict, current_user: dict = Depends(get_current_user)):
     room = data.get('room')  # chatId or groupId
     is_typing = data.get('isTyping', False)
-    
-    user = await db.users.find_one({"uid": current_user['uid']})
-    
-    await sio.emit('typing', {
-        "userId": current_user['uid'],
-        "userName": f"{user['firstName']} {user['lastName']}",
-        "isTyping": is_typing
-    }, room=room)
-    
+
+    if not room or not await user_can_access_room(current_user['uid'], room):
+        raise HTTPException(status_code=403, detail="Bu odaya erişim yetkiniz yok")
+
+    await typing_manager.set_typing(room, current_user['uid'], bool(is_typing))
+
     return {"message": "OK"}
 
 # ==================== USERS ====================
 
+# Arama sonuçlarında dönen alanlar
+USER_SEARCH_PROJECTION = {
+    "uid": 1, "firstName": 1, "lastName": 1, "occupation": 1, "city": 1, "profileImageUrl": 1,
+    "bio": 1, "skills": 1, "workExperience": 1, "isAdmin": 1, "createdAt": 1,
+    "totalExperienceYears": 1,
+}
+
 # Gelişmiş Kullanıcı Arama - LinkedIn tarzı
 @api_router.get("/users/search")
 async def search_users_advanced(
@@ -1608,75 +1825,36 @@ async def search_users_advanced(
     """
     Gelişmiş kullanıcı arama - meslek, şehir, beceri ve deneyime göre filtreleme
     LinkedIn kalitesinde profesyonel arama
+
+    searchIndex (user_search.py) üzerinde Türkçe katlanmış önek eşleşmesi ve
+    ilgi puanı; sonuçlar, toplam ve facet sayıları tek sorguda döner.
+    Önek eşleşmesi sonuç vermezse trigram (yazım hatası) yedeğine düşülür.
     """
-    # Temel filtre - kendini hariç tut
-    query = {"uid": {"$ne": current_user['uid']}}
-    
-    # Genel arama terimi - isim, meslek veya bio'da ara
-    if q and q.strip():
-        search_term = q.strip()
-        query["$or"] = [
-            {"firstName": {"$regex": search_term, "$options": "i"}},
-            {"lastName": {"$regex": search_term, "$options": "i"}},
-            {"occupation": {"$regex": search_term, "$options": "i"}},
-            {"bio": {"$regex": search_term, "$options": "i"}},
-            {"skills": {"$elemMatch": {"$regex": search_term, "$options": "i"}}},
-        ]
-    
-    # Meslek filtresi
-    if occupation and occupation.strip():
-        query["occupation"] = {"$regex": occupation.strip(), "$options": "i"}
-    
-    # Şehir filtresi
-    if city and city.strip():
-        query["city"] = {"$regex": city.strip(), "$options": "i"}
-    
-    # Beceri filtresi (virgülle ayrılmış birden fazla beceri)
-    if skills and skills.strip():
-        skill_list = [s.strip() for s in skills.split(",") if s.strip()]
-        if skill_list:
-            skill_conditions = [{"skills": {"$elemMatch": {"$regex": skill, "$options": "i"}}} for skill in skill_list]
-            if "$and" not in query:
-                query["$and"] = []
-            query["$and"].extend(skill_conditions)
-    
-    # İş deneyimi unvanı filtresi
-    if experience_title and experience_title.strip():
-        if "$and" not in query:
-            query["$and"] = []
-        query["$and"].append({
-            "workExperience": {
-                "$elemMatch": {"title": {"$regex": experience_title.strip(), "$options": "i"}}
-            }
-        })
-    
-    # Şirket adı filtresi
-    if experience_company and experience_company.strip():
-        if "$and" not in query:
-            query["$and"] = []
-        query["$and"].append({
-            "workExperience": {
-                "$elemMatch": {"company": {"$regex": experience_company.strip(), "$options": "i"}}
-            }
-        })
-    
-    # Sıralama
-    sort_options = {
-        "relevance": [("createdAt", -1)],  # Varsayılan
-        "name": [("firstName", 1), ("lastName", 1)],
-        "recent": [("createdAt", -1)],
-    }
-    sort_order = sort_options.get(sort_by, sort_options["relevance"])
-    
-    # Sonuçları getir
-    users = await db.users.find(query).sort(sort_order).skip(skip).limit(limit).to_list(limit)
+    limit = max(1, min(limit, 100))
+    skip = max(0, skip)
+    skill_list = [s.strip() for s in skills.split(",") if s.strip()] if skills else None
+    filters = build_filter_query(
+        exclude_uid=current_user['uid'],
+        city=city,
+        occupation=occupation,
+        skills=skill_list,
+        company=experience_company,
+        title=experience_title,
+        min_experience_years=min_experience_years,
+    )
     
-    # Toplam sonuç sayısı
-    total_count = await db.users.count_documents(query)
+    result = parse_search_result(await db.users.aggregate(
+        build_search_pipeline(q, filters, sort_by, skip, limit, USER_SEARCH_PROJECTION)
+    ).to_list(1))
+    fuzzy = False
+    if result["total"] == 0 and q and q.strip():
+        result = parse_search_result(await db.users.aggregate(
+            build_search_pipeline(q, filters, sort_by, skip, limit, USER_SEARCH_PROJECTION, fuzzy=True)
+        ).to_list(1))
+        fuzzy = True
     
-    # Hassas bilgileri temizle ve sonuçları hazırla
     result_users = []
-    for u in users:
+    for u in result["users"]:
         safe_user = {
             "uid": u.get("uid"),
             "firstName": u.get("firstName", ""),
@@ -1692,52 +1870,125 @@ async def search_users_advanced(
         }
         result_users.append(safe_user)
     
+    total_count = result["total"]
     return {
         "users": result_users,
         "total": total_count,
+        "facets": result["facets"],
+        "fuzzy": fuzzy,
         "skip": skip,
         "limit": limit,
         "hasMore": skip + len(result_users) < total_count
     }
 
+# Otomatik tamamlama (isim, meslek, beceri, şehir)
+@api_router.get("/autocomplete")
+async def autocomplete(
+    q: str = "",
+    kind: Optional[str] = None,
+    limit: int = 8,
+    current_user: dict = Depends(get_current_user)
+):
+    """Yazarken öneri - bellek içi önek indeksinden, veritabanına gitmeden.
+
+    kind: users | occupations | skills | cities (boşsa hepsi)
+    ready=False: açılıştaki ilk yükleme bitmedi, sonuçlar eksik olabilir
+    (istemci /users/search'e düşebilir)
+    """
+    return {
+        "q": q,
+        "ready": autocomplete_index.ready,
+        "results": autocomplete_index.search(q[:50], kind, limit, exclude_uid=current_user['uid'])
+    }
+
 # Popüler meslekleri getir (arama önerileri için)
 @api_router.get("/users/occupations")
 async def get_popular_occupations(current_user: dict = Depends(get_current_user)):
-    """Sistemdeki popüler meslekleri getir"""
-    pipeline = [
-        {"$match": {"occupation": {"$exists": True, "$ne": ""}}},
-        {"$group": {"_id": "$occupation", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 20}
-    ]
-    results = await db.users.aggregate(pipeline).to_list(20)
+    """Sistemdeki popüler meslekleri getir (stats_occupations, önbellekli)"""
+    results = await occupation_stats.top(20)
     return [{"occupation": r["_id"], "count": r["count"]} for r in results]
 
 # Popüler becerileri getir (arama önerileri için)
 @api_router.get("/users/skills")
 async def get_popular_skills(current_user: dict = Depends(get_current_user)):
-    """Sistemdeki popüler becerileri getir"""
-    pipeline = [
-        {"$match": {"skills": {"$exists": True, "$ne": []}}},
-        {"$unwind": "$skills"},
-        {"$group": {"_id": "$skills", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 30}
-    ]
-    results = await db.users.aggregate(pipeline).to_list(30)
+    """Sistemdeki popüler becerileri getir (stats_skills, önbellekli)"""
+    results = await skill_stats.top(30)
     return [{"skill": r["_id"], "count": r["count"]} for r in results]
 
-@api_router.get("/users")
-async def get_users(current_user: dict = Depends(get_current_user)):
-    users = await db.users.find({"uid": {"$ne": current_user['uid']}}).to_list(1000)
+# Kullanıcı listelerinde seçilebilir alanlar (2FA sırları, push token'ları vb. hiçbir zaman)
+PUBLIC_USER_FIELDS = [
+    'uid', 'firstName', 'lastName', 'occupation', 'city', 'profileImageUrl', 'bio', 'skills',
+    'isAdmin', 'createdAt',
+]
+PUBLIC_USER_DEFAULT_FIELDS = ['firstName', 'lastName', 'occupation', 'city', 'isAdmin']
+ADMIN_USER_FIELDS = PUBLIC_USER_FIELDS + [
+    'email', 'phone', 'isBanned', 'isRestricted', 'restrictedUntil', 'communities',
+]
+ADMIN_USER_DEFAULT_FIELDS = [
+    'firstName', 'lastName', 'email', 'city', 'occupation', 'isAdmin', 'isBanned',
+    'isRestricted', 'restrictedUntil', 'createdAt',
+]
+
+async def list_users_page(query: dict, projection: dict, cursor: Optional[str], limit: int) -> dict:
+    """_id'ye göre (yeniden eskiye) imleçli sayfa; limit+1 ile hasMore"""
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor)
+            query = {"$and": [query, {"_id": {"$lt": ObjectId(str(last_id))}}]}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    users = await db.users.find(query, {**projection, "_id": 1}).sort("_id", -1).limit(limit + 1).to_list(limit + 1)
+    has_more = len(users) > limit
+    users = users[:limit]
+    next_cursor = encode_cursor([str(users[-1]['_id'])]) if has_more else None
     for u in users:
-        if '_id' in u:
-            del u['_id']
-    return users
+        del u['_id']
+    return {"users": users, "nextCursor": next_cursor, "hasMore": has_more}
+
+def _name_city_conditions(search: str) -> list:
+    """İsim/şehir için arama indeksi önekleri"""
+    tokens = [t[:user_search.MAX_PREFIX_LENGTH] for t in user_search.tokenize(search)][:8]
+    if not tokens:
+        return []
+    return [
+        {"searchIndex.prefixes": {"$all": tokens}},
+        {"searchIndex.city": user_search.fold_turkish(search).strip()},
+    ]
+
+def user_list_search_query(search: Optional[str]) -> dict:
+    """Genel kullanıcı listesi araması - sadece isim/şehir (e-posta ile arama yok)"""
+    if not search or not search.strip():
+        return {}
+    conditions = _name_city_conditions(search)
+    return {"$or": conditions} if conditions else {"_id": None}
+
+def admin_user_search_query(search: Optional[str]) -> dict:
+    """İsim/şehir için arama indeksi önekleri, e-posta için çapalı önek"""
+    if not search or not search.strip():
+        return {}
+    conditions = _name_city_conditions(search)
+    conditions.append({"email": {"$regex": f"^{re.escape(search.strip())}", "$options": "i"}})
+    return {"$or": conditions}
+
+@api_router.get("/users")
+async def get_users(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    search: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Kullanıcı listesi - imleçli sayfalama, fields= ile alan seçimi, search= ile isim/şehir araması"""
+    projection = build_projection(fields, PUBLIC_USER_FIELDS, PUBLIC_USER_DEFAULT_FIELDS)
+    query = {"uid": {"$ne": current_user['uid']}}
+    search_query = user_list_search_query(search)
+    if search_query:
+        query = {"$and": [query, search_query]}
+    return await list_users_page(query, projection, cursor, clamp_limit(limit))
 
 @api_router.get("/users/{user_id}")
 async def get_user(user_id: str, current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"uid": user_id})
+    user = await db.users.find_one({"uid": user_id}, {"searchIndex": 0})
     if not user:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
     if '_id' in user:
@@ -1746,36 +1997,178 @@ async def get_user(user_id: str, current_user: dict = Depends(get_current_user))
 
 # ==================== POSTS ====================
 
+FEED_SORT = [("timestamp", -1), ("id", -1)]
+
+async def decorate_posts(posts: list, uid: str) -> list:
+    """likeCount / commentCount sayaçlardan; isLiked sayfa için tek $in sorgusuyla"""
+    post_ids = [p['id'] for p in posts if p.get('id')]
+    liked_ids = set()
+    if post_ids:
+        liked = await db.post_likes.find(
+            {"uid": uid, "postId": {"$in": post_ids}}, {"_id": 0, "postId": 1}
+        ).to_list(len(post_ids))
+        liked_ids = {l['postId'] for l in liked}
+    for post in posts:
+        post.pop('_id', None)
+        # Sayaçlara taşınmamış eski gönderiler (arka plan göçü bitene kadar)
+        legacy_likes = post.pop('likes', None)
+        legacy_comments = post.pop('comments', None)
+        if 'likeCount' not in post:
+            post['likeCount'] = len(legacy_likes or [])
+            if uid in (legacy_likes or []):
+                liked_ids.add(post.get('id'))
+        if 'commentCount' not in post:
+            post['commentCount'] = len(legacy_comments or [])
+        post['isLiked'] = post.get('id') in liked_ids
+    return posts
+
+async def migrate_single_post_counters(post_id: str):
+    """Gömülü likes/comments dizilerini post_likes + likeCount/commentCount sayaçlarına taşı"""
+    post = await db.posts.find_one({"id": post_id, "likeCount": {"$exists": False}}, {"_id": 1, "id": 1, "likes": 1})
+    if not post:
+        return
+    likes = list(dict.fromkeys(post.get('likes') or []))
+    if likes:
+        try:
+            await db.post_likes.insert_many(
+                [{"postId": post_id, "uid": uid, "createdAt": datetime.utcnow()} for uid in likes], ordered=False
+            )
+        except BulkWriteError:
+            # Daha önce kısmen taşınmış - tekrar eden kayıtlar atlanır
+            pass
+    await db.posts.update_one(
+        {"_id": post['_id'], "likeCount": {"$exists": False}},
+        {"$set": {
+            "likeCount": await db.post_likes.count_documents({"postId": post_id}),
+            "commentCount": await db.comments.count_documents({"postId": post_id}),
+        }, "$unset": {"likes": "", "comments": ""}}
+    )
+
+async def migrate_post_counters(batch_size: int = 200) -> int:
+    """Sayaçları olmayan tüm eski gönderileri taşı (arka plan)
+
+    _id sırasıyla sayfalanır; taşınamayan bir gönderi aynı partide tekrar
+    gelmez, döngü her gönderiyi en fazla bir kez dener.
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"likeCount": {"$exists": False}, "id": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        posts = await db.posts.find(query, {"_id": 1, "id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not posts:
+            return migrated
+        for post in posts:
+            await migrate_single_post_counters(post['id'])
+        last_id = posts[-1]['_id']
+        migrated += len(posts)
+
+def decode_feed_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        ts, last_id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    return ts, last_id
+
+def feed_cursor_query(position: Optional[tuple]) -> dict:
+    """(timestamp, id) konumundan sonraki (daha eski) gönderiler"""
+    if not position:
+        return {}
+    ts, last_id = position
+    return {"$or": [
+        {"timestamp": {"$lt": ts}},
+        {"timestamp": ts, "id": {"$lt": last_id}},
+    ]}
+
+async def backfill_post_community_ids(batch_size: int = 500) -> int:
+    """Eski gönderilere yazarın topluluklarını ekle (topluluk akışları için)"""
+    updated = 0
+    while True:
+        posts = await db.posts.find(
+            {"communityIds": {"$exists": False}}, {"_id": 1, "userId": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not posts:
+            return updated
+        author_ids = list({p.get('userId') for p in posts})
+        authors = await db.users.find(
+            {"uid": {"$in": author_ids}}, {"_id": 0, "uid": 1, "communities": 1}
+        ).to_list(len(author_ids))
+        communities_by_author = {a['uid']: a.get('communities') or [] for a in authors}
+        for post in posts:
+            await db.posts.update_one(
+                {"_id": post['_id']},
+                {"$set": {"communityIds": communities_by_author.get(post.get('userId'), [])}}
+            )
+        updated += len(posts)
+
+async def backfill_post_timestamps() -> int:
+    """Sadece createdAt'i olan eski gönderilere timestamp yaz (tek sıralama anahtarı)"""
+    result = await db.posts.update_many(
+        {"timestamp": {"$exists": False}},
+        [{"$set": {"timestamp": {"$ifNull": [
+            {"$convert": {"input": "$createdAt", "to": "date", "onError": None, "onNull": None}},
+            {"$toDate": "$_id"},
+        ]}}}]
+    )
+    return result.modified_count
+
+async def get_my_timeline_posts(uid: str, position: Optional[tuple], limit: int) -> tuple:
+    """Topluluk kovalarından sayfa; kovalar yetmezse communityIds index'inden çek"""
+    user = await db.users.find_one({"uid": uid}, {"_id": 0, "communities": 1})
+    community_ids = (user or {}).get('communities') or []
+    if not community_ids:
+        return [], False
+
+    page = await timeline_engine.page(community_ids, position, limit)
+    if page is not None:
+        post_ids, has_more = page
+        by_id = {p['id']: p for p in await db.posts.find({"id": {"$in": post_ids}}).to_list(len(post_ids))}
+        return [by_id[pid] for pid in post_ids if pid in by_id], has_more
+
+    query = {"communityIds": {"$in": community_ids}, **feed_cursor_query(position)}
+    posts = await db.posts.find(query).sort(FEED_SORT).limit(limit + 1).to_list(limit + 1)
+    return posts[:limit], len(posts) > limit
+
 @api_router.get("/posts")
 async def get_posts(
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
+    includeTotal: bool = False,
+    scope: str = "all",  # all, my (topluluklarımın akışı)
     current_user: dict = Depends(get_current_user)
 ):
-    """Tüm gönderileri getir - yeni kullanıcılar da eski gönderileri görebilir"""
-    # Yeniden eskiye sıralı gönderiler - timestamp veya createdAt alanına göre
-    posts = await db.posts.find().sort([("timestamp", -1), ("createdAt", -1)]).skip(skip).limit(limit).to_list(limit)
-    
-    # Toplam post sayısı
-    total_count = await db.posts.count_documents({})
-    
-    # Timestamp'i olmayan gönderiler için createdAt'i kullan
-    for post in posts:
-        if '_id' in post:
-            del post['_id']
-        post['isLiked'] = current_user['uid'] in post.get('likes', [])
-        post['likeCount'] = len(post.get('likes', []))
-        post['commentCount'] = len(post.get('comments', []))
-        
-        # Timestamp yoksa createdAt'i kullan
-        if not post.get('timestamp') and post.get('createdAt'):
-            post['timestamp'] = post['createdAt']
-    
-    return {
+    """Tüm gönderileri getir - yeni kullanıcılar da eski gönderileri görebilir
+
+    (timestamp, id) imleciyle sayfalanır; hasMore limit+1 kayıt çekilerek
+    belirlenir. skip sadece eski istemciler için (imleç yoksa) desteklenir.
+    scope=my: kullanıcının topluluklarının önceden hesaplanmış akışı.
+    """
+    limit = max(1, min(limit, 50))
+    position = decode_feed_cursor(cursor)
+    if scope == "my":
+        posts, has_more = await get_my_timeline_posts(current_user['uid'], position, limit)
+    else:
+        find = db.posts.find(feed_cursor_query(position)).sort(FEED_SORT)
+        if not cursor and skip > 0:
+            find = find.skip(skip)
+        posts = await find.limit(limit + 1).to_list(limit + 1)
+        has_more = len(posts) > limit
+        posts = posts[:limit]
+    await decorate_posts(posts, current_user['uid'])
+    
+    response = {
         "posts": posts,
-        "total": total_count,
-        "hasMore": skip + limit < total_count
+        "nextCursor": encode_cursor([posts[-1]['timestamp'], posts[-1]['id']]) if has_more else None,
+        "hasMore": has_more
     }
+    if includeTotal:
+        # Yaklaşık toplam - koleksiyon meta verisinden, tarama yapmadan
+        response["total"] = await db.posts.estimated_document_count()
+    return response
 
 @api_router.post("/posts")
 @limiter.limit("30/minute")  # Rate limiting - dakikada 30 post
@@ -1792,6 +2185,8 @@ async def create_post(request: Request, post: dict, current_user: dict = Depends
     if not content:
         raise HTTPException(status_code=400, detail="Gönderi içeriği boş olamaz")
 
+    hashtags = extract_hashtags(content, post.get('hashtags'))
+
     new_post = {
         "id": str(uuid.uuid4()),
         "userId": current_user['uid'],
@@ -1803,14 +2198,20 @@ async def create_post(request: Request, post: dict, current_user: dict = Depends
         "mediaType": post.get('mediaType', 'text'),  # 'text', 'image', 'video'
         "location": location,
         "mentions": post.get('mentions', []),
-        "hashtags": post.get('hashtags', []),  # Hashtag desteği
-        "likes": [],
-        "comments": [],
+        "hashtags": hashtags,  # Hashtag desteği
+        "hashtagKeys": [hashtag_key(t) for t in hashtags],
+        "likeCount": 0,  # Beğeniler post_likes koleksiyonunda
+        "commentCount": 0,
         "shares": 0,
+        # Yazarın toplulukları - topluluk akışları için
+        "communityIds": user.get('communities') or [],
         "timestamp": datetime.utcnow()
     }
 
     await db.posts.insert_one(new_post)
+    await stats_counters.inc(totalPosts=1)
+    timeline_engine.fan_out(new_post)
+    hashtag_engine.record(new_post)
     
     # Etiketlenen kullanıcılara bildirim gönder
     from routes.notifications import send_push_notification
@@ -1830,32 +2231,43 @@ async def create_post(request: Request, post: dict, current_user: dict = Depends
 
 @api_router.post("/posts/{post_id}/like")
 async def toggle_like_post(post_id: str, current_user: dict = Depends(get_current_user)):
-    post = await db.posts.find_one({"id": post_id})
+    """Beğen / beğeniyi geri al - post_likes benzersiz index'i yarışları çözer"""
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "id": 1, "userId": 1, "likeCount": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
+    if 'likeCount' not in post:
+        # Eski biçimdeki gönderi - sayaçlara taşınmadan beğeni uygulanmaz
+        await migrate_single_post_counters(post_id)
 
-    likes = post.get('likes', [])
-    if current_user['uid'] in likes:
-        await db.posts.update_one(
-            {"id": post_id},
-            {"$pull": {"likes": current_user['uid']}}
-        )
-        return {"liked": False, "likeCount": len(likes) - 1}
-    else:
-        await db.posts.update_one(
-            {"id": post_id},
-            {"$addToSet": {"likes": current_user['uid']}}
-        )
-        
+    uid = current_user['uid']
+    try:
+        await db.post_likes.insert_one({"postId": post_id, "uid": uid, "createdAt": datetime.utcnow()})
+        liked = True
+    except DuplicateKeyError:
+        result = await db.post_likes.delete_one({"postId": post_id, "uid": uid})
+        liked = False
+        if not result.deleted_count:
+            # Eşzamanlı başka bir istek zaten kaldırdı
+            updated = await db.posts.find_one({"id": post_id}, {"_id": 0, "likeCount": 1})
+            return {"liked": False, "likeCount": max(0, (updated or {}).get('likeCount', 0))}
+
+    updated = await db.posts.find_one_and_update(
+        {"id": post_id},
+        {"$inc": {"likeCount": 1 if liked else -1}},
+        projection={"_id": 0, "likeCount": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    like_count = max(0, (updated or {}).get('likeCount', 0))
+
+    if liked:
         # Beğeni bildirimi gönder
         try:
-            user = await db.users.find_one({"uid": current_user['uid']})
-            liker_name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip() if user else "Birisi"
-            await notify_post_like(post['userId'], current_user['uid'], liker_name, post_id)
+            liker_name = (await display_names.get(uid))['name']
+            await notify_post_like(post['userId'], uid, liker_name, post_id)
         except Exception as e:
             logging.error(f"Error sending like notification: {e}")
-        
-        return {"liked": True, "likeCount": len(likes) + 1}
+
+    return {"liked": liked, "likeCount": like_count}
 
 @api_router.get("/posts/{post_id}/comments")
 async def get_post_comments(post_id: str, current_user: dict = Depends(get_current_user)):
@@ -1868,6 +2280,11 @@ async def get_post_comments(post_id: str, current_user: dict = Depends(get_curre
 @api_router.post("/posts/{post_id}/comments")
 async def add_comment(post_id: str, comment_data: dict, current_user: dict = Depends(get_current_user)):
     user = await db.users.find_one({"uid": current_user['uid']})
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "likeCount": 1})
+    if not post:
+        raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
+    if 'likeCount' not in post:
+        await migrate_single_post_counters(post_id)
 
     new_comment = {
         "id": str(uuid.uuid4()),
@@ -1881,10 +2298,7 @@ async def add_comment(post_id: str, comment_data: dict, current_user: dict = Dep
     }
 
     await db.comments.insert_one(new_comment)
-    await db.posts.update_one(
-        {"id": post_id},
-        {"$push": {"comments": {"id": new_comment['id'], "userId": current_user['uid']}}}
-    )
+    await db.posts.update_one({"id": post_id}, {"$inc": {"commentCount": 1}})
 
     if '_id' in new_comment:
         del new_comment['_id']
@@ -1902,7 +2316,12 @@ async def delete_post(post_id: str, current_user: dict = Depends(get_current_use
     if post['userId'] != current_user['uid'] and not is_global_admin:
         raise HTTPException(status_code=403, detail="Bu gönderiyi silme yetkiniz yok")
         
-    await db.posts.delete_one({"id": post_id})
+    result = await db.posts.delete_one({"id": post_id})
+    await stats_counters.inc(totalPosts=-result.deleted_count)
+    await timeline_engine.remove(post_id, post.get('communityIds') or [])
+    await hashtag_engine.unrecord(post)
+    await db.post_likes.delete_many({"postId": post_id})
+    await db.comments.delete_many({"postId": post_id})
     return {"message": "Gönderi silindi"}
 
 # ============================================
@@ -1955,21 +2374,67 @@ async def unpin_post(post_id: str, current_user: dict = Depends(get_current_user
 async def get_pinned_posts(current_user: dict = Depends(get_current_user)):
     """Sabitlenmiş gönderileri getir"""
     pinned_posts = await db.posts.find({"isPinned": True}).sort("pinnedAt", -1).to_list(20)
-    for post in pinned_posts:
-        if '_id' in post:
-            del post['_id']
-        post['likes'] = post.get('likes', [])
-        post['likeCount'] = len(post['likes'])
-        post['isLiked'] = current_user['uid'] in post['likes']
-        post['commentCount'] = len(post.get('comments', []))
+    await decorate_posts(pinned_posts, current_user['uid'])
     return pinned_posts
 
+# /posts/pinned gibi sabit yollardan sonra tanımlanmalı
+@api_router.get("/posts/{post_id}")
+async def get_post(post_id: str, current_user: dict = Depends(get_current_user)):
+    post = await db.posts.find_one({"id": post_id})
+    if not post:
+        raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
+    await decorate_posts([post], current_user['uid'])
+    return post
+
+# ==================== HASHTAGS ====================
+
+@api_router.get("/hashtags/trending")
+async def get_trending_hashtags(
+    window: str = "24h",  # 1h, 24h, 7d
+    community: Optional[str] = None,  # şehir topluluğu id'si (boşsa genel)
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Kayan pencerede en çok kullanılan etiketler"""
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(status_code=400, detail="Geçersiz zaman aralığı (1h, 24h, 7d)")
+    limit = max(1, min(limit, 50))
+    if community and not await db.communities.find_one({"id": community}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Topluluk bulunamadı")
+    hashtags = await hashtag_engine.trending(window, community or GLOBAL_SCOPE, limit)
+    return {"window": window, "community": community, "hashtags": hashtags}
+
+@api_router.get("/hashtags/{tag}/posts")
+async def get_hashtag_posts(
+    tag: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    community: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Etikete ait gönderiler - yeniden eskiye, imleçli"""
+    key = hashtag_key(tag)
+    if not key:
+        raise HTTPException(status_code=400, detail="Geçersiz etiket")
+    limit = max(1, min(limit, 50))
+    query = {"hashtagKeys": key, **feed_cursor_query(decode_feed_cursor(cursor))}
+    if community:
+        query["communityIds"] = community
+    posts = await db.posts.find(query).sort(FEED_SORT).limit(limit + 1).to_list(limit + 1)
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    await decorate_posts(posts, current_user['uid'])
+    return {
+        "tag": key,
+        "posts": posts,
+        "nextCursor": encode_cursor([posts[-1]['timestamp'], posts[-1]['id']]) if has_more else None,
+        "hasMore": has_more
+    }
+
 @api_router.get("/my-posts")
 async def get_my_posts(current_user: dict = Depends(get_current_user)):
     posts = await db.posts.find({"userId": current_user['uid']}).sort("timestamp", -1).to_list(100)
-    for post in posts:
-        if '_id' in post:
-            del post['_id']
+    await decorate_posts(posts, current_user['uid'])
     return posts
 
 # ==================== SERVICES ====================
@@ -2014,6 +2479,7 @@ async def create_service(service: dict, current_user: dict = Depends(get_current
     }
 
     await db.services.insert_one(new_service)
+    await stats_counters.inc(totalServices=1)
     
     if '_id' in new_service:
         del new_service['_id']
@@ -2024,7 +2490,8 @@ async def delete_service(service_id: str, current_user: dict = Depends(get_curre
     service = await db.services.find_one({"id": service_id, "userId": current_user['uid']})
     if not service:
         raise HTTPException(status_code=404, detail="Hizmet bulunamadı")
-    await db.services.delete_one({"id": service_id})
+    result = await db.services.delete_one({"id": service_id})
+    await stats_counters.inc(totalServices=-result.deleted_count)
     return {"message": "Hizmet silindi"}
 
 @api_router.get("/my-services")
@@ -2045,21 +2512,14 @@ async def get_notifications(
     unread_only: bool = False  # Sadece okunmamışları getir
 ):
     """Kullanıcının bildirimlerini döner - filtreleme destekli"""
-    query = {"userId": current_user['uid']}
-    
-    # Tip filtresi
-    if type:
-        query["type"] = type
-    
-    # Sadece okunmamışlar
-    if unread_only:
-        query["isRead"] = False
-    
-    notifications = await db.notifications.find(query).sort("timestamp", -1).to_list(50)
-    for notification in notifications:
-        if '_id' in notification:
-            del notification['_id']
-    return notifications
+    return await notification_store.list_notifications(
+        db, current_user['uid'], 50, type=type, unread_only=unread_only
+    )
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    """Bildirim rozeti - kullanıcı belgesindeki sayaçtan"""
+    return {"unreadCount": await notification_store.unread_count(db, current_user['uid'])}
 
 # Bildirim ayarları endpoint'i
 @api_router.get("/user/notification-settings")
@@ -2077,7 +2537,8 @@ async def get_notification_settings(current_user: dict = Depends(get_current_use
         "emailNotifications": False,
         "quietHoursEnabled": False,
         "quietHoursStart": "22:00",
-        "quietHoursEnd": "08:00"
+        "quietHoursEnd": "08:00",
+        "groupMessageDigest": False  # Grup mesajları için anlık push yerine periyodik özet
     })
     return settings
 
@@ -2087,7 +2548,8 @@ async def update_notification_settings(settings: dict, current_user: dict = Depe
     allowed_settings = [
         'messages', 'likes', 'comments', 'follows', 'mentions', 
         'events', 'announcements', 'emailNotifications',
-        'quietHoursEnabled', 'quietHoursStart', 'quietHoursEnd'
+        'quietHoursEnabled', 'quietHoursStart', 'quietHoursEnd',
+        'groupMessageDigest'
     ]
     filtered_settings = {k: v for k, v in settings.items() if k in allowed_settings}
     
@@ -2100,27 +2562,21 @@ async def update_notification_settings(settings: dict, current_user: dict = Depe
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
     """Bildirimi okundu olarak işaretler"""
-    result = await db.notifications.update_one(
-        {"id": notification_id, "userId": current_user['uid']},
-        {"$set": {"isRead": True}}
-    )
-    if result.modified_count == 0:
+    notification = await notification_store.mark_read(db, current_user['uid'], notification_id)
+    if not notification:
         raise HTTPException(status_code=404, detail="Bildirim bulunamadı")
     return {"message": "Bildirim okundu olarak işaretlendi"}
 
 @api_router.put("/notifications/read-all")
 async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
     """Tüm bildirimleri okundu olarak işaretler"""
-    await db.notifications.update_many(
-        {"userId": current_user['uid'], "isRead": False},
-        {"$set": {"isRead": True}}
-    )
+    await notification_store.mark_all_read(db, current_user['uid'])
     return {"message": "Tüm bildirimler okundu olarak işaretlendi"}
 
 @api_router.delete("/notifications")
 async def clear_all_notifications(current_user: dict = Depends(get_current_user)):
     """Tüm bildirimleri sil"""
-    await db.notifications.delete_many({"userId": current_user['uid']})
+    await notification_store.clear_all(db, current_user['uid'])
     return {"message": "Tüm bildirimler silindi"}
 
 # ==================== PINNED MESSAGES ====================
@@ -2144,8 +2600,8 @@ async def pin_message(subgroup_id: str, message_id: str, current_user: dict = De
     if not message:
         raise HTTPException(status_code=404, detail="Mesaj bulunamadı")
     
-    await db.messages.update_one({"id": message_id}, {"$set": {"isPinned": True, "pinnedAt": datetime.utcnow()}})
-    await sio.emit('message_pinned', {"messageId": message_id}, room=subgroup_id)
+    await db.messages.update_one({"id": message_id}, {"$set": {"updatedAt": datetime.utcnow(), "isPinned": True, "pinnedAt": datetime.utcnow()}})
+    await room_events.emit('message_pinned', {"messageId": message_id}, room=subgroup_id)
     return {"message": "Mesaj sabitlendi"}
 
 @api_router.delete("/subgroups/{subgroup_id}/messages/{message_id}/pin")
@@ -2162,8 +2618,8 @@ async def unpin_message(subgroup_id: str, message_id: str, current_user: dict =
     if not is_global_admin and not is_group_admin:
         raise HTTPException(status_code=403, detail="Mesaj sabitleme yetkisi yok")
     
-    await db.messages.update_one({"id": message_id}, {"$set": {"isPinned": False}})
-    await sio.emit('message_unpinned', {"messageId": message_id}, room=subgroup_id)
+    await db.messages.update_one({"id": message_id}, {"$set": {"updatedAt": datetime.utcnow(), "isPinned": False}})
+    await room_events.emit('message_unpinned', {"messageId": message_id}, room=subgroup_id)
     return {"message": "Sabitleme kaldırıldı"}
 
 @api_router.get("/subgroups/{subgroup_id}/pinned-messages")
@@ -2177,6 +2633,54 @@ async def get_pinned_messages(subgroup_id: str, current_user: dict = Depends(get
 
 # ==================== POLLS ====================
 
+# Oylar polls belgesinde değil poll_votes koleksiyonunda tutulur:
+# {pollId, uid, optionIds, createdAt, updatedAt} - (pollId, uid) tekil.
+# Seçenekler sadece voteCount taşır; seçmen listeleri /voters ile sayfalı okunur.
+
+async def ensure_poll_counters(poll: dict) -> dict:
+    """Eski (options[].votes listeli) anketleri sayaç modeline taşı"""
+    options = poll.get('options', [])
+    if all('voteCount' in opt for opt in options):
+        return poll
+
+    voters = {}
+    new_options = []
+    for index, opt in enumerate(options):
+        # Kimliksiz seçeneklere deterministik id: eşzamanlı göçler aynı id'leri üretir
+        option_id = opt.get('id') or str(uuid.uuid5(uuid.NAMESPACE_URL, f"poll:{poll['id']}:{index}"))
+        for uid in opt.get('votes', []):
+            voters.setdefault(uid, []).append(option_id)
+        new_options.append({"id": option_id, "text": opt.get('text', ''), "voteCount": len(set(opt.get('votes', [])))})
+
+    now = datetime.utcnow()
+    for uid, option_ids in voters.items():
+        try:
+            await db.poll_votes.update_one(
+                {"pollId": poll['id'], "uid": uid},
+                {"$setOnInsert": {"optionIds": option_ids, "createdAt": now, "updatedAt": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Başka bir göç / oy aynı kaydı az önce ekledi
+            pass
+    await db.polls.update_one(
+        {"id": poll['id'], "options.voteCount": {"$exists": False}},
+        {"$set": {"options": new_options, "totalVoters": len(voters)}}
+    )
+    return await db.polls.find_one({"id": poll['id']}, {"_id": 0})
+
+def format_poll(poll: dict, my_option_ids: Optional[list] = None) -> dict:
+    """Anketi istemciye döndür - seçmen listesi yerine sayılar"""
+    if '_id' in poll:
+        del poll['_id']
+    poll['options'] = [
+        {"id": opt.get('id'), "text": opt.get('text', ''), "voteCount": opt.get('voteCount', 0)}
+        for opt in poll.get('options', [])
+    ]
+    poll['totalVoters'] = poll.get('totalVoters', 0)
+    poll['myVotes'] = my_option_ids or []
+    return poll
+
 @api_router.post("/subgroups/{subgroup_id}/polls")
 async def create_poll(subgroup_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Anket oluştur"""
@@ -2193,7 +2697,8 @@ async def create_poll(subgroup_id: str, data: dict, current_user: dict = Depends
         "id": str(uuid.uuid4()),
         "groupId": subgroup_id,
         "question": data.get('question', ''),
-        "options": [{"id": str(uuid.uuid4()), "text": opt, "votes": []} for opt in data.get('options', [])],
+        "options": [{"id": str(uuid.uuid4()), "text": opt, "voteCount": 0} for opt in data.get('options', [])],
+        "totalVoters": 0,
         "creatorId": current_user['uid'],
         "creatorName": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip(),
         "allowMultiple": data.get('allowMultiple', False),
@@ -2204,43 +2709,141 @@ async def create_poll(subgroup_id: str, data: dict, current_user: dict = Depends
     }
     
     await db.polls.insert_one(poll)
-    del poll['_id']
-    await sio.emit('new_poll', poll, room=subgroup_id)
+    poll = format_poll(poll)
+    await room_events.emit('new_poll', poll, room=subgroup_id)
     return poll
 
 @api_router.get("/subgroups/{subgroup_id}/polls")
 async def get_polls(subgroup_id: str, current_user: dict = Depends(get_current_user)):
     """Grup anketlerini getir"""
-    polls = await db.polls.find({"groupId": subgroup_id, "isActive": True}).sort("createdAt", -1).to_list(20)
-    for poll in polls:
-        if '_id' in poll:
-            del poll['_id']
-    return polls
+    polls = await db.polls.find({"groupId": subgroup_id, "isActive": True}, {"_id": 0}).sort("createdAt", -1).to_list(20)
+    polls = [await ensure_poll_counters(poll) for poll in polls]
+    
+    # Kullanıcının oyları tek sorguda
+    my_votes = await db.poll_votes.find(
+        {"pollId": {"$in": [p['id'] for p in polls]}, "uid": current_user['uid']},
+        {"_id": 0, "pollId": 1, "optionIds": 1}
+    ).to_list(len(polls) or 1)
+    my_votes_map = {v['pollId']: v.get('optionIds', []) for v in my_votes}
+    
+    return [format_poll(poll, my_votes_map.get(poll['id'])) for poll in polls]
 
 @api_router.post("/subgroups/{subgroup_id}/polls/{poll_id}/vote")
 async def vote_poll(subgroup_id: str, poll_id: str, data: dict, current_user: dict = Depends(get_current_user)):
-    """Ankete oy ver"""
-    poll = await db.polls.find_one({"id": poll_id, "groupId": subgroup_id})
+    """Ankete oy ver (tekrar oy vermek önceki seçimi değiştirir)"""
+    poll = await db.polls.find_one({"id": poll_id, "groupId": subgroup_id}, {"_id": 0})
     if not poll:
         raise HTTPException(status_code=404, detail="Anket bulunamadı")
+    poll = await ensure_poll_counters(poll)
     
+    valid_option_ids = [opt['id'] for opt in poll['options']]
     option_ids = data.get('optionIds', [])
-    if not poll.get('allowMultiple') and len(option_ids) > 1:
+    # Eski istemci: {"optionIndex": n}
+    if not option_ids and isinstance(data.get('optionIndex'), int) and 0 <= data['optionIndex'] < len(valid_option_ids):
+        option_ids = [valid_option_ids[data['optionIndex']]]
+    option_ids = list(dict.fromkeys(option_ids))
+    
+    if any(option_id not in valid_option_ids for option_id in option_ids):
+        raise HTTPException(status_code=400, detail="Geçersiz seçenek")
+    if not (poll.get('allowMultiple') or poll.get('multipleChoice')) and len(option_ids) > 1:
         raise HTTPException(status_code=400, detail="Bu ankette tek seçim yapılabilir")
     
-    # Önceki oyları kaldır
-    for opt in poll['options']:
-        if current_user['uid'] in opt['votes']:
-            opt['votes'].remove(current_user['uid'])
+    # Oy kaydı (pollId, uid) tekil; önceki seçim farkı sayaçlara uygulanır
+    now = datetime.utcnow()
+    if option_ids:
+        previous = await upsert_and_get_previous(
+            db.poll_votes,
+            {"pollId": poll_id, "uid": current_user['uid']},
+            {"$set": {"optionIds": option_ids, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+            {"_id": 0, "optionIds": 1}
+        )
+    else:
+        # Boş seçim = oyu geri çek
+        previous = await db.poll_votes.find_one_and_delete(
+            {"pollId": poll_id, "uid": current_user['uid']},
+            projection={"_id": 0, "optionIds": 1}
+        )
+    previous_ids = previous.get('optionIds', []) if previous else []
+    
+    added_ids = [option_id for option_id in option_ids if option_id not in previous_ids]
+    removed_ids = [option_id for option_id in previous_ids if option_id not in option_ids]
+    counts_inc = {}
+    array_filters = []
+    for i, option_id in enumerate(added_ids):
+        counts_inc[f"options.$[a{i}].voteCount"] = 1
+        array_filters.append({f"a{i}.id": option_id})
+    for i, option_id in enumerate(removed_ids):
+        counts_inc[f"options.$[r{i}].voteCount"] = -1
+        array_filters.append({f"r{i}.id": option_id})
+    if previous is None and option_ids:
+        counts_inc["totalVoters"] = 1
+    elif previous is not None and not option_ids:
+        counts_inc["totalVoters"] = -1
+    
+    if counts_inc:
+        poll = await db.polls.find_one_and_update(
+            {"id": poll_id},
+            {"$inc": counts_inc},
+            array_filters=array_filters or None,
+            projection={"_id": 0, "options": 1, "totalVoters": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        # Socket ile sadece sayılar
+        await room_events.emit('poll_updated', {
+            "pollId": poll_id,
+            "counts": {opt['id']: opt.get('voteCount', 0) for opt in poll['options']},
+            "totalVoters": poll.get('totalVoters', 0),
+        }, room=subgroup_id)
     
-    # Yeni oyları ekle
-    for opt in poll['options']:
-        if opt['id'] in option_ids:
-            opt['votes'].append(current_user['uid'])
+    return {
+        "message": "Oyunuz kaydedildi",
+        "myVotes": option_ids,
+        "counts": {opt['id']: opt.get('voteCount', 0) for opt in poll['options']},
+        "totalVoters": poll.get('totalVoters', 0),
+    }
+
+@api_router.get("/subgroups/{subgroup_id}/polls/{poll_id}/voters")
+async def get_poll_voters(subgroup_id: str, poll_id: str, optionId: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50, current_user: dict = Depends(get_current_user)):
+    """Anket seçmenlerini sayfalı getir (anonim anketlerde kapalı)"""
+    poll = await db.polls.find_one({"id": poll_id, "groupId": subgroup_id}, {"_id": 0, "id": 1, "isAnonymous": 1, "options": 1})
+    if not poll:
+        raise HTTPException(status_code=404, detail="Anket bulunamadı")
+    if poll.get('isAnonymous'):
+        raise HTTPException(status_code=403, detail="Anonim ankette seçmenler gösterilmez")
+    await ensure_poll_counters(poll)
+    
+    limit = max(1, min(limit, 100))
+    query = {"pollId": poll_id}
+    if optionId:
+        query["optionIds"] = optionId
+    if cursor:
+        query["uid"] = {"$gt": cursor}
+    
+    votes = await db.poll_votes.find(query, {"_id": 0, "uid": 1, "optionIds": 1}).sort("uid", 1).limit(limit + 1).to_list(limit + 1)
+    has_more = len(votes) > limit
+    votes = votes[:limit]
+    
+    users = await db.users.find(
+        {"uid": {"$in": [v['uid'] for v in votes]}},
+        {"_id": 0, "uid": 1, "firstName": 1, "lastName": 1, "profileImageUrl": 1}
+    ).to_list(len(votes) or 1)
+    users_map = {u['uid']: u for u in users}
+    
+    voters = []
+    for vote in votes:
+        user = users_map.get(vote['uid'], {})
+        voters.append({
+            "uid": vote['uid'],
+            "name": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip(),
+            "profileImageUrl": user.get('profileImageUrl'),
+            "optionIds": vote.get('optionIds', []),
+        })
     
-    await db.polls.update_one({"id": poll_id}, {"$set": {"options": poll['options']}})
-    await sio.emit('poll_updated', {"pollId": poll_id, "options": poll['options']}, room=subgroup_id)
-    return {"message": "Oyunuz kaydedildi"}
+    return {
+        "voters": voters,
+        "nextCursor": votes[-1]['uid'] if has_more and votes else None,
+        "hasMore": has_more,
+    }
 
 @api_router.delete("/subgroups/{subgroup_id}/polls/{poll_id}")
 async def delete_poll(subgroup_id: str, poll_id: str, current_user: dict = Depends(get_current_user)):
@@ -2255,7 +2858,8 @@ async def delete_poll(subgroup_id: str, poll_id: str, current_user: dict = Depen
             raise HTTPException(status_code=403, detail="Bu anketi silme yetkiniz yok")
     
     await db.polls.delete_one({"id": poll_id})
-    await sio.emit('poll_deleted', {"pollId": poll_id}, room=subgroup_id)
+    await db.poll_votes.delete_many({"pollId": poll_id})
+    await room_events.emit('poll_deleted', {"pollId": poll_id}, room=subgroup_id)
     return {"message": "Anket silindi"}
 
 # ==================== MESSAGE SEARCH ====================
@@ -2439,7 +3043,7 @@ async def moderator_delete_message(subgroup_id: str, message_id: str, current_us
     # Mesajı sil (soft delete - deletedForEveryone olarak işaretle)
     result = await db.messages.update_one(
         {"id": message_id, "groupId": subgroup_id},
-        {"$set": {"deletedForEveryone": True, "deletedBy": current_user['uid'], "deletedAt": datetime.utcnow()}}
+        {"$set": {"updatedAt": datetime.utcnow(), "deletedForEveryone": True, "deletedBy": current_user['uid'], "deletedAt": datetime.utcnow()}}
     )
     
     if result.modified_count == 0:
@@ -2841,10 +3445,12 @@ async def send_announcement(community_id: str, message_data: dict, current_user:
         "senderName": f"{user['firstName']} {user['lastName']}",
         "content": message_data.get('content', ''),
         "type": "announcement",
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow()
     }
 
     await db.messages.insert_one(new_message)
+    await stats_counters.inc(totalMessages=1)
     
     if '_id' in new_message:
         del new_message['_id']
@@ -2865,6 +3471,7 @@ async def delete_announcement(community_id: str, announcement_id: str, current_u
         raise HTTPException(status_code=403, detail="Sadece yöneticiler duyuru silebilir")
 
     result = await db.messages.delete_one({"id": announcement_id, "groupId": community.get('announcementChannelId')})
+    await stats_counters.inc(totalMessages=-result.deleted_count)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Duyuru bulunamadı")
@@ -2879,117 +3486,228 @@ async def admin_dashboard(current_user: dict = Depends(get_current_user)):
     if not await check_global_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
 
-    total_users = await db.users.count_documents({})
-    total_communities = await db.communities.count_documents({})
-    total_subgroups = await db.subgroups.count_documents({})
-    total_messages = await db.messages.count_documents({})
-    total_posts = await db.posts.count_documents({})
-    total_services = await db.services.count_documents({})
+    # stats_counters'tan tek sorgu; generatedAt son güncelleme zamanıdır
+    return await stats_counters.snapshot()
 
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    new_users_week = await db.users.count_documents({"createdAt": {"$gte": week_ago}})
+@api_router.get("/admin/storage-report")
+async def admin_storage_report(current_user: dict = Depends(get_current_user)):
+    """Admin: koleksiyon başına belge sayısı, veri / index boyutu ve bildirim saklama durumu"""
+    if not await check_global_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
 
-    banned_users = await db.users.count_documents({"isBanned": True})
-    
-    pending_requests = 0
-    subgroups = await db.subgroups.find().to_list(1000)
-    for sg in subgroups:
-        pending_requests += len(sg.get('pendingRequests', []))
+    collections = []
+    for name in sorted(await db.list_collection_names()):
+        if name.startswith("system."):
+            continue
+        try:
+            stats = (await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(1))[0]['storageStats']
+        except Exception as e:
+            logger.error(f"collStats error ({name}): {e}")
+            continue
+        collections.append({
+            "name": name,
+            "count": stats.get('count', 0),
+            "dataSize": stats.get('size', 0),
+            "storageSize": stats.get('storageSize', 0),
+            "indexSize": stats.get('totalIndexSize', 0),
+            "avgDocSize": stats.get('avgObjSize', 0),
+            "indexCount": stats.get('nindexes', 0),
+        })
+    collections.sort(key=lambda c: c['storageSize'] + c['indexSize'], reverse=True)
 
+    rollup_cutoff = datetime.utcnow() - timedelta(days=notification_store.UNREAD_ROLLUP_DAYS)
     return {
-        "stats": {
-            "totalUsers": total_users,
-            "totalCommunities": total_communities,
-            "totalSubgroups": total_subgroups,
-            "totalMessages": total_messages,
-            "totalPosts": total_posts,
-            "totalServices": total_services,
-            "newUsersThisWeek": new_users_week,
-            "bannedUsers": banned_users,
-            "pendingRequests": pending_requests
-        }
+        "collections": collections,
+        "totalStorageSize": sum(c['storageSize'] for c in collections),
+        "totalIndexSize": sum(c['indexSize'] for c in collections),
+        "notifications": {
+            "readRetentionDays": notification_store.READ_RETENTION_DAYS,
+            "unreadRollupDays": notification_store.UNREAD_ROLLUP_DAYS,
+            "read": await db.notifications.count_documents({"isRead": True}),
+            "unread": await db.notifications.count_documents({"isRead": False}),
+            "pendingRollup": await db.notifications.count_documents({
+                "isRead": False, "createdAt": {"$lt": rollup_cutoff}, "type": {"$ne": notification_store.SUMMARY_TYPE}
+            }),
+        },
     }
 
 # List all pending subgroup join requests (admin global view)
 @api_router.get("/admin/subgroup-join-requests")
-async def admin_subgroup_join_requests(community_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
-    """Tüm alt gruplardaki bekleyen katılma isteklerini listeler.
+async def admin_subgroup_join_requests(
+    community_id: Optional[str] = None,
+    status: str = JOIN_REQUEST_PENDING,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
+    """Alt grup katılma istekleri kuyruğu - en yeniler önce, imleçle sayfalı.
 
     İsteğe bağlı olarak belirli bir community_id için filtrelenebilir.
+    Kullanıcı ve topluluk bilgileri sayfa başına tek $in sorgusuyla eklenir.
+    Kuyruk toplamı (total) sadece ilk sayfada, index'ten sayılır.
     Global admin yetkisi gerektirir.
     """
     if not await check_global_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
+    if status not in (JOIN_REQUEST_PENDING, JOIN_REQUEST_APPROVED, JOIN_REQUEST_REJECTED):
+        raise HTTPException(status_code=400, detail="Geçersiz durum")
 
-    query: dict = {"pendingRequests": {"$exists": True, "$ne": []}}
+    limit = clamp_limit(limit)
+    query: dict = {"status": status}
     if community_id:
         query["communityId"] = community_id
+    total = None if cursor else await db.subgroup_join_requests.count_documents(query)
+    if cursor:
+        try:
+            requested_at, request_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Geçersiz imleç")
+        query["$or"] = [
+            {"requestedAt": {"$lt": requested_at}},
+            {"requestedAt": requested_at, "id": {"$lt": request_id}},
+        ]
 
-    subgroups = await db.subgroups.find(query).to_list(1000)
+    requests = await db.subgroup_join_requests.find(query, {"_id": 0}).sort(
+        [("requestedAt", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    has_more = len(requests) > limit
+    requests = requests[:limit]
+
+    user_ids = list({r['userId'] for r in requests})
+    community_ids = list({r['communityId'] for r in requests if r.get('communityId')})
+    users = {u['uid']: u for u in await db.users.find(
+        {"uid": {"$in": user_ids}}, {"_id": 0, "uid": 1, "city": 1, "occupation": 1, "email": 1}
+    ).to_list(len(user_ids))}
+    communities = {c['id']: c.get('name') for c in await db.communities.find(
+        {"id": {"$in": community_ids}}, {"_id": 0, "id": 1, "name": 1}
+    ).to_list(len(community_ids))}
 
     results = []
-    for sg in subgroups:
-        community = await db.communities.find_one({"id": sg["communityId"]})
-        community_name = community["name"] if community else None
-
-        for req in sg.get("pendingRequests", []):
-            user_id = req.get("uid")
-            user_doc = await db.users.find_one({"uid": user_id}) if user_id else None
-            if user_doc and "_id" in user_doc:
-                del user_doc["_id"]
-
-            results.append({
-                "communityId": sg["communityId"],
-                "communityName": community_name,
-                "subgroupId": sg["id"],
-                "subgroupName": sg.get("name"),
-                "userId": user_id,
-                "userName": req.get("name"),
-                "profileImageUrl": req.get("profileImageUrl"),
-                "requestedAt": req.get("requestedAt"),
-                "userCity": user_doc.get("city") if user_doc else None,
-                "userOccupation": user_doc.get("occupation") if user_doc else None,
-                "userEmail": user_doc.get("email") if user_doc else None,
-            })
+    for r in requests:
+        user_doc = users.get(r['userId']) or {}
+        results.append({
+            "id": r['id'],
+            "communityId": r.get('communityId'),
+            "communityName": communities.get(r.get('communityId')),
+            "subgroupId": r['subgroupId'],
+            "subgroupName": r.get('subgroupName'),
+            "userId": r['userId'],
+            "userName": r.get('userName'),
+            "profileImageUrl": r.get('profileImageUrl'),
+            "requestedAt": r.get('requestedAt'),
+            "status": r.get('status'),
+            "userCity": user_doc.get('city'),
+            "userOccupation": user_doc.get('occupation'),
+            "userEmail": user_doc.get('email'),
+        })
 
-    # requestedAt alanına göre en yeniler önce gelecek şekilde sırala
-    def sort_key(item):
-        ts = item.get("requestedAt")
-        return ts if isinstance(ts, datetime) else datetime.min
-
-    results.sort(key=sort_key, reverse=True)
-    return results
+    next_cursor = encode_cursor([requests[-1]['requestedAt'], requests[-1]['id']]) if has_more else None
+    return {"requests": results, "nextCursor": next_cursor, "hasMore": has_more, "total": total}
 
 # Alias for join-requests (frontend compatibility)
 @api_router.get("/admin/join-requests")
-async def admin_join_requests(community_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def admin_join_requests(
+    community_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
     """Alias for /admin/subgroup-join-requests for frontend compatibility"""
-    return await admin_subgroup_join_requests(community_id, current_user)
+    return await admin_subgroup_join_requests(
+        community_id, JOIN_REQUEST_PENDING, cursor, limit, current_user
+    )
 
-# Get all users (admin)
-@api_router.get("/admin/users")
-async def admin_get_users(current_user: dict = Depends(get_current_user), search: str = None):
+async def _bulk_decide_join_requests(data: dict, approve: bool, current_user: dict) -> dict:
     if not await check_global_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
+    request_ids = data.get('requestIds')
+    if not isinstance(request_ids, list) or not request_ids:
+        raise HTTPException(status_code=400, detail="requestIds listesi gerekli")
+    if len(request_ids) > MAX_JOIN_REQUEST_BATCH:
+        raise HTTPException(status_code=400, detail=f"En fazla {MAX_JOIN_REQUEST_BATCH} istek işlenebilir")
+
+    processed = await decide_join_requests(
+        {"id": {"$in": [i for i in request_ids if isinstance(i, str)]}}, approve, current_user['uid']
+    )
+    return {"processed": processed, "skipped": len(request_ids) - processed}
 
-    query = {}
-    if search:
-        query = {
-            "$or": [
-                {"firstName": {"$regex": search, "$options": "i"}},
-                {"lastName": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}},
-                {"city": {"$regex": search, "$options": "i"}}
-            ]
-        }
+@api_router.post("/admin/join-requests/bulk-approve")
+async def admin_bulk_approve_join_requests(data: dict, current_user: dict = Depends(get_current_user)):
+    """Admin: seçilen bekleyen istekleri toplu onayla ({"requestIds": [...]})"""
+    return await _bulk_decide_join_requests(data, True, current_user)
 
-    users = await db.users.find(query).sort("createdAt", -1).to_list(1000)
+@api_router.post("/admin/join-requests/bulk-reject")
+async def admin_bulk_reject_join_requests(data: dict, current_user: dict = Depends(get_current_user)):
+    """Admin: seçilen bekleyen istekleri toplu reddet ({"requestIds": [...]})"""
+    return await _bulk_decide_join_requests(data, False, current_user)
 
-    for user in users:
-        if '_id' in user:
-            del user['_id']
+# Get all users (admin)
+@api_router.get("/admin/users")
+async def admin_get_users(
+    current_user: dict = Depends(get_current_user),
+    search: str = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    is_admin: Optional[bool] = None
+):
+    """Admin: kullanıcı listesi - en yeniden eskiye, imleçli sayfalama; is_admin ile yönetici filtresi"""
+    if not await check_global_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
 
-    return users
+    projection = build_projection(fields, ADMIN_USER_FIELDS, ADMIN_USER_DEFAULT_FIELDS)
+    query = admin_user_search_query(search)
+    if is_admin is not None:
+        admin_filter = {"isAdmin": True} if is_admin else {"isAdmin": {"$ne": True}}
+        query = {"$and": [query, admin_filter]} if query else admin_filter
+    return await list_users_page(query, projection, cursor, clamp_limit(limit))
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return "" if value is None else value
+
+@api_router.get("/admin/users/export")
+async def admin_export_users(
+    current_user: dict = Depends(get_current_user),
+    format: str = "ndjson",  # ndjson, csv
+    search: str = None,
+    fields: Optional[str] = None
+):
+    """Admin: kullanıcıları akış halinde dışa aktar (bellekte tüm liste tutulmaz)"""
+    if not await check_global_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Geçersiz format (ndjson veya csv)")
+
+    projection = build_projection(fields, ADMIN_USER_FIELDS, ADMIN_USER_DEFAULT_FIELDS)
+    columns = [f for f in projection if f != "_id"]
+    user_cursor = db.users.find(admin_user_search_query(search), projection).sort("_id", -1).batch_size(500)
+
+    async def generate():
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            async for user in user_cursor:
+                writer.writerow([_export_value(user.get(c)) for c in columns])
+                if buffer.tell() > 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for user in user_cursor:
+                yield json.dumps({c: _export_value(user.get(c)) for c in columns}, ensure_ascii=False) + "\n"
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"users-{datetime.utcnow().strftime('%Y%m%d')}.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(
+        generate(), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # Ban user globally
 @api_router.post("/admin/users/{user_id}/ban")
@@ -3004,10 +3722,13 @@ async def admin_ban_user(user_id: str, current_user: dict = Depends(get_current_
     if target_user.get('email', '').lower() == ADMIN_EMAIL.lower():
         raise HTTPException(status_code=400, detail="Ana yönetici yasaklanamaz")
 
-    await db.users.update_one(
-        {"uid": user_id},
+    result = await db.users.update_one(
+        {"uid": user_id, "isBanned": {"$ne": True}},
         {"$set": {"isBanned": True}}
     )
+    await stats_counters.inc(bannedUsers=result.modified_count)
+    if result.modified_count:
+        autocomplete_index.remove_user(target_user)
 
     # Remove from all communities
     await db.communities.update_many(
@@ -3029,10 +3750,15 @@ async def admin_unban_user(user_id: str, current_user: dict = Depends(get_curren
     if not await check_global_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
 
-    await db.users.update_one(
-        {"uid": user_id},
+    result = await db.users.update_one(
+        {"uid": user_id, "isBanned": True},
         {"$set": {"isBanned": False}}
     )
+    await stats_counters.inc(bannedUsers=-result.modified_count)
+    if result.modified_count:
+        unbanned_user = await db.users.find_one({"uid": user_id}, {"_id": 0, **AUTOCOMPLETE_USER_PROJECTION})
+        if unbanned_user:
+            autocomplete_index.add_user(unbanned_user)
 
     # Remove from ban lists
     await db.communities.update_many(
@@ -3102,6 +3828,7 @@ async def admin_delete_user_messages(user_id: str, data: dict, current_user: dic
         "senderId": user_id,
         "timestamp": {"$gte": since}
     })
+    await stats_counters.inc(totalMessages=-result.deleted_count)
 
     return {"message": f"{result.deleted_count} mesaj silindi"}
 
@@ -3174,19 +3901,20 @@ async def admin_get_all_subgroups(current_user: dict = Depends(get_current_user)
 # Send broadcast to multiple groups
 @api_router.post("/admin/broadcast")
 async def admin_send_broadcast(data: dict, current_user: dict = Depends(get_current_user)):
-    """Birden fazla gruba aynı anda duyuru gönder"""
+    """Birden fazla gruba aynı anda duyuru gönder - arka plan işi başlatır, ilerleme jobId ile izlenir"""
     if not await check_global_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
     
-    user = await db.users.find_one({"uid": current_user['uid']})
+    user = await db.users.find_one({"uid": current_user['uid']}, {"_id": 0, "firstName": 1, "lastName": 1})
     if not user:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
     
     target_groups = data.get('targetGroups', [])
     content = data.get('content', '').strip()
-    title = data.get('title', '').strip()
+    title = (data.get('title') or '').strip()
     send_as_announcement = data.get('sendAsAnnouncement', True)
     send_as_message = data.get('sendAsMessage', False)
+    send_push_notification = data.get('sendPushNotification', False)
     
     if not content:
         raise HTTPException(status_code=400, detail="Mesaj içeriği gerekli")
@@ -3194,80 +3922,32 @@ async def admin_send_broadcast(data: dict, current_user: dict = Depends(get_curr
     if not target_groups:
         raise HTTPException(status_code=400, detail="En az bir grup seçmelisiniz")
     
-    sent_count = 0
     sender_name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip() or "Yönetici"
-    broadcast_id = str(uuid.uuid4())
-    
-    for group_id in target_groups:
-        subgroup = await db.subgroups.find_one({"id": group_id})
-        if not subgroup:
-            continue
-        
-        # Send as message to group
-        if send_as_message:
-            message = {
-                "id": str(uuid.uuid4()),
-                "groupId": group_id,
-                "senderId": current_user['uid'],
-                "senderName": f"📢 {sender_name}",
-                "content": f"**{title}**\n\n{content}" if title else content,
-                "type": "announcement",
-                "timestamp": datetime.utcnow(),
-                "isBroadcast": True,
-                "broadcastId": broadcast_id,
-            }
-            await db.messages.insert_one(message)
-            
-            # Emit via socket
-            msg_copy = dict(message)
-            if '_id' in msg_copy:
-                del msg_copy['_id']
-            msg_copy['timestamp'] = msg_copy['timestamp'].isoformat()
-            await sio.emit('new_message', msg_copy, room=group_id)
-        
-        # Also send to community announcement channel
-        if send_as_announcement:
-            community_id = subgroup.get('communityId')
-            if community_id:
-                community = await db.communities.find_one({"id": community_id})
-                if community and community.get('announcementChannelId'):
-                    announcement = {
-                        "id": str(uuid.uuid4()),
-                        "groupId": community['announcementChannelId'],
-                        "senderId": current_user['uid'],
-                        "senderName": sender_name,
-                        "content": f"**{title}**\n\n{content}" if title else content,
-                        "type": "announcement",
-                        "timestamp": datetime.utcnow(),
-                        "isBroadcast": True,
-                        "broadcastId": broadcast_id,
-                    }
-                    # Avoid duplicate announcements for same community
-                    existing = await db.messages.find_one({
-                        "groupId": community['announcementChannelId'],
-                        "broadcastId": broadcast_id
-                    })
-                    if not existing:
-                        await db.messages.insert_one(announcement)
-        
-        sent_count += 1
+    job = await broadcast_engine.start(
+        current_user['uid'], sender_name, title, content, target_groups,
+        send_as_announcement, send_as_message, send_push_notification
+    )
     
-    # Save broadcast to history
-    broadcast_record = {
-        "id": broadcast_id,
-        "title": title,
-        "content": content,
-        "targetGroups": target_groups,
-        "sentCount": sent_count,
-        "senderId": current_user['uid'],
-        "senderName": sender_name,
-        "sentAt": datetime.utcnow().isoformat(),
-        "sendAsAnnouncement": send_as_announcement,
-        "sendAsMessage": send_as_message,
+    return {
+        "message": "Duyuru gönderimi başlatıldı",
+        "jobId": job['id'],
+        "broadcastId": job['broadcastId'],
+        "status": job['status'],
+        "totalGroups": job['totalGroups'],
     }
-    await db.broadcasts.insert_one(broadcast_record)
+
+# Broadcast job progress
+@api_router.get("/admin/broadcast-jobs/{job_id}")
+async def admin_get_broadcast_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Toplu duyuru işinin durumu ve ilerlemesi"""
+    if not await check_global_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
     
-    return {"message": "Duyuru gönderildi", "sentCount": sent_count, "broadcastId": broadcast_id}
+    job = await broadcast_engine.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Duyuru işi bulunamadı")
+    
+    return job
 
 # Get broadcast history
 @api_router.get("/admin/broadcast-history")
@@ -3401,6 +4081,7 @@ async def admin_create_community(data: dict, current_user: dict = Depends(get_cu
     }
 
     await db.communities.insert_one(community)
+    await stats_counters.inc(totalCommunities=1)
 
     # Varsayılan alt grupları oluştur
     subgroup_ids = await create_default_subgroups(community_id, name, current_user['uid'])
@@ -3428,15 +4109,25 @@ async def admin_delete_community(community_id: str, current_user: dict = Depends
     subgroup_ids = [sg["id"] for sg in subgroups]
 
     if subgroup_ids:
-        await db.subgroups.delete_many({"communityId": community_id})
-        await db.messages.delete_many({"groupId": {"$in": subgroup_ids}})
+        deleted_subgroups = await db.subgroups.delete_many({"communityId": community_id})
+        deleted_messages = await db.messages.delete_many({"groupId": {"$in": subgroup_ids}})
+        deleted_requests = await db.subgroup_join_requests.delete_many(
+            {"subgroupId": {"$in": subgroup_ids}, "status": JOIN_REQUEST_PENDING}
+        )
+        await stats_counters.inc(
+            totalSubgroups=-deleted_subgroups.deleted_count,
+            totalMessages=-deleted_messages.deleted_count,
+            pendingRequests=-deleted_requests.deleted_count
+        )
 
     # Duyuru kanalındaki mesajlar
     announcement_id = community.get("announcementChannelId")
     if announcement_id:
-        await db.messages.delete_many({"groupId": announcement_id})
+        deleted_messages = await db.messages.delete_many({"groupId": announcement_id})
+        await stats_counters.inc(totalMessages=-deleted_messages.deleted_count)
 
-    await db.communities.delete_one({"id": community_id})
+    deleted = await db.communities.delete_one({"id": community_id})
+    await stats_counters.inc(totalCommunities=-deleted.deleted_count)
 
     # Kullanıcı profillerinden bu topluluğu kaldır
     await db.users.update_many(
@@ -3579,10 +4270,18 @@ async def admin_delete_subgroup(subgroup_id: str, current_user: dict = Depends(g
     community_id = subgroup.get("communityId")
 
     # Alt grup mesajlarını sil
-    await db.messages.delete_many({"groupId": subgroup_id})
+    deleted_messages = await db.messages.delete_many({"groupId": subgroup_id})
 
     # Alt grubun kendisini sil
-    await db.subgroups.delete_one({"id": subgroup_id})
+    deleted = await db.subgroups.delete_one({"id": subgroup_id})
+    deleted_requests = await db.subgroup_join_requests.delete_many(
+        {"subgroupId": subgroup_id, "status": JOIN_REQUEST_PENDING}
+    )
+    await stats_counters.inc(
+        totalSubgroups=-deleted.deleted_count,
+        totalMessages=-deleted_messages.deleted_count,
+        pendingRequests=-deleted_requests.deleted_count
+    )
 
     # Topluluk dokümanından referansı kaldır
     if community_id:
@@ -3619,13 +4318,14 @@ async def admin_get_community_subgroups(community_id: str, current_user: dict =
         raise HTTPException(status_code=403, detail="Admin yetkisi gerekiyor")
     
     subgroups = await db.subgroups.find({"communityId": community_id}).to_list(100)
+    pending_counts = await pending_join_request_counts([sg['id'] for sg in subgroups])
     
     result = []
     for sg in subgroups:
         if '_id' in sg:
             del sg['_id']
         sg['memberCount'] = len(sg.get('members', []))
-        sg['pendingRequestCount'] = len(sg.get('pendingRequests', []))
+        sg['pendingRequestCount'] = pending_counts.get(sg['id'], 0)
         result.append(sg)
     
     return result
@@ -3855,6 +4555,7 @@ async def admin_delete_subgroup_messages(subgroup_id: str, user_id: str, data: d
         "senderId": user_id,
         "timestamp": {"$gte": since}
     })
+    await stats_counters.inc(totalMessages=-result.deleted_count)
 
     return {"message": f"{result.deleted_count} mesaj silindi"}
 
@@ -3872,7 +4573,7 @@ async def admin_pin_message(message_id: str, current_user: dict = Depends(get_cu
 
     await db.messages.update_one(
         {"id": message_id},
-        {"$set": {"isPinned": is_pinned}}
+        {"$set": {"updatedAt": datetime.utcnow(), "isPinned": is_pinned}}
     )
 
     group_id = message.get('groupId')
@@ -3897,7 +4598,7 @@ async def admin_delete_message(message_id: str, current_user: dict = Depends(get
 
     await db.messages.update_one(
         {"id": message_id},
-        {"$set": {"deletedForEveryone": True, "content": "Bu mesaj yönetici tarafından silindi", "isDeleted": True}}
+        {"$set": {"updatedAt": datetime.utcnow(), "deletedForEveryone": True, "content": "Bu mesaj yönetici tarafından silindi", "isDeleted": True}}
     )
 
     return {"message": "Mesaj silindi"}
@@ -3914,7 +4615,8 @@ async def admin_create_poll(subgroup_id: str, data: dict, current_user: dict = D
         "id": str(uuid.uuid4()),
         "groupId": subgroup_id,
         "question": data['question'],
-        "options": [{"text": opt, "votes": []} for opt in data.get('options', [])],
+        "options": [{"id": str(uuid.uuid4()), "text": opt, "voteCount": 0} for opt in data.get('options', [])],
+        "totalVoters": 0,
         "createdBy": current_user['uid'],
         "createdByName": f"{user['firstName']} {user['lastName']}",
         "isAnonymous": data.get('isAnonymous', False),
@@ -3934,10 +4636,12 @@ async def admin_create_poll(subgroup_id: str, data: dict, current_user: dict = D
         "content": f"📊 Anket: {data['question']}",
         "type": "poll",
         "pollId": poll['id'],
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow()
     }
 
     await db.messages.insert_one(poll_message)
+    await stats_counters.inc(totalMessages=1)
 
     if '_id' in poll:
         del poll['_id']
@@ -3945,40 +4649,202 @@ async def admin_create_poll(subgroup_id: str, data: dict, current_user: dict = D
     return poll
 
 # Socket.IO events
+async def user_can_access_room(uid: str, room: str) -> bool:
+    """Kullanıcının odaya (alt grup, sohbet veya kişisel oda) erişimi var mı"""
+    if room == f"user_{uid}":
+        return True
+    # Eski özel mesaj chatId formatı: uid1_uid2
+    if room.startswith(f"{uid}_") or room.endswith(f"_{uid}"):
+        return True
+    if await db.subgroups.find_one({"id": room, "members": uid}, {"_id": 1}):
+        return True
+    if await db.conversations.find_one({"id": room, "participants": uid}, {"_id": 1}):
+        return True
+    return False
+
+SOCKET_ROOM_ACCESS_TTL_SECONDS = 60
+
+async def get_socket_user(sid, room: Optional[str] = None) -> Optional[str]:
+    """Socket oturumundaki doğrulanmış uid'yi döndürür; room verilirse erişimi de kontrol eder"""
+    session = await sio.get_session(sid)
+    uid = session.get('uid') if session else None
+    if not uid:
+        return None
+    if room is None:
+        return uid
+
+    # Erişim kontrolü kısa süre önbelleklenir: gruptan çıkarılan / yasaklanan kullanıcı
+    # en geç SOCKET_ROOM_ACCESS_TTL_SECONDS sonra odaya yazamaz
+    allowed_rooms = session.get('rooms')
+    if not isinstance(allowed_rooms, dict):
+        allowed_rooms = session['rooms'] = {}
+    now = time.monotonic()
+    if allowed_rooms.get(room, 0) <= now:
+        if not await user_can_access_room(uid, room):
+            allowed_rooms.pop(room, None)
+            await sio.save_session(sid, session)
+            return None
+        allowed_rooms[room] = now + SOCKET_ROOM_ACCESS_TTL_SECONDS
+        await sio.save_session(sid, session)
+    return uid
+
+async def forget_socket_room(sid, room: str):
+    """Odadan çıkışta erişim önbelleğini düşür"""
+    session = await sio.get_session(sid)
+    if session and isinstance(session.get('rooms'), dict) and session['rooms'].pop(room, None) is not None:
+        await sio.save_session(sid, session)
+
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
+    # Firebase token: io(url, { auth: { token } }) ile gönderilir
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    if token:
+        try:
+            decoded_token = verify_firebase_token(token)
+        except Exception as e:
+            logging.warning(f"Socket auth failed for {sid}: {e}")
+            return False
+        await sio.save_session(sid, {'uid': decoded_token['uid'], 'rooms': {}, 'typingRooms': set()})
     logging.info(f"Client connected: {sid}")
 
 @sio.event
 async def disconnect(sid):
+    session = await sio.get_session(sid)
+    uid = session.get('uid') if session else None
+    if uid:
+        for room in session.get('typingRooms', set()):
+            try:
+                await typing_manager.stop(room, uid, skip_sid=sid)
+            except Exception as e:
+                logging.error(f"Typing cleanup error: {e}")
     logging.info(f"Client disconnected: {sid}")
 
 @sio.event
 async def join_room(sid, data):
     room = data.get('room')
     if room:
-        sio.enter_room(sid, room)
+        await sio.enter_room(sid, room)
         logging.info(f"Client {sid} joined room {room}")
 
 @sio.event
 async def leave_room(sid, data):
     room = data.get('room')
     if room:
-        sio.leave_room(sid, room)
+        await sio.leave_room(sid, room)
+        await forget_socket_room(sid, room)
 
 @sio.event
 async def typing(sid, data):
+    """Yazıyor olayı - kimlik istemciden değil, doğrulanmış oturumdan alınır"""
+    room = (data or {}).get('room')
+    is_typing = bool((data or {}).get('isTyping', False))
+    if not room:
+        return
+
+    uid = await get_socket_user(sid, room)
+    if not uid:
+        return
+
+    session = await sio.get_session(sid)
+    typing_rooms = session.setdefault('typingRooms', set())
+    if is_typing and room not in typing_rooms:
+        typing_rooms.add(room)
+        await sio.save_session(sid, session)
+    elif not is_typing and room in typing_rooms:
+        typing_rooms.discard(room)
+        await sio.save_session(sid, session)
+
+    await typing_manager.set_typing(room, uid, is_typing, skip_sid=sid)
+
+@sio.event
+async def resume(sid, data):
+    """Yeniden bağlanan istemci için kaçırılan oda olaylarını tekrar oynat.
+
+    data: {"room": "...", "lastSeq": 42, "epoch": "..."}
+    lastSeq verilmezse odaya katılınır ve sadece güncel seq/epoch döner.
+    lastSeq ile birlikte son alınan epoch da gönderilmelidir; yoksa REST'e düşülür.
+    Ack: {"success": True, "events": [{"seq", "event", "data"}], "seq": n, "epoch": "..."}
+    Tampon boşluğu kapsamıyorsa {"success": False, "fallback": "rest"} döner;
+    istemci bu durumda mesajları REST ile yeniden yükler.
+    """
+    data = data or {}
     room = data.get('room')
-    user_id = data.get('userId')
-    user_name = data.get('userName')
-    is_typing = data.get('isTyping', False)
-    
-    if room:
-        await sio.emit('typing', {
-            'userId': user_id,
-            'userName': user_name,
-            'isTyping': is_typing
-        }, room=room, skip_sid=sid)
+    if not room:
+        return {"success": False, "status": 400, "error": "Geçersiz oda"}
+
+    uid = await get_socket_user(sid, room)
+    if not uid:
+        return {"success": False, "status": 403, "error": "Bu odaya erişim yetkiniz yok"}
+
+    await sio.enter_room(sid, room)
+    response = {"seq": room_events.current_seq(room), "epoch": room_events.epoch}
+
+    # lastSeq yoksa (ilk yükleme REST ile yapıldı) sadece mevcut seq/epoch bildirilir
+    if data.get('lastSeq') is None:
+        return {"success": True, "events": [], **response}
+
+    try:
+        last_seq = int(data.get('lastSeq'))
+    except (TypeError, ValueError):
+        return {"success": False, "fallback": "rest", **response}
+
+    events = room_events.replay(room, last_seq, data.get('epoch'))
+    if events is None:
+        return {"success": False, "fallback": "rest", **response}
+    return {"success": True, "events": events, **response}
+
+@sio.event
+async def send_message(sid, data):
+    """Socket üzerinden mesaj gönder (ack ile).
+
+    data: {"roomType": "subgroup" | "conversation", "roomId": "...", "content": "...", ...}
+    Ack: {"success": True, "message": {...}} veya {"success": False, "status": 4xx, "error": "..."}
+    REST uçlarıyla aynı doğrulama/moderasyon/kayıt hattını kullanır.
+    """
+    data = data or {}
+    room_type = data.get('roomType')
+    room_id = data.get('roomId')
+
+    uid = await get_socket_user(sid)
+    if not uid:
+        return {"success": False, "status": 401, "error": "Kimlik doğrulaması gerekli"}
+    if room_type not in ('subgroup', 'conversation') or not room_id:
+        return {"success": False, "status": 400, "error": "Geçersiz oda"}
+    if not socket_message_limiter.allow(uid):
+        return {"success": False, "status": 429, "error": "Çok fazla mesaj gönderdiniz, lütfen bekleyin"}
+
+    try:
+        if room_type == 'subgroup':
+            message = await process_subgroup_message(uid, room_id, data)
+        else:
+            message = await process_conversation_message(uid, room_id, data)
+    except HTTPException as e:
+        return {"success": False, "status": e.status_code, "error": e.detail}
+    except Exception as e:
+        logging.error(f"Socket send_message error: {e}")
+        return {"success": False, "status": 500, "error": "Mesaj gönderilemedi"}
+
+    return {"success": True, "message": message}
+
+@sio.event
+async def story_views(sid, data):
+    """Hikaye görüntülemelerini toplu kaydet.
+
+    data: {"storyIds": ["...", ...]}  (istemci görüntülemeleri biriktirip gönderir)
+    Ack: {"success": True, "recorded": n}
+    """
+    uid = await get_socket_user(sid)
+    if not uid:
+        return {"success": False, "status": 401, "error": "Kimlik doğrulaması gerekli"}
+    story_ids = (data or {}).get('storyIds')
+    if not isinstance(story_ids, list):
+        return {"success": False, "status": 400, "error": "storyIds listesi gerekli"}
+    try:
+        recorded = await record_story_views(uid, story_ids)
+    except Exception as e:
+        logging.error(f"Socket story_views error: {e}")
+        return {"success": False, "status": 500, "error": "Görüntülemeler kaydedilemedi"}
+    return {"success": True, "recorded": recorded}
 
 # Import and setup additional routes
 from routes.badges import setup_badges_routes
@@ -4709,7 +5575,8 @@ async def get_conversation_messages(conversation_id: str, skip: int = 0, limit:
         {"$set": {"read": True, "readAt": datetime.utcnow()}}
     )
     
-    await db.conversations.update_one({"id": conversation_id}, {"$set": {f"unreadCount.{current_user['uid']}": 0}})
+    await db.conversations.update_one({"id": conversation_id}, {"$set": {f"unreadCount.{current_user['uid']}": 0, "updatedAt": datetime.utcnow()}})
+    await update_read_cursor(current_user['uid'], conversation_id, "conversation")
     
     result = []
     for msg in messages:
@@ -4739,14 +5606,21 @@ async def mark_conversation_as_read(conversation_id: str, current_user: dict = D
     # Okunmamış sayısını sıfırla
     await db.conversations.update_one(
         {"id": conversation_id}, 
-        {"$set": {f"unreadCount.{current_user['uid']}": 0}}
+        {"$set": {f"unreadCount.{current_user['uid']}": 0, "updatedAt": datetime.utcnow()}}
     )
+    await update_read_cursor(current_user['uid'], conversation_id, "conversation")
     
     return {"message": "Konuşma okundu olarak işaretlendi"}
 
 @api_router.post("/conversations/{conversation_id}/messages")
 async def send_conversation_message(conversation_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Konuşmaya mesaj gönder"""
+    return await process_conversation_message(current_user['uid'], conversation_id, data)
+
+async def process_conversation_message(uid: str, conversation_id: str, data: dict) -> dict:
+    """DM mesajı gönderme hattı (moderasyon, kayıt, okunmamış sayacı, bildirim).
+    REST ucu ve Socket.IO 'send_message' olayı tarafından ortak kullanılır."""
+    current_user = {"uid": uid}
     conversation = await db.conversations.find_one({
         "id": conversation_id,
         "participants": current_user['uid']
@@ -4784,6 +5658,7 @@ async def send_conversation_message(conversation_id: str, data: dict, current_us
         "id": str(uuid.uuid4()),
         "conversationId": conversation_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(data),
         "senderName": sender_name,
         "senderImage": user.get('profileImageUrl') if user else None,
         "content": content,
@@ -4791,13 +5666,16 @@ async def send_conversation_message(conversation_id: str, data: dict, current_us
         "mediaUrl": data.get("mediaUrl"),
         "replyTo": reply_to_data,
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "delivered": True,
         "deliveredAt": datetime.utcnow(),
         "read": False,
         "readAt": None,
     }
     
-    await db.dm_messages.insert_one(message)
+    created, message = await insert_message_once(db.dm_messages, message)
+    if not created:
+        return message
     
     other_user_id = [p for p in conversation["participants"] if p != current_user['uid']][0]
     
@@ -4825,6 +5703,8 @@ async def send_conversation_message(conversation_id: str, data: dict, current_us
     if "_id" in message:
         del message["_id"]
     
+    await room_events.emit('new_message', message, room=conversation_id)
+    
     return message
 
 @api_router.post("/services/{service_id}/contact")
@@ -4857,6 +5737,7 @@ async def contact_service_provider(service_id: str, data: dict, current_user: di
             "content": initial_message,
             "type": "text",
             "timestamp": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
             "read": False,
             "isServiceInquiry": True,
         }
@@ -4866,7 +5747,7 @@ async def contact_service_provider(service_id: str, data: dict, current_user: di
         await db.conversations.update_one(
             {"id": conversation["id"]},
             {
-                "$set": {"lastMessage": message["content"][:100], "lastMessageTime": message["timestamp"]},
+                "$set": {"lastMessage": message["content"][:100], "lastMessageTime": message["timestamp"], "updatedAt": datetime.utcnow()},
                 "$inc": {f"unreadCount.{provider_id}": 1}
             }
         )
@@ -4895,7 +5776,7 @@ async def delete_conversation(conversation_id: str, current_user: dict = Depends
         await db.conversations.delete_one({"id": conversation_id})
         await db.dm_messages.delete_many({"conversationId": conversation_id})
     else:
-        await db.conversations.update_one({"id": conversation_id}, {"$set": {"deletedBy": deleted_by}})
+        await db.conversations.update_one({"id": conversation_id}, {"$set": {"deletedBy": deleted_by, "updatedAt": datetime.utcnow()}})
     
     return {"message": "Konuşma silindi"}
 
@@ -4923,6 +5804,7 @@ async def delete_dm_message(conversation_id: str, message_id: str, delete_for_al
         await db.dm_messages.update_one(
             {"id": message_id},
             {"$set": {
+                "updatedAt": datetime.utcnow(),
                 "content": "Bu mesaj silindi",
                 "deletedForAll": True,
                 "deletedAt": datetime.utcnow(),
@@ -4937,7 +5819,7 @@ async def delete_dm_message(conversation_id: str, message_id: str, delete_for_al
             deleted_for.append(current_user['uid'])
         await db.dm_messages.update_one(
             {"id": message_id},
-            {"$set": {"deletedFor": deleted_for}}
+            {"$set": {"updatedAt": datetime.utcnow(), "deletedFor": deleted_for}}
         )
     
     return {"message": "Mesaj silindi", "deleteForAll": delete_for_all}
@@ -4952,45 +5834,29 @@ async def react_to_message(conversation_id: str, message_id: str, data: dict, cu
     if not conversation:
         raise HTTPException(status_code=404, detail="Konuşma bulunamadı")
     
-    message = await db.dm_messages.find_one({"id": message_id, "conversationId": conversation_id})
-    if not message:
-        raise HTTPException(status_code=404, detail="Mesaj bulunamadı")
-    
     emoji = data.get("emoji")
-    if not emoji:
-        raise HTTPException(status_code=400, detail="emoji gerekli")
-    
-    reactions = message.get("reactions", {})
-    user_id = current_user['uid']
-    
-    # Kullanıcının mevcut reaksiyonunu kontrol et
-    current_reaction = None
-    for em, users in reactions.items():
-        if user_id in users:
-            current_reaction = em
-            break
-    
-    # Aynı emoji ise kaldır, farklı ise güncelle
-    if current_reaction == emoji:
-        reactions[emoji].remove(user_id)
-        if not reactions[emoji]:
-            del reactions[emoji]
-    else:
-        if current_reaction:
-            reactions[current_reaction].remove(user_id)
-            if not reactions[current_reaction]:
-                del reactions[current_reaction]
-        
-        if emoji not in reactions:
-            reactions[emoji] = []
-        reactions[emoji].append(user_id)
+    if not is_valid_emoji(emoji):
+        raise HTTPException(status_code=400, detail="Geçerli bir emoji gerekli")
     
-    await db.dm_messages.update_one(
-        {"id": message_id},
-        {"$set": {"reactions": reactions}}
+    result = await toggle_reaction(
+        db.dm_messages,
+        {"id": message_id, "conversationId": conversation_id},
+        current_user['uid'],
+        emoji,
+        updated_at=datetime.utcnow()
     )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Mesaj bulunamadı")
+    
+    await room_events.emit('message_reaction', {
+        "messageId": message_id,
+        "userId": current_user['uid'],
+        "added": result['added'],
+        "removed": result['removed'],
+        "counts": result['delta'],
+    }, room=conversation_id)
     
-    return {"reactions": reactions}
+    return {"reactions": result['reactions'], "counts": result['counts'], "myReaction": result['myReaction']}
 
 @api_router.post("/conversations/{conversation_id}/messages/{message_id}/reply")
 async def reply_to_message(conversation_id: str, message_id: str, data: dict, current_user: dict = Depends(get_current_user)):
@@ -5017,12 +5883,14 @@ async def reply_to_message(conversation_id: str, message_id: str, data: dict, cu
         "id": str(uuid.uuid4()),
         "conversationId": conversation_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(data),
         "senderName": sender_name,
         "senderImage": user.get('profileImageUrl') if user else None,
         "content": content,
         "type": data.get("type", "text"),
         "mediaUrl": data.get("mediaUrl"),
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "read": False,
         "readAt": None,
         "replyTo": {
@@ -5033,7 +5901,9 @@ async def reply_to_message(conversation_id: str, message_id: str, data: dict, cu
         }
     }
     
-    await db.dm_messages.insert_one(reply_message)
+    created, reply_message = await insert_message_once(db.dm_messages, reply_message)
+    if not created:
+        return reply_message
     
     other_user_id = [p for p in conversation["participants"] if p != current_user['uid']][0]
     
@@ -5078,6 +5948,7 @@ async def edit_message(conversation_id: str, message_id: str, data: dict, curren
     await db.dm_messages.update_one(
         {"id": message_id},
         {"$set": {
+            "updatedAt": datetime.utcnow(),
             "content": new_content,
             "edited": True,
             "editedAt": datetime.utcnow(),
@@ -5391,6 +6262,7 @@ async def send_location(conversation_id: str, data: dict, current_user: dict = D
             "address": address
         },
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "read": False,
     }
     
@@ -5404,6 +6276,7 @@ async def send_location(conversation_id: str, data: dict, current_user: dict = D
             "$set": {
                 "lastMessage": "📍 Konum",
                 "lastMessageTime": message["timestamp"],
+                "updatedAt": datetime.utcnow(),
             },
             "$inc": {f"unreadCount.{other_user_id}": 1}
         }
@@ -5431,34 +6304,26 @@ async def create_dm_notification(user_id: str, sender_id: str, sender_name: str,
         elif mute_record["muteUntil"] > datetime.utcnow():
             return  # Hala sessize alınmış
     
-    notification = {
-        "id": str(uuid.uuid4()),
-        "userId": user_id,
-        "type": "dm",
-        "title": sender_name,
-        "body": content[:100],
-        "data": {
-            "conversationId": conversation_id,
-            "senderId": sender_id
-        },
-        "read": False,
-        "createdAt": datetime.utcnow()
-    }
-    
-    await db.notifications.insert_one(notification)
+    await notification_store.create_notification(
+        db, user_id, "dm", sender_name, content[:100],
+        {"conversationId": conversation_id, "senderId": sender_id}
+    )
     
     # Push notification gönder
-    recipient = await db.users.find_one({"uid": user_id})
+    recipient = await db.users.find_one(
+        {"uid": user_id}, {"_id": 0, "expoPushToken": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+    )
     if recipient and recipient.get("expoPushToken"):
         await send_push_notification(
             recipient["expoPushToken"],
             sender_name,
             content[:100],
-            {"conversationId": conversation_id, "type": "dm"}
+            {"conversationId": conversation_id, "type": "dm"},
+            badge=recipient.get(notification_store.UNREAD_COUNTER_FIELD)
         )
 
-async def send_push_notification(token: str, title: str, body: str, data: dict = None):
-    """Expo push notification gönder"""
+async def send_push_notification(token: str, title: str, body: str, data: dict = None, badge: int = None):
+    """Expo push notification gönder (badge: uygulama simgesindeki okunmamış sayısı)"""
     import aiohttp
     
     message = {
@@ -5468,6 +6333,8 @@ async def send_push_notification(token: str, title: str, body: str, data: dict =
         "body": body,
         "data": data or {}
     }
+    if badge is not None:
+        message["badge"] = badge
     
     try:
         async with aiohttp.ClientSession() as session:
@@ -5481,6 +6348,32 @@ async def send_push_notification(token: str, title: str, body: str, data: dict =
     except Exception as e:
         logging.error(f"Push notification error: {e}")
 
+EXPO_PUSH_BATCH_SIZE = 100
+
+async def send_push_batch(messages: list):
+    """Expo'ya tek istekte en fazla 100 push mesajı gönder"""
+    import aiohttp
+    
+    if not messages:
+        return
+    try:
+        async with aiohttp.ClientSession() as session:
+            for i in range(0, len(messages), EXPO_PUSH_BATCH_SIZE):
+                async with session.post(
+                    "https://exp.host/--/api/v2/push/send",
+                    json=messages[i:i + EXPO_PUSH_BATCH_SIZE],
+                    headers={"Content-Type": "application/json"}
+                ) as response:
+                    result = await response.json()
+                    logging.info(f"Push batch sent ({len(messages[i:i + EXPO_PUSH_BATCH_SIZE])}): {result.get('errors') or 'ok'}")
+    except Exception as e:
+        logging.error(f"Push batch error: {e}")
+
+# Grup mesajı bildirimlerini kullanıcı + grup başına birleştirir
+notification_coalescer = NotificationCoalescer(db, send_push_batch)
+# Toplu admin duyuruları (arka plan işi + ilerleme kaydı)
+broadcast_engine = BroadcastEngine(db, room_events, send_push_batch, stats_counters)
+
 # ============================================
 # END OF DM SYSTEM
 # ============================================
@@ -5489,49 +6382,156 @@ async def send_push_notification(token: str, title: str, body: str, data: dict =
 # STORIES SYSTEM - Kullanıcı Hikayeleri (24 saat otomatik silme)
 # ============================================
 
+# Süresi dolan hikayeler TTL index ile bu kadar sonra silinir; arada medya temizlenir
+STORY_TTL_GRACE_SECONDS = 3600
+STORY_REAPER_INTERVAL_SECONDS = 600
+
+def active_story_filter(extra: dict = None) -> dict:
+    """Sadece süresi dolmamış hikayeler (TTL silmesi gecikebilir)"""
+    return {**(extra or {}), "expiresAt": {"$gt": datetime.utcnow()}}
+
+async def find_active_story(story_id: str) -> dict:
+    story = await db.stories.find_one(active_story_filter({"id": story_id}))
+    if not story:
+        raise HTTPException(status_code=404, detail="Hikaye bulunamadı")
+    return story
+
+async def backfill_story_expiry() -> int:
+    """expiresAt'i olmayan eski hikaye ve tepkilere süre ata (TTL index için)"""
+    result = await db.stories.update_many(
+        {"expiresAt": {"$exists": False}},
+        [{"$set": {"expiresAt": {"$add": [
+            {"$ifNull": [
+                {"$convert": {"input": "$createdAt", "to": "date", "onError": None, "onNull": None}},
+                {"$toDate": "$_id"},
+            ]},
+            24 * 3600 * 1000,
+        ]}}}]
+    )
+    updated = result.modified_count
+    async for reaction in db.story_reactions.find({"expiresAt": {"$exists": False}}, {"_id": 1, "storyId": 1, "createdAt": 1}):
+        story = await db.stories.find_one({"id": reaction.get('storyId')}, {"_id": 0, "expiresAt": 1})
+        expires_at = (story or {}).get('expiresAt') or (reaction.get('createdAt') or datetime.utcnow()) + timedelta(hours=24)
+        await db.story_reactions.update_one({"_id": reaction['_id']}, {"$set": {"expiresAt": expires_at}})
+        updated += 1
+    return updated
+
+async def backfill_story_community_ids() -> int:
+    """Aktif hikayelere yazarın topluluklarını ekle (tepsi sorgusu için)"""
+    updated = 0
+    stories = await db.stories.find(
+        active_story_filter({"communityIds": {"$exists": False}}), {"_id": 1, "userId": 1}
+    ).to_list(None)
+    author_ids = list({s.get('userId') for s in stories})
+    authors = await db.users.find(
+        {"uid": {"$in": author_ids}}, {"_id": 0, "uid": 1, "communities": 1}
+    ).to_list(len(author_ids))
+    communities_by_author = {a['uid']: a.get('communities') or [] for a in authors}
+    for story in stories:
+        await db.stories.update_one(
+            {"_id": story['_id']},
+            {"$set": {"communityIds": communities_by_author.get(story.get('userId'), [])}}
+        )
+        updated += 1
+    return updated
+
+async def reap_expired_story_media() -> int:
+    """Süresi dolan hikayelerin gömülü medyasını (base64) TTL silmesini beklemeden boşalt"""
+    result = await db.stories.update_many(
+        {"expiresAt": {"$lte": datetime.utcnow()}, "mediaReaped": {"$ne": True}},
+        {"$unset": {"imageUrl": "", "videoUrl": "", "viewedBy": ""}, "$set": {"mediaReaped": True}}
+    )
+    return result.modified_count
+
+# Tek istekte / socket olayında kaydedilebilecek en fazla görüntüleme
+MAX_STORY_VIEW_BATCH = 100
+
+async def record_story_views(viewer_id: str, story_ids: list) -> int:
+    """Görüntülemeleri story_views'a toplu yaz; sadece ilk görüntülemeler viewCount'u artırır"""
+    story_ids = list(dict.fromkeys(i for i in (story_ids or []) if isinstance(i, str)))[:MAX_STORY_VIEW_BATCH]
+    if not story_ids:
+        return 0
+    stories = await db.stories.find(
+        active_story_filter({"id": {"$in": story_ids}, "userId": {"$ne": viewer_id}}),
+        {"_id": 0, "id": 1, "userId": 1, "expiresAt": 1}
+    ).to_list(len(story_ids))
+    if not stories:
+        return 0
+
+    now = datetime.utcnow()
+    views = [{
+        "storyId": story['id'],
+        "viewerId": viewer_id,
+        "storyOwnerId": story['userId'],
+        "viewedAt": now,
+        "expiresAt": story['expiresAt'],
+    } for story in stories]
+    try:
+        await db.story_views.insert_many(views, ordered=False)
+        new_ids = [v['storyId'] for v in views]
+    except BulkWriteError as e:
+        # Daha önce görüntülenenler benzersiz index'e takılır
+        duplicates = {err['index'] for err in e.details.get('writeErrors', [])}
+        new_ids = [v['storyId'] for i, v in enumerate(views) if i not in duplicates]
+
+    if new_ids:
+        stories_tray.invalidate_viewer(viewer_id)
+        await db.stories.bulk_write(
+            [UpdateOne({"id": story_id}, {"$inc": {"viewCount": 1}}) for story_id in new_ids],
+            ordered=False
+        )
+    return len(new_ids)
+
+async def viewed_story_ids(viewer_id: str, story_ids: list) -> set:
+    """Verilen hikayelerden kullanıcının gördükleri - tek $in sorgusu"""
+    if not story_ids:
+        return set()
+    views = await db.story_views.find(
+        {"viewerId": viewer_id, "storyId": {"$in": story_ids}}, {"_id": 0, "storyId": 1}
+    ).to_list(len(story_ids))
+    return {v['storyId'] for v in views}
+
+async def migrate_story_views() -> int:
+    """Gömülü viewedBy dizilerini story_views + viewCount'a taşı"""
+    migrated = 0
+    async for story in db.stories.find(
+        {"viewedBy": {"$exists": True}}, {"_id": 1, "id": 1, "userId": 1, "viewedBy": 1, "expiresAt": 1, "createdAt": 1}
+    ):
+        viewers = [v for v in dict.fromkeys(story.get('viewedBy') or []) if v != story.get('userId')]
+        expires_at = story.get('expiresAt') or datetime.utcnow() + timedelta(hours=24)
+        if viewers:
+            try:
+                await db.story_views.insert_many([{
+                    "storyId": story['id'],
+                    "viewerId": viewer,
+                    "storyOwnerId": story.get('userId'),
+                    "viewedAt": story.get('createdAt') or datetime.utcnow(),
+                    "expiresAt": expires_at,
+                } for viewer in viewers], ordered=False)
+            except BulkWriteError:
+                pass
+        await db.stories.update_one(
+            {"_id": story['_id']},
+            {"$set": {"viewCount": await db.story_views.count_documents({"storyId": story['id']})},
+             "$unset": {"viewedBy": ""}}
+        )
+        migrated += 1
+    return migrated
+
+async def run_story_reaper():
+    while True:
+        try:
+            reaped = await reap_expired_story_media()
+            if reaped:
+                logger.info(f"Story media reaped for {reaped} expired stories")
+        except Exception as e:
+            logger.error(f"Story reaper error: {e}")
+        await asyncio.sleep(STORY_REAPER_INTERVAL_SECONDS)
+
 @api_router.get("/stories")
 async def get_stories(current_user: dict = Depends(get_current_user)):
-    """Aktif hikayeleri getir (24 saatten eski olanlar otomatik silinir)"""
-    # 24 saat öncesini hesapla
-    cutoff_time = datetime.utcnow() - timedelta(hours=24)
-    
-    # Eski hikayeleri sil
-    await db.stories.delete_many({"createdAt": {"$lt": cutoff_time}})
-    
-    # Aktif hikayeleri getir (sadece kullanıcı hikayeleri)
-    stories = await db.stories.find({
-        "createdAt": {"$gte": cutoff_time}
-    }).sort("createdAt", -1).to_list(100)
-    
-    # Kullanıcı bazlı grupla
-    user_stories = {}
-    for story in stories:
-        uid = story.get('userId')
-        if uid not in user_stories:
-            user_stories[uid] = {
-                "userId": uid,
-                "userName": story.get('userName', ''),
-                "userProfileImage": story.get('userProfileImage'),
-                "stories": [],
-                "hasViewed": current_user['uid'] in story.get('viewedBy', [])
-            }
-        
-        story_item = {
-            "id": story['id'],
-            "imageUrl": story.get('imageUrl'),
-            "videoUrl": story.get('videoUrl'),
-            "caption": story.get('caption', ''),
-            "createdAt": story['createdAt'].isoformat() if isinstance(story['createdAt'], datetime) else story['createdAt'],
-            "viewCount": len(story.get('viewedBy', [])),
-            "hasViewed": current_user['uid'] in story.get('viewedBy', [])
-        }
-        
-        if '_id' in story:
-            del story['_id']
-        
-        user_stories[uid]['stories'].append(story_item)
-    
-    return list(user_stories.values())
+    """Hikaye tepsisi: topluluk / konuşma paylaşılan kişilerin hikayeleri, görülmemişler önce"""
+    return await stories_tray.get(current_user['uid'])
 
 @api_router.post("/stories")
 async def create_story(data: dict, current_user: dict = Depends(get_current_user)):
@@ -5548,12 +6548,14 @@ async def create_story(data: dict, current_user: dict = Depends(get_current_user
         "imageUrl": data.get('imageUrl'),
         "videoUrl": data.get('videoUrl'),
         "caption": data.get('caption', ''),
-        "viewedBy": [],
+        "viewCount": 0,  # Görüntülemeler story_views koleksiyonunda
+        "communityIds": user.get('communities') or [],
         "createdAt": datetime.utcnow(),
         "expiresAt": datetime.utcnow() + timedelta(hours=24)
     }
     
     await db.stories.insert_one(story)
+    stories_tray.invalidate_author(current_user['uid'], story['communityIds'])
     
     if '_id' in story:
         del story['_id']
@@ -5563,30 +6565,31 @@ async def create_story(data: dict, current_user: dict = Depends(get_current_user
 @api_router.get("/stories/{user_id}")
 async def get_user_stories(user_id: str, current_user: dict = Depends(get_current_user)):
     """Belirli kullanıcının hikayelerini getir"""
-    cutoff_time = datetime.utcnow() - timedelta(hours=24)
-    
-    stories = await db.stories.find({
-        "userId": user_id,
-        "createdAt": {"$gte": cutoff_time}
-    }).sort("createdAt", -1).to_list(50)
+    stories = await db.stories.find(
+        active_story_filter({"userId": user_id}), {"_id": 0, "viewedBy": 0}
+    ).sort("createdAt", -1).to_list(50)
+    viewed = await viewed_story_ids(current_user['uid'], [s['id'] for s in stories])
     
-    result = []
     for story in stories:
-        if '_id' in story:
-            del story['_id']
-        story['viewCount'] = len(story.get('viewedBy', []))
-        story['hasViewed'] = current_user['uid'] in story.get('viewedBy', [])
-        result.append(story)
+        story['viewCount'] = story.get('viewCount', 0)
+        story['hasViewed'] = user_id == current_user['uid'] or story['id'] in viewed
     
-    return result
+    return stories
+
+@api_router.get("/stories/{story_id}/media")
+async def get_story_media(story_id: str, current_user: dict = Depends(get_current_user)):
+    """Hikayenin görseli / videosu (tepsi medya taşımaz)"""
+    story = await db.stories.find_one(
+        active_story_filter({"id": story_id}), {"_id": 0, "id": 1, "imageUrl": 1, "videoUrl": 1}
+    )
+    if not story:
+        raise HTTPException(status_code=404, detail="Hikaye bulunamadı")
+    return story
 
 @api_router.post("/stories/{story_id}/view")
 async def view_story(story_id: str, current_user: dict = Depends(get_current_user)):
-    """Hikayeyi görüntüle"""
-    await db.stories.update_one(
-        {"id": story_id},
-        {"$addToSet": {"viewedBy": current_user['uid']}}
-    )
+    """Hikayeyi görüntüle (toplu kayıt için socket 'story_views' olayı)"""
+    await record_story_views(current_user['uid'], [story_id])
     return {"message": "Görüntülendi"}
 
 @api_router.delete("/stories/{story_id}")
@@ -5602,33 +6605,48 @@ async def delete_story(story_id: str, current_user: dict = Depends(get_current_u
             raise HTTPException(status_code=403, detail="Sadece kendi hikayenizi silebilirsiniz")
     
     await db.stories.delete_one({"id": story_id})
+    await db.story_reactions.delete_many({"storyId": story_id})
+    await db.story_views.delete_many({"storyId": story_id})
+    stories_tray.invalidate_author(story['userId'], story.get('communityIds'))
     return {"message": "Hikaye silindi"}
 
 @api_router.post("/stories/{story_id}/react")
 async def react_to_story(story_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Hikayeye emoji tepkisi ekle"""
-    story = await db.stories.find_one({"id": story_id})
-    if not story:
-        raise HTTPException(status_code=404, detail="Hikaye bulunamadı")
+    story = await find_active_story(story_id)
     
     emoji = data.get('emoji', '❤️')
+    if not is_valid_emoji(emoji):
+        raise HTTPException(status_code=400, detail="Geçerli bir emoji gerekli")
     user = await db.users.find_one({"uid": current_user['uid']})
     sender_name = f"{user.get('firstName', '')} {user.get('lastName', '')}".strip() if user else "Birisi"
     
-    reaction = {
-        "id": str(uuid.uuid4()),
-        "storyId": story_id,
-        "userId": current_user['uid'],
-        "userName": sender_name,
-        "userProfileImage": user.get('profileImageUrl') if user else None,
-        "emoji": emoji,
-        "createdAt": datetime.utcnow()
-    }
+    # Kullanıcı başına tek tepki (upsert); önceki emoji ile sayaç farkı $inc ile uygulanır
+    now = datetime.utcnow()
+    previous = await upsert_and_get_previous(
+        db.story_reactions,
+        {"storyId": story_id, "userId": current_user['uid']},
+        {
+            "$set": {
+                "userName": sender_name,
+                "userProfileImage": user.get('profileImageUrl') if user else None,
+                "emoji": emoji,
+                "updatedAt": now
+            },
+            "$setOnInsert": {"id": str(uuid.uuid4()), "createdAt": now, "expiresAt": story['expiresAt']}
+        },
+        {"_id": 0, "emoji": 1}
+    )
+    previous_emoji = previous.get('emoji') if previous else None
     
-    await db.story_reactions.insert_one(reaction)
+    if previous_emoji != emoji:
+        counts_inc = {f"reactionCounts.{emoji}": 1}
+        if previous_emoji and is_valid_emoji(previous_emoji):
+            counts_inc[f"reactionCounts.{previous_emoji}"] = -1
+        await db.stories.update_one({"id": story_id}, {"$inc": counts_inc})
     
-    # Hikaye sahibine bildirim gönder
-    if story['userId'] != current_user['uid']:
+    # Hikaye sahibine bildirim gönder (sadece ilk tepkide)
+    if story['userId'] != current_user['uid'] and previous is None:
         await send_notification_to_user(
             story['userId'],
             f"{sender_name} hikayenize tepki verdi {emoji}",
@@ -5636,17 +6654,15 @@ async def react_to_story(story_id: str, data: dict, current_user: dict = Depends
             {"type": "story_reaction", "storyId": story_id}
         )
     
-    if '_id' in reaction:
-        del reaction['_id']
-    
+    reaction = await db.story_reactions.find_one(
+        {"storyId": story_id, "userId": current_user['uid']}, {"_id": 0}
+    )
     return reaction
 
 @api_router.post("/stories/{story_id}/reply")
 async def reply_to_story(story_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Hikayeye yanıt gönder (DM olarak)"""
-    story = await db.stories.find_one({"id": story_id})
-    if not story:
-        raise HTTPException(status_code=404, detail="Hikaye bulunamadı")
+    story = await find_active_story(story_id)
     
     message = data.get('message', '')
     if not message:
@@ -5684,7 +6700,8 @@ async def reply_to_story(story_id: str, data: dict, current_user: dict = Depends
             },
             "lastMessage": message,
             "lastMessageTime": datetime.utcnow(),
-            "createdAt": datetime.utcnow()
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
         }
         await db.conversations.insert_one(new_conv)
     
@@ -5700,6 +6717,7 @@ async def reply_to_story(story_id: str, data: dict, current_user: dict = Depends
         "storyId": story_id,
         "storyImageUrl": story.get('imageUrl'),
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "isRead": False
     }
     
@@ -5708,7 +6726,7 @@ async def reply_to_story(story_id: str, data: dict, current_user: dict = Depends
     # Conversation'ı güncelle
     await db.conversations.update_one(
         {"id": conversation_id},
-        {"$set": {"lastMessage": f"Hikayenize yanıt: {message[:50]}...", "lastMessageTime": datetime.utcnow()}}
+        {"$set": {"lastMessage": f"Hikayenize yanıt: {message[:50]}...", "lastMessageTime": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
     )
     
     # Hikaye sahibine bildirim gönder
@@ -5763,22 +6781,30 @@ async def get_story_reactions(story_id: str, current_user: dict = Depends(get_cu
 @api_router.get("/stories/{story_id}/viewers")
 async def get_story_viewers(story_id: str, current_user: dict = Depends(get_current_user)):
     """Hikayeyi görüntüleyenleri getir (sadece hikaye sahibi görebilir)"""
-    story = await db.stories.find_one({"id": story_id})
-    if not story:
-        raise HTTPException(status_code=404, detail="Hikaye bulunamadı")
+    story = await find_active_story(story_id)
     
     if story['userId'] != current_user['uid']:
         raise HTTPException(status_code=403, detail="Sadece kendi hikayenizin görüntüleyenlerini görebilirsiniz")
     
-    viewer_ids = story.get('viewedBy', [])
-    viewers = await db.users.find({"uid": {"$in": viewer_ids}}).to_list(100)
+    views = await db.story_views.find(
+        {"storyId": story_id}, {"_id": 0, "viewerId": 1, "viewedAt": 1}
+    ).sort("viewedAt", -1).to_list(100)
+    viewer_ids = [v['viewerId'] for v in views]
+    viewers = await db.users.find(
+        {"uid": {"$in": viewer_ids}}, {"_id": 0, "uid": 1, "firstName": 1, "lastName": 1, "profileImageUrl": 1}
+    ).to_list(len(viewer_ids))
+    viewers_by_id = {v['uid']: v for v in viewers}
     
     result = []
-    for viewer in viewers:
+    for view in views:
+        viewer = viewers_by_id.get(view['viewerId'])
+        if not viewer:
+            continue
         result.append({
             "userId": viewer['uid'],
             "userName": f"{viewer.get('firstName', '')} {viewer.get('lastName', '')}".strip(),
-            "userProfileImage": viewer.get('profileImageUrl')
+            "userProfileImage": viewer.get('profileImageUrl'),
+            "viewedAt": view.get('viewedAt')
         })
     
     return result
@@ -5789,62 +6815,57 @@ async def get_story_viewers(story_id: str, current_user: dict = Depends(get_curr
 
 async def send_notification_to_user(user_id: str, title: str, body: str, data: dict = None):
     """Kullanıcıya bildirim gönder (hem DB'ye kaydet hem push notification)"""
-    # Bildirimi veritabanına kaydet
-    notification = {
-        "id": str(uuid.uuid4()),
-        "userId": user_id,
-        "title": title,
-        "body": body,
-        "data": data or {},
-        "isRead": False,
-        "createdAt": datetime.utcnow()
-    }
-    await db.notifications.insert_one(notification)
+    # Bildirimi veritabanına kaydet (okunmamış sayacı da artar)
+    await notification_store.create_notification(db, user_id, (data or {}).get('type'), title, body, data)
     
     # Push notification gönder
-    recipient = await db.users.find_one({"uid": user_id})
+    recipient = await db.users.find_one(
+        {"uid": user_id},
+        {"_id": 0, "expoPushToken": 1, "pushToken": 1, notification_store.UNREAD_COUNTER_FIELD: 1}
+    )
     if recipient:
         push_token = recipient.get("expoPushToken") or recipient.get("pushToken")
         if push_token:
-            await send_push_notification(push_token, title, body, data)
+            await send_push_notification(
+                push_token, title, body, data, badge=recipient.get(notification_store.UNREAD_COUNTER_FIELD)
+            )
 
 async def notify_group_message(group_id: str, sender_id: str, sender_name: str, content: str, message_type: str = "text"):
-    """Grup mesajı bildirimi gönder"""
-    subgroup = await db.subgroups.find_one({"id": group_id})
+    """Grup mesajı bildirimi gönder - pencere içindeki mesajlar üye başına tek bildirimde birleşir"""
+    subgroup = await db.subgroups.find_one(
+        {"id": group_id}, {"_id": 0, "name": 1, "members": 1, "mutedMembers": 1}
+    )
     if not subgroup:
         return
     
     group_name = subgroup.get('name', 'Grup')
-    members = subgroup.get('members', [])
-    
-    # Gönderen hariç tüm üyelere bildirim gönder
-    for member_id in members:
-        if member_id != sender_id:
-            # Kullanıcının susturulup susturulmadığını kontrol et
-            muted_members = subgroup.get('mutedMembers', {})
-            if member_id in muted_members:
-                continue
-            
-            # Mesaj tipine göre bildirim içeriği
-            if message_type == "image":
-                preview = "📷 Fotoğraf gönderdi"
-            elif message_type == "video":
-                preview = "🎥 Video gönderdi"
-            elif message_type == "file":
-                preview = "📎 Dosya gönderdi"
-            elif message_type == "location":
-                preview = "📍 Konum paylaştı"
-            elif message_type == "poll":
-                preview = "📊 Anket oluşturdu"
-            else:
-                preview = content[:100] if content else "Yeni mesaj"
-            
-            await send_notification_to_user(
-                member_id,
-                f"{sender_name} • {group_name}",
-                preview,
-                {"type": "group_message", "groupId": group_id}
-            )
+    muted_members = subgroup.get('mutedMembers', {})
+    # Gönderen ve grubu susturanlar hariç
+    recipients = [m for m in subgroup.get('members', []) if m != sender_id and m not in muted_members]
+    
+    # Mesaj tipine göre bildirim içeriği
+    if message_type == "image":
+        preview = "📷 Fotoğraf gönderdi"
+    elif message_type == "video":
+        preview = "🎥 Video gönderdi"
+    elif message_type == "file":
+        preview = "📎 Dosya gönderdi"
+    elif message_type == "location":
+        preview = "📍 Konum paylaştı"
+    elif message_type == "poll":
+        preview = "📊 Anket oluşturdu"
+    else:
+        preview = content[:100] if content else "Yeni mesaj"
+    
+    notification_coalescer.notify(
+        recipients,
+        f"group:{group_id}",
+        "group_message",
+        f"{sender_name} • {group_name}",
+        preview,
+        group_name,
+        {"type": "group_message", "groupId": group_id}
+    )
 
 async def notify_dm_message(sender_id: str, receiver_id: str, sender_name: str, content: str, message_type: str = "text", conversation_id: str = None):
     """DM bildirimi gönder"""
@@ -6380,16 +7401,14 @@ async def create_service_contract(service_id: str, data: dict, current_user: dic
     await db.contracts.insert_one(contract)
     
     # Satıcıya bildirim gönder
-    await db.notifications.insert_one({
-        "id": str(uuid.uuid4()),
-        "userId": service['userId'],
-        "type": "contract_request",
-        "title": "Yeni Sözleşme Talebi",
-        "message": f"{buyer.get('firstName', '')} size bir hizmet talebi gönderdi",
-        "data": {"contractId": contract_id, "serviceId": service_id},
-        "read": False,
-        "createdAt": datetime.utcnow()
-    })
+    await notification_store.create_notification(
+        db,
+        service['userId'],
+        "contract_request",
+        "Yeni Sözleşme Talebi",
+        f"{buyer.get('firstName', '')} size bir hizmet talebi gönderdi",
+        {"contractId": contract_id, "serviceId": service_id}
+    )
     
     return {"message": "Sözleşme oluşturuldu", "contractId": contract_id}
 
@@ -6413,16 +7432,14 @@ async def approve_contract(contract_id: str, current_user: dict = Depends(get_cu
     )
     
     # Alıcıya bildirim gönder
-    await db.notifications.insert_one({
-        "id": str(uuid.uuid4()),
-        "userId": contract['buyerId'],
-        "type": "contract_approved",
-        "title": "Sözleşme Onaylandı",
-        "message": "Hizmet sözleşmeniz onaylandı, iş başlıyor!",
-        "data": {"contractId": contract_id},
-        "read": False,
-        "createdAt": datetime.utcnow()
-    })
+    await notification_store.create_notification(
+        db,
+        contract['buyerId'],
+        "contract_approved",
+        "Sözleşme Onaylandı",
+        "Hizmet sözleşmeniz onaylandı, iş başlıyor!",
+        {"contractId": contract_id}
+    )
     
     return {"message": "Sözleşme onaylandı"}
 
@@ -6479,6 +7496,30 @@ async def get_contract(contract_id: str, current_user: dict = Depends(get_curren
 # ADVANCED SEARCH - Gelişmiş Arama
 # ============================================
 
+# Arama tipi başına zaman bütçesi (saniye); aşan tip boş döner, diğerleri etkilenmez
+ADVANCED_SEARCH_TIMEOUTS = {"users": 1.5, "posts": 1.0, "services": 1.0, "communities": 0.5}
+ADVANCED_SEARCH_USER_PROJECTION = {
+    **USER_SEARCH_PROJECTION, "rating": 1, "badges": 1,
+}
+
+async def _search_page(collection, query: dict, sort: Optional[dict], skip: int, limit: int,
+                       projection: Optional[dict] = None, max_time_ms: Optional[int] = None) -> dict:
+    """Sonuç sayfası + gerçek toplam tek $facet sorgusunda
+
+    $sort, $match'ten hemen sonra ve $facet'ten önce gelir; böylece index'ten
+    karşılanır ve $facet içinde bellekte sıralama yapılmaz.
+    """
+    pipeline = [{"$match": query}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    page_stages = [{"$skip": skip}, {"$limit": limit}, {"$project": {**(projection or {}), "_id": 0}}]
+    pipeline.append({"$facet": {"items": page_stages, "total": [{"$count": "count"}]}})
+    kwargs = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+    result = await collection.aggregate(pipeline, **kwargs).to_list(1)
+    facet = result[0] if result else {}
+    total = facet.get("total") or []
+    return {"items": facet.get("items", []), "total": total[0]["count"] if total else 0}
+
 @api_router.get("/search/advanced")
 async def advanced_search(
     q: str = "",
@@ -6494,128 +7535,105 @@ async def advanced_search(
     limit: int = 20,
     current_user: dict = Depends(get_current_user)
 ):
-    """Gelişmiş arama - meslek, beceri, deneyim, puan ile filtreleme"""
-    results = {
-        "users": [],
-        "posts": [],
-        "services": [],
-        "communities": [],
-        "total": 0
-    }
-    
-    skip = (page - 1) * limit
-    
-    # Kullanıcı araması
-    if type in ["all", "users"]:
-        user_query = {}
-        
-        if q:
-            user_query["$or"] = [
-                {"firstName": {"$regex": q, "$options": "i"}},
-                {"lastName": {"$regex": q, "$options": "i"}},
-                {"bio": {"$regex": q, "$options": "i"}},
-                {"occupation": {"$regex": q, "$options": "i"}},
-                {"skills": {"$regex": q, "$options": "i"}}
-            ]
-        
-        if occupation:
-            user_query["occupation"] = {"$regex": occupation, "$options": "i"}
-        
-        if city:
-            user_query["city"] = {"$regex": city, "$options": "i"}
-        
-        if skills:
-            skill_list = [s.strip() for s in skills.split(",")]
-            user_query["skills"] = {"$in": skill_list}
-        
+    """Gelişmiş arama - meslek, beceri, deneyim, puan ile filtreleme
+
+    Dört arama eşzamanlı çalışır; her biri kendi zaman bütçesiyle sınırlıdır.
+    Deneyim filtresi index'li totalExperienceYears üzerinde sorguda uygulanır,
+    böylece sayfalama ve toplamlar doğru kalır.
+    """
+    limit = max(1, min(limit, 50))
+    skip = (max(1, page) - 1) * limit
+    q = (q or "").strip()
+    q_regex = {"$regex": re.escape(q), "$options": "i"} if q else None
+    
+    # Kullanıcı araması - arama indeksi üzerinde
+    async def search_users():
+        skill_list = [s.strip() for s in skills.split(",") if s.strip()] if skills else None
+        user_query = build_filter_query(
+            city=city,
+            occupation=occupation,
+            skills=skill_list,
+            min_experience_years=experience_years,
+        )
         if min_rating > 0:
             user_query["rating.average"] = {"$gte": min_rating}
-        
         if has_badge:
             user_query["badges"] = has_badge
-        
-        # İş deneyimi yılı filtresi
-        if experience_years > 0:
-            user_query["workExperience"] = {"$exists": True, "$ne": []}
-        
-        sort_field = [("rating.average", -1)] if sort_by == "rating" else [("createdAt", -1)]
-        
-        users = await db.users.find(
-            user_query,
-            {"password": 0, "email": 0}
-        ).sort(sort_field).skip(skip).limit(limit).to_list(limit)
-        
-        for u in users:
-            if '_id' in u:
-                del u['_id']
-            # İş deneyimi yılını hesapla
-            work_exp = u.get('workExperience', [])
-            total_years = 0
-            for exp in work_exp:
-                start = exp.get('startDate', '')
-                end = exp.get('endDate', '') if not exp.get('current') else str(datetime.utcnow().year)
-                if start and end:
-                    try:
-                        start_year = int(start.split('/')[-1]) if '/' in start else int(start[:4])
-                        end_year = int(end.split('/')[-1]) if '/' in end else int(end[:4])
-                        total_years += max(0, end_year - start_year)
-                    except:
-                        pass
-            u['totalExperienceYears'] = total_years
-            
-            # Deneyim filtresi uygula
-            if experience_years > 0 and total_years < experience_years:
-                continue
-            
-            results["users"].append(u)
+        user_sort = {"rating": "rating", "date": "recent"}.get(sort_by, "relevance")
+        pipeline = build_search_pipeline(
+            q, user_query, user_sort, skip, limit, ADVANCED_SEARCH_USER_PROJECTION, facets=False
+        )
+        result = parse_search_result(await db.users.aggregate(
+            pipeline, maxTimeMS=int(ADVANCED_SEARCH_TIMEOUTS["users"] * 1000)
+        ).to_list(1))
+        for u in result["users"]:
+            u.setdefault("totalExperienceYears", 0)
+        return {"items": result["users"], "total": result["total"]}
     
     # Post araması
-    if type in ["all", "posts"]:
-        post_query = {}
-        if q:
-            post_query["content"] = {"$regex": q, "$options": "i"}
-        
-        posts = await db.posts.find(post_query).sort("createdAt", -1).skip(skip).limit(limit).to_list(limit)
-        
-        for p in posts:
-            if '_id' in p:
-                del p['_id']
-            results["posts"].append(p)
+    async def search_posts():
+        post_query = {"content": q_regex} if q_regex else {}
+        page = await _search_page(
+            db.posts, post_query, {"timestamp": -1}, skip, limit,
+            max_time_ms=int(ADVANCED_SEARCH_TIMEOUTS["posts"] * 1000)
+        )
+        await decorate_posts(page["items"], current_user['uid'])
+        return page
     
     # Hizmet araması
-    if type in ["all", "services"]:
+    async def search_services():
         service_query = {"isActive": True}
-        if q:
-            service_query["$or"] = [
-                {"title": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}},
-                {"category": {"$regex": q, "$options": "i"}}
-            ]
-        
-        services = await db.services.find(service_query).sort("createdAt", -1).skip(skip).limit(limit).to_list(limit)
-        
-        for s in services:
-            if '_id' in s:
-                del s['_id']
-            results["services"].append(s)
+        if q_regex:
+            service_query["$or"] = [{"title": q_regex}, {"description": q_regex}, {"category": q_regex}]
+        return await _search_page(
+            db.services, service_query, {"createdAt": -1}, skip, limit,
+            max_time_ms=int(ADVANCED_SEARCH_TIMEOUTS["services"] * 1000)
+        )
     
     # Topluluk araması
-    if type in ["all", "communities"]:
-        community_query = {}
-        if q:
-            community_query["$or"] = [
-                {"name": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}}
-            ]
-        
-        communities = await db.communities.find(community_query).skip(skip).limit(limit).to_list(limit)
-        
-        for c in communities:
-            if '_id' in c:
-                del c['_id']
-            results["communities"].append(c)
+    async def search_communities():
+        community_query = {"$or": [{"name": q_regex}, {"description": q_regex}]} if q_regex else {}
+        return await _search_page(
+            db.communities, community_query, {"name": 1}, skip, limit,
+            max_time_ms=int(ADVANCED_SEARCH_TIMEOUTS["communities"] * 1000)
+        )
+    
+    searches = {
+        "users": search_users,
+        "posts": search_posts,
+        "services": search_services,
+        "communities": search_communities,
+    }
+    selected = [name for name in searches if type in ("all", name)]
     
-    results["total"] = len(results["users"]) + len(results["posts"]) + len(results["services"]) + len(results["communities"])
+    async def run_with_budget(name):
+        try:
+            return await asyncio.wait_for(searches[name](), timeout=ADVANCED_SEARCH_TIMEOUTS[name])
+        except (asyncio.TimeoutError, ExecutionTimeout) as e:
+            # Zaman aşımı (istemci veya sunucu tarafı maxTimeMS) - bu tip boş döner
+            logger.warning(f"Advanced search '{name}' timed out: {e!r}")
+            return None
+    
+    outcomes = await asyncio.gather(*[run_with_budget(name) for name in selected])
+    
+    results = {
+        "users": [],
+        "posts": [],
+        "services": [],
+        "communities": [],
+        "totals": {},
+        "timedOut": [],
+        "total": 0,
+        "page": page,
+        "limit": limit,
+    }
+    for name, outcome in zip(selected, outcomes):
+        if outcome is None:
+            results["timedOut"].append(name)
+            continue
+        results[name] = outcome["items"]
+        results["totals"][name] = outcome["total"]
+    results["total"] = sum(results["totals"].values())
     
     return results
 
@@ -6696,45 +7714,24 @@ async def admin_delete_mentor(mentor_id: str, current_user: dict = Depends(get_c
 # MESSAGING ENHANCEMENTS - Gelişmiş Mesajlaşma
 # ============================================
 
-# Typing durumları (in-memory cache)
-typing_status = {}  # {conversation_id: {user_id: timestamp}}
+# Typing durumları - paylaşımlı TTL deposu (realtime.TypingStore)
+# Not: Socket.IO 'typing' olayı birincil yoldur; bu uçlar polling yapan eski
+# istemciler için aynı depoyu okuyup yazan ince uyumluluk katmanıdır.
 
 @api_router.post("/conversations/{conversation_id}/typing")
 async def set_typing_status(conversation_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Yazıyor durumunu ayarla"""
     is_typing = data.get('isTyping', False)
-    
-    if conversation_id not in typing_status:
-        typing_status[conversation_id] = {}
-    
-    if is_typing:
-        typing_status[conversation_id][current_user['uid']] = datetime.utcnow()
-    else:
-        typing_status[conversation_id].pop(current_user['uid'], None)
-    
+    if not await user_can_access_room(current_user['uid'], conversation_id):
+        raise HTTPException(status_code=403, detail="Bu odaya erişim yetkiniz yok")
+    await typing_manager.set_typing(conversation_id, current_user['uid'], bool(is_typing))
     return {"status": "ok"}
 
 @api_router.get("/conversations/{conversation_id}/typing")
 async def get_typing_status(conversation_id: str, current_user: dict = Depends(get_current_user)):
     """Yazıyor durumunu kontrol et"""
-    if conversation_id not in typing_status:
-        return {"typingUsers": []}
-    
-    # 5 saniyeden eski typing durumlarını temizle
-    now = datetime.utcnow()
-    active_typing = []
-    for user_id, timestamp in list(typing_status[conversation_id].items()):
-        if (now - timestamp).total_seconds() < 5 and user_id != current_user['uid']:
-            user = await db.users.find_one({"uid": user_id})
-            if user:
-                active_typing.append({
-                    "uid": user_id,
-                    "name": f"{user.get('firstName', '')} {user.get('lastName', '')}".strip()
-                })
-        elif (now - timestamp).total_seconds() >= 5:
-            del typing_status[conversation_id][user_id]
-    
-    return {"typingUsers": active_typing}
+    typing_users = await typing_manager.get_typing_users(conversation_id, exclude_uid=current_user['uid'])
+    return {"typingUsers": [{"uid": t['uid'], "name": t.get('name', '')} for t in typing_users]}
 
 @api_router.post("/conversations/{conversation_id}/messages/{message_id}/read")
 async def mark_message_read(conversation_id: str, message_id: str, current_user: dict = Depends(get_current_user)):
@@ -6742,6 +7739,7 @@ async def mark_message_read(conversation_id: str, message_id: str, current_user:
     result = await db.dm_messages.update_one(
         {"id": message_id, "conversationId": conversation_id},
         {"$set": {
+            "updatedAt": datetime.utcnow(),
             "read": True,
             "readAt": datetime.utcnow(),
             "readBy": current_user['uid']
@@ -6786,6 +7784,7 @@ async def send_reply_message(conversation_id: str, data: dict, current_user: dic
         "id": str(uuid.uuid4()),
         "conversationId": conversation_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(data),
         "senderName": sender_name,
         "senderImage": user.get('profileImageUrl') if user else None,
         "content": content,
@@ -6797,12 +7796,15 @@ async def send_reply_message(conversation_id: str, data: dict, current_user: dic
             "senderId": reply_to_message.get('senderId') if reply_to_message else None,
         } if reply_to_message else None,
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "read": False,
         "delivered": True,
         "deliveredAt": datetime.utcnow(),
     }
     
-    await db.dm_messages.insert_one(message)
+    created, message = await insert_message_once(db.dm_messages, message)
+    if not created:
+        return message
     
     other_user_id = [p for p in conversation["participants"] if p != current_user['uid']][0]
     
@@ -6812,6 +7814,7 @@ async def send_reply_message(conversation_id: str, data: dict, current_user: dic
             "$set": {
                 "lastMessage": content[:50] + "..." if len(content) > 50 else content,
                 "lastMessageTime": message["timestamp"],
+                "updatedAt": datetime.utcnow(),
             },
             "$inc": {f"unreadCount.{other_user_id}": 1}
         }
@@ -6824,44 +7827,21 @@ async def send_reply_message(conversation_id: str, data: dict, current_user: dic
     
     return message
 
-# Grup mesajları için typing
-group_typing_status = {}  # {group_id: {user_id: timestamp}}
-
+# Grup mesajları için typing (paylaşımlı TTL deposu)
 @api_router.post("/subgroups/{group_id}/typing")
 async def set_group_typing_status(group_id: str, data: dict, current_user: dict = Depends(get_current_user)):
     """Grup yazıyor durumunu ayarla"""
     is_typing = data.get('isTyping', False)
-    
-    if group_id not in group_typing_status:
-        group_typing_status[group_id] = {}
-    
-    if is_typing:
-        group_typing_status[group_id][current_user['uid']] = datetime.utcnow()
-    else:
-        group_typing_status[group_id].pop(current_user['uid'], None)
-    
+    if not await user_can_access_room(current_user['uid'], group_id):
+        raise HTTPException(status_code=403, detail="Bu odaya erişim yetkiniz yok")
+    await typing_manager.set_typing(group_id, current_user['uid'], bool(is_typing))
     return {"status": "ok"}
 
 @api_router.get("/subgroups/{group_id}/typing")
 async def get_group_typing_status(group_id: str, current_user: dict = Depends(get_current_user)):
     """Grup yazıyor durumunu kontrol et"""
-    if group_id not in group_typing_status:
-        return {"typingUsers": []}
-    
-    now = datetime.utcnow()
-    active_typing = []
-    for user_id, timestamp in list(group_typing_status[group_id].items()):
-        if (now - timestamp).total_seconds() < 5 and user_id != current_user['uid']:
-            user = await db.users.find_one({"uid": user_id})
-            if user:
-                active_typing.append({
-                    "uid": user_id,
-                    "name": f"{user.get('firstName', '')}".strip()
-                })
-        elif (now - timestamp).total_seconds() >= 5:
-            del group_typing_status[group_id][user_id]
-    
-    return {"typingUsers": active_typing}
+    typing_users = await typing_manager.get_typing_users(group_id, exclude_uid=current_user['uid'])
+    return {"typingUsers": [{"uid": t['uid'], "name": t.get('firstName', '')} for t in typing_users]}
 
 @api_router.post("/subgroups/{group_id}/messages/reply")
 async def send_group_reply_message(group_id: str, data: dict, current_user: dict = Depends(get_current_user)):
@@ -6899,6 +7879,7 @@ async def send_group_reply_message(group_id: str, data: dict, current_user: dict
         "id": str(uuid.uuid4()),
         "groupId": group_id,
         "senderId": current_user['uid'],
+        "clientMessageId": get_client_message_id(data),
         "senderName": sender_name,
         "senderImage": user.get('profileImageUrl') if user else None,
         "content": content,
@@ -6910,11 +7891,14 @@ async def send_group_reply_message(group_id: str, data: dict, current_user: dict
             "senderId": reply_to_message.get('senderId') if reply_to_message else None,
         } if reply_to_message else None,
         "timestamp": datetime.utcnow(),
+        "updatedAt": datetime.utcnow(),
         "readBy": [current_user['uid']],
         "reactions": {},
     }
     
-    await db.messages.insert_one(message)
+    created, message = await insert_message_once(db.messages, message)
+    if not created:
+        return message
     
     # Subgroup güncelle
     await db.subgroups.update_one(
@@ -6930,6 +7914,117 @@ async def send_group_reply_message(group_id: str, data: dict, current_user: dict
     
     return message
 
+# ============================================
+# DELTA SYNC - Çevrimdışı sonrası tek istekte senkronizasyon
+# ============================================
+
+# Yazma/commit gecikmesi nedeniyle kaçırılan kayıt olmaması için son birkaç saniye hariç tutulur
+SYNC_SAFETY_SECONDS = 2
+SYNC_DEFAULT_LIMIT = 100
+SYNC_MAX_LIMIT = 500
+SYNC_STREAMS = ["messages", "directMessages", "conversations", "readCursors", "notifications"]
+
+async def update_read_cursor(uid: str, room: str, room_type: str):
+    """Kullanıcının odadaki okuma imlecini güncelle (read_cursors koleksiyonu)"""
+    now = datetime.utcnow()
+    await db.read_cursors.update_one(
+        {"userId": uid, "room": room},
+        {
+            "$set": {"roomType": room_type, "lastReadAt": now, "updatedAt": now},
+            "$setOnInsert": {"id": str(uuid.uuid4())}
+        },
+        upsert=True
+    )
+
+def encode_sync_token(cursors: dict) -> str:
+    payload = {name: [ts.isoformat(), last_id] for name, (ts, last_id) in cursors.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_sync_token(token: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        return {name: (datetime.fromisoformat(ts), last_id) for name, (ts, last_id) in payload.items()}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz senkronizasyon anahtarı")
+
+async def _sync_stream(collection, match: dict, cursor: tuple, upper: datetime, limit: int, time_field: str = "updatedAt"):
+    """(zaman, id) imlecinden sonraki kayıtları zaman sırasıyla getir.
+    Dönen imleç: sayfa dolmadıysa üst sınıra ilerletilir (sonraki istek boş taramaz)."""
+    ts, last_id = cursor
+    query = {
+        **match,
+        time_field: {"$lte": upper},
+        "$or": [
+            {time_field: {"$gt": ts}},
+            {time_field: ts, "id": {"$gt": last_id}},
+        ],
+    }
+    docs = await collection.find(query, {"_id": 0}).sort([(time_field, 1), ("id", 1)]).limit(limit).to_list(limit)
+
+    if len(docs) < limit:
+        next_cursor = (upper, "")
+    else:
+        next_cursor = (docs[-1][time_field], docs[-1].get("id", ""))
+    return docs, next_cursor, len(docs) >= limit
+
+@api_router.get("/sync")
+async def delta_sync(since: Optional[str] = None, limit: int = SYNC_DEFAULT_LIMIT, current_user: dict = Depends(get_current_user)):
+    """Son senkronizasyondan bu yana değişenleri tek istekte döner:
+    grup/DM mesajları (yeni, düzenlenen, silinen, tepkiler), okuma imleçleri,
+    konuşma özetleri ve yeni bildirimler.
+
+    since verilmezse sadece güncel anahtar döner (ilk yükleme REST ile yapılır).
+    hasMore=true ise aynı istek dönen syncToken ile tekrarlanmalıdır.
+    """
+    uid = current_user['uid']
+    limit = max(1, min(limit, SYNC_MAX_LIMIT))
+    upper = datetime.utcnow() - timedelta(seconds=SYNC_SAFETY_SECONDS)
+
+    if not since:
+        cursors = {name: (upper, "") for name in SYNC_STREAMS}
+        return {
+            **{name: [] for name in SYNC_STREAMS},
+            "syncToken": encode_sync_token(cursors),
+            "hasMore": False,
+            "serverTime": upper,
+        }
+
+    cursors = decode_sync_token(since)
+    for name in SYNC_STREAMS:
+        cursors.setdefault(name, (upper, ""))
+
+    subgroup_ids = [sg['id'] for sg in await db.subgroups.find({"members": uid}, {"_id": 0, "id": 1}).to_list(1000)]
+    conversation_ids = [c['id'] for c in await db.conversations.find({"participants": uid}, {"_id": 0, "id": 1}).to_list(1000)]
+
+    streams = {
+        "messages": (db.messages, {"groupId": {"$in": subgroup_ids}}, {}),
+        "directMessages": (db.dm_messages, {"conversationId": {"$in": conversation_ids}}, {}),
+        "conversations": (db.conversations, {"participants": uid}, {}),
+        # Kendi imleçleri + DM'lerde karşı tarafın imleci (grup üyelerinin okuma konumları gönderilmez)
+        "readCursors": (db.read_cursors, {"$or": [{"userId": uid}, {"room": {"$in": conversation_ids}}]}, {}),
+        "notifications": (db.notifications, {"userId": uid}, {"time_field": "createdAt"}),
+    }
+
+    result = {}
+    has_more = False
+    for name, (collection, match, options) in streams.items():
+        docs, cursors[name], more = await _sync_stream(collection, match, cursors[name], upper, limit, **options)
+        result[name] = docs
+        has_more = has_more or more
+
+    # Kullanıcı için silinmiş grup mesajlarını maskele
+    for msg in result["messages"]:
+        if uid in msg.get('deletedFor', []):
+            msg['isDeleted'] = True
+            msg['content'] = 'Bu mesaj silindi'
+
+    return {
+        **result,
+        "syncToken": encode_sync_token(cursors),
+        "hasMore": has_more,
+        "serverTime": upper,
+    }
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -6964,8 +8059,208 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def create_index_safe(collection, keys, **kwargs):
+    """Index oluştur; eski verideki çakışmalar (ör. tekil index) diğer index'leri engellemesin"""
+    try:
+        await collection.create_index(keys, **kwargs)
+    except Exception as e:
+        logger.error(f"Index oluşturulamadı ({collection.name} {keys}): {e}")
+
+async def ensure_indexes():
+    """Uygulamanın ihtiyaç duyduğu MongoDB index'lerini oluştur (idempotent)"""
+    await typing_store.ensure_indexes()
+    # Delta sync (GET /sync) - updatedAt imleçleri
+    await create_index_safe(db.messages, [("groupId", 1), ("updatedAt", 1), ("id", 1)])
+    await create_index_safe(db.dm_messages, [("conversationId", 1), ("updatedAt", 1), ("id", 1)])
+    await create_index_safe(db.conversations, [("participants", 1), ("updatedAt", 1)])
+    await create_index_safe(db.read_cursors, [("userId", 1), ("room", 1)], unique=True)
+    await create_index_safe(db.read_cursors, [("room", 1), ("updatedAt", 1)])
+    await create_index_safe(db.read_cursors, [("userId", 1), ("updatedAt", 1)])
+    await notification_store.ensure_indexes(db, create_index_safe)
+    # Alt grup katılma istekleri - admin kuyruğu ve kullanıcı başına tek bekleyen istek
+    await create_index_safe(db.subgroup_join_requests, [("status", 1), ("requestedAt", -1), ("id", -1)])
+    await create_index_safe(
+        db.subgroup_join_requests, [("communityId", 1), ("status", 1), ("requestedAt", -1), ("id", -1)]
+    )
+    await create_index_safe(db.subgroup_join_requests, [("subgroupId", 1), ("status", 1), ("requestedAt", -1)])
+    await create_index_safe(
+        db.subgroup_join_requests, [("subgroupId", 1), ("userId", 1)],
+        unique=True, partialFilterExpression={"status": JOIN_REQUEST_PENDING}
+    )
+    await create_index_safe(db.subgroup_join_requests, [("userId", 1), ("status", 1), ("subgroupId", 1)])
+    await create_index_safe(db.subgroup_join_requests, [("id", 1)], unique=True)
+    await create_index_safe(db.subgroup_join_requests, [("decisionId", 1)], sparse=True)
+    await notification_coalescer.ensure_indexes(create_index_safe)
+    await broadcast_engine.ensure_indexes(create_index_safe)
+    # Idempotent mesaj gönderimi
+    for collection in (db.messages, db.dm_messages):
+        await create_index_safe(
+            collection,
+            [("senderId", 1), ("clientMessageId", 1)],
+            unique=True,
+            partialFilterExpression={"clientMessageId": {"$type": "string"}}
+        )
+    # Anket oyları - kullanıcı başına tek oy kaydı
+    await create_index_safe(db.poll_votes, [("pollId", 1), ("uid", 1)], unique=True)
+    # Kullanıcı arama indeksi
+    await user_search.ensure_indexes(db, create_index_safe)
+    # Yönetici listesi (GET /admin/users?is_admin=true)
+    await create_index_safe(db.users, [("isAdmin", 1), ("_id", -1)], partialFilterExpression={"isAdmin": True})
+    # Panel sayaçlarının uzlaştırması - yasaklı kullanıcı sayısı
+    await create_index_safe(db.users, [("isBanned", 1)], partialFilterExpression={"isBanned": True})
+    # Hikaye tepkileri - kullanıcı başına tek kayıt (eski tekrarlı kayıtlar varsa log'lanır)
+    await create_index_safe(db.story_reactions, [("storyId", 1), ("userId", 1)], unique=True)
+    # Hikaye süresi - TTL (hikayeler medya temizliği için kısa bir ek süreyle)
+    await create_index_safe(db.stories, [("expiresAt", 1)], expireAfterSeconds=STORY_TTL_GRACE_SECONDS)
+    await create_index_safe(db.stories, [("userId", 1), ("expiresAt", 1)])
+    await create_index_safe(db.story_reactions, [("expiresAt", 1)], expireAfterSeconds=STORY_TTL_GRACE_SECONDS)
+    await create_index_safe(db.story_views, [("expiresAt", 1)], expireAfterSeconds=STORY_TTL_GRACE_SECONDS)
+    # Hikaye görüntülemeleri - izleyici başına tek kayıt; tepsi için (viewerId, storyId) $in
+    await create_index_safe(db.story_views, [("storyId", 1), ("viewerId", 1)], unique=True)
+    await create_index_safe(db.story_views, [("viewerId", 1), ("storyId", 1)])
+    await create_index_safe(db.story_views, [("storyId", 1), ("viewedAt", -1)])
+    # Akış sayfalama imleci
+    await create_index_safe(db.posts, [("timestamp", -1), ("id", -1)])
+    # Gönderi beğenileri - kullanıcı başına tek kayıt; akış için (uid, postId) $in sorgusu
+    await create_index_safe(db.post_likes, [("postId", 1), ("uid", 1)], unique=True)
+    await create_index_safe(db.post_likes, [("uid", 1), ("postId", 1)])
+    await create_index_safe(db.comments, [("postId", 1), ("timestamp", 1)])
+    # Gelişmiş arama sıralamaları ($match + $sort index'ten)
+    await create_index_safe(db.services, [("isActive", 1), ("createdAt", -1)])
+    await create_index_safe(db.communities, [("name", 1)])
+    await timeline_engine.ensure_indexes(create_index_safe)
+    await hashtag_engine.ensure_indexes(create_index_safe)
+    await stories_tray.ensure_indexes(create_index_safe)
+    # Popüler meslek / beceri istatistikleri
+    await occupation_stats.ensure_indexes(create_index_safe)
+    await skill_stats.ensure_indexes(create_index_safe)
+
+async def run_background_migrations():
+    """Uzun sürebilecek veri doldurma işleri - açılışı bloklamadan arka planda"""
+    try:
+        updated = await user_search.backfill_search_index(db)
+        if updated:
+            logger.info(f"User search index backfilled for {updated} users")
+    except Exception as e:
+        logger.error(f"User search backfill error: {e}")
+    try:
+        updated = await backfill_post_timestamps()
+        if updated:
+            logger.info(f"Post timestamps backfilled for {updated} posts")
+    except Exception as e:
+        logger.error(f"Post timestamp backfill error: {e}")
+    try:
+        backfilled = await backfill_post_community_ids()
+        if backfilled:
+            logger.info(f"Post communityIds backfilled for {backfilled} posts")
+        community_ids = [c['id'] for c in await db.communities.find({}, {"_id": 0, "id": 1}).to_list(None) if c.get('id')]
+        await timeline_engine.seed_missing(community_ids)
+        timeline_engine.ready = True
+    except Exception as e:
+        logger.error(f"Post communityIds backfill error: {e}")
+    try:
+        backfilled = await backfill_story_expiry()
+        if backfilled:
+            logger.info(f"Story expiry backfilled for {backfilled} documents")
+    except Exception as e:
+        logger.error(f"Story expiry backfill error: {e}")
+    try:
+        backfilled = await backfill_story_community_ids()
+        if backfilled:
+            logger.info(f"Story communityIds backfilled for {backfilled} stories")
+    except Exception as e:
+        logger.error(f"Story communityIds backfill error: {e}")
+    try:
+        migrated = await migrate_story_views()
+        if migrated:
+            logger.info(f"Story views migrated for {migrated} stories")
+    except Exception as e:
+        logger.error(f"Story views migration error: {e}")
+    try:
+        migrated = await migrate_pending_join_requests()
+        if migrated:
+            logger.info(f"Pending join requests migrated: {migrated}")
+    except Exception as e:
+        logger.error(f"Join request migration error: {e}")
+    try:
+        migrated = await notification_store.migrate_legacy_notifications(db)
+        if migrated:
+            logger.info(f"Legacy notifications migrated: {migrated}")
+        fixed = await notification_store.reconcile_unread_counts(db)
+        if fixed:
+            logger.info(f"Unread notification counters fixed for {fixed} users")
+    except Exception as e:
+        logger.error(f"Notification migration error: {e}")
+    try:
+        backfilled = await hashtag_engine.backfill()
+        if backfilled:
+            logger.info(f"Post hashtags backfilled for {backfilled} posts")
+    except Exception as e:
+        logger.error(f"Hashtag backfill error: {e}")
+    try:
+        migrated = await migrate_post_counters()
+        if migrated:
+            logger.info(f"Post like/comment counters migrated for {migrated} posts")
+    except Exception as e:
+        logger.error(f"Post counter migration error: {e}")
+    asyncio.create_task(refresh_autocomplete_index())
+    asyncio.create_task(run_story_reaper())
+    asyncio.create_task(rebuild_popular_stats())
+    asyncio.create_task(notification_coalescer.run_flusher())
+    asyncio.create_task(notification_coalescer.run_digests())
+    asyncio.create_task(run_notification_rollup())
+    asyncio.create_task(reconcile_stats_counters())
+    asyncio.create_task(broadcast_engine.run_stale_reaper())
+
+async def refresh_autocomplete_index():
+    """Otomatik tamamlama indeksini periyodik olarak baştan kur (diğer worker'ların değişiklikleri için)"""
+    while True:
+        try:
+            await autocomplete_index.rebuild(db)
+        except Exception as e:
+            logger.error(f"Autocomplete index rebuild error: {e}")
+        await asyncio.sleep(AUTOCOMPLETE_REFRESH_SECONDS)
+
+async def run_notification_rollup():
+    """Çok eski okunmamış bildirimleri periyodik olarak özet kayıtlarına topla"""
+    while True:
+        try:
+            rolled = await notification_store.rollup_old_unread(db)
+            if rolled:
+                logger.info(f"Old unread notifications rolled up: {rolled}")
+        except Exception as e:
+            logger.error(f"Notification rollup error: {e}")
+        await asyncio.sleep(notification_store.ROLLUP_INTERVAL_SECONDS)
+
+async def reconcile_stats_counters():
+    """Panel sayaçlarını periyodik olarak kaynak koleksiyonlardan düzelt (kirayı alan tek worker)"""
+    while True:
+        try:
+            if await stats_counters.acquire_reconcile_lease(RECONCILE_INTERVAL_SECONDS):
+                fixed = await stats_counters.reconcile()
+                if fixed:
+                    logger.info(f"Stats counters reconciled: {fixed}")
+        except Exception as e:
+            logger.error(f"Stats counters reconcile error: {e}")
+        await asyncio.sleep(RECONCILE_CHECK_SECONDS)
+
+async def rebuild_popular_stats():
+    """Meslek / beceri sayılarını periyodik olarak users koleksiyonundan yeniden hesapla"""
+    while True:
+        for stats in (occupation_stats, skill_stats):
+            try:
+                await stats.rebuild()
+            except Exception as e:
+                logger.error(f"Popular stats rebuild error ({stats.collection_name}): {e}")
+        await asyncio.sleep(POPULAR_STATS_REBUILD_SECONDS)
+
 @app.on_event("startup")
 async def startup_event():
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+    asyncio.create_task(run_background_migrations())
     try:
         await initialize_city_communities()
         await ensure_admin_in_all_communities()
@@ -0,0 +1,146 @@
+"""
+Yönetim Paneli Sayaçları (stats_counters)
+- Tek 'global' belgede toplam sayılar; yazma noktalarında $inc ile güncellenir
+- Yeni kullanıcılar günlük belgelerde ('daily:YYYY-MM-DD') tutulur; haftalık sayı
+  son 7 günün toplamıdır
+- Periyodik uzlaştırma (reconcile) kaskad silmeler gibi kaçan değişiklikleri düzeltir;
+  kira (lease) belgesiyle aralık başına tek worker çalıştırır, toplamlar
+  estimated_document_count ile (koleksiyon taranmadan) okunur
+- Panel tüm sayaçları tek $in sorgusuyla okur
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from pymongo.errors import DuplicateKeyError
+
+GLOBAL_ID = "global"
+LEASE_ID = "reconcile_lease"
+RECONCILE_INTERVAL_SECONDS = 3600
+# Kira süresi dolmuş mu diye bakma sıklığı
+RECONCILE_CHECK_SECONDS = 300
+NEW_USER_DAYS = 7
+
+# Koleksiyon -> toplam sayaç alanı
+COLLECTION_COUNTERS = {
+    "users": "totalUsers",
+    "communities": "totalCommunities",
+    "subgroups": "totalSubgroups",
+    "messages": "totalMessages",
+    "posts": "totalPosts",
+    "services": "totalServices",
+}
+COUNTER_FIELDS = list(COLLECTION_COUNTERS.values()) + ["bannedUsers", "pendingRequests"]
+
+
+def _daily_id(day: datetime) -> str:
+    return f"daily:{day.strftime('%Y-%m-%d')}"
+
+
+class StatsCounters:
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.stats_counters
+
+    async def inc(self, **deltas: int):
+        """stats_counters.inc(totalPosts=1, pendingRequests=-1)"""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        await self.collection.update_one(
+            {"_id": GLOBAL_ID},
+            {"$inc": deltas, "$set": {"updatedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def on_insert(self, collection_name: str, count: int = 1):
+        field = COLLECTION_COUNTERS.get(collection_name)
+        if field:
+            await self.inc(**{field: count})
+
+    async def on_delete(self, collection_name: str, count: int = 1):
+        field = COLLECTION_COUNTERS.get(collection_name)
+        if field:
+            await self.inc(**{field: -count})
+
+    async def on_user_created(self):
+        now = datetime.utcnow()
+        await self.inc(totalUsers=1)
+        await self.collection.update_one(
+            {"_id": _daily_id(now)},
+            {"$inc": {"newUsers": 1}, "$setOnInsert": {"day": now.replace(hour=0, minute=0, second=0, microsecond=0)}},
+            upsert=True,
+        )
+
+    async def snapshot(self) -> dict:
+        """Global sayaçlar + son 7 günün yeni kullanıcıları - tek sorgu"""
+        now = datetime.utcnow()
+        daily_ids = [_daily_id(now - timedelta(days=i)) for i in range(NEW_USER_DAYS)]
+        docs = await self.collection.find({"_id": {"$in": [GLOBAL_ID] + daily_ids}}).to_list(len(daily_ids) + 1)
+        counters = next((d for d in docs if d['_id'] == GLOBAL_ID), {})
+        return {
+            "stats": {
+                **{field: max(0, counters.get(field) or 0) for field in COUNTER_FIELDS},
+                "newUsersThisWeek": sum(d.get('newUsers') or 0 for d in docs if d['_id'] != GLOBAL_ID),
+            },
+            "generatedAt": counters.get('updatedAt'),
+            "reconciledAt": counters.get('reconciledAt'),
+        }
+
+    async def acquire_reconcile_lease(self, interval_seconds: int = RECONCILE_INTERVAL_SECONDS) -> bool:
+        """Süresi dolmuş kirayı al; aralık başına sadece bir worker True alır"""
+        now = datetime.utcnow()
+        try:
+            result = await self.collection.update_one(
+                {"_id": LEASE_ID, "expiresAt": {"$lte": now}},
+                {"$set": {"expiresAt": now + timedelta(seconds=interval_seconds), "acquiredAt": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Kira başka bir worker'da ve süresi dolmamış
+            return False
+        return bool(result.modified_count or result.upserted_id)
+
+    async def reconcile(self) -> Dict[str, int]:
+        """Sayaçları kaynak koleksiyonlardan yeniden hesapla; sadece değişen toplamlar yazılır
+        (arada gelen $inc'ler değişmeyen alanlarda ezilmez)"""
+        values = {}
+        for collection_name, field in COLLECTION_COUNTERS.items():
+            values[field] = await self.db[collection_name].estimated_document_count()
+        values["bannedUsers"] = await self.db.users.count_documents({"isBanned": True})
+        values["pendingRequests"] = await self._count_pending_requests()
+
+        current = await self.collection.find_one({"_id": GLOBAL_ID}, {field: 1 for field in COUNTER_FIELDS}) or {}
+        changed = {field: value for field, value in values.items() if current.get(field) != value}
+
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": GLOBAL_ID},
+            {"$set": {**changed, "updatedAt": now, "reconciledAt": now}},
+            upsert=True,
+        )
+        await self._reconcile_daily(now)
+        return changed
+
+    async def _count_pending_requests(self) -> int:
+        return await self.db.subgroup_join_requests.count_documents({"status": "pending"})
+
+    async def _reconcile_daily(self, now: datetime):
+        start = (now - timedelta(days=NEW_USER_DAYS - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows: List[dict] = await self.db.users.aggregate([
+            {"$match": {"createdAt": {"$gte": start}}},
+            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}}, "count": {"$sum": 1}}},
+        ]).to_list(NEW_USER_DAYS + 1)
+        counts = {f"daily:{r['_id']}": r['count'] for r in rows}
+        for i in range(NEW_USER_DAYS):
+            day = start + timedelta(days=i)
+            await self.collection.update_one(
+                {"_id": _daily_id(day)},
+                {"$set": {"newUsers": counts.get(_daily_id(day), 0), "day": day}},
+                upsert=True,
+            )
+        # Eski günlük belgeler artık okunmaz
+        await self.collection.delete_many({"day": {"$lt": start - timedelta(days=1)}})
@@ -0,0 +1,172 @@
+"""
+Hikaye Tepsisi (stories tray)
+- Kullanıcının topluluk veya konuşma paylaştığı kişilerin aktif hikayeleri
+- Hikayelerde yazarın 'communityIds' dizisi tutulur; tepsi tek bir $or sorgusuyla
+  veritabanında yazar başına gruplanır (global "son 100 hikaye" penceresi yok)
+- Görülmemiş gruplar önce; kullanıcı başına kısa ömürlü süreç içi önbellek,
+  hikaye ekleme / silme ve görüntülemede geçersiz kılınır
+- Tepsi medya taşımaz (inline base64); görsel / video hikaye başına
+  GET /stories/{story_id}/media ile yüklenir
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+TRAY_CACHE_SECONDS = 30
+MAX_CACHED_TRAYS = 10000
+MAX_TRAY_AUTHORS = 200
+MAX_STORIES_PER_AUTHOR = 30
+# Konuşma ortakları en son mesajlaşılan konuşmalardan alınır
+MAX_CONVERSATIONS = 500
+
+
+class StoriesTray:
+    def __init__(self, db):
+        self.db = db
+        # uid -> {"expires", "communities", "partners", "authors", "tray"}
+        self._cache: Dict[str, dict] = {}
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.db.stories, [("communityIds", 1), ("expiresAt", 1)])
+        await create_index(self.db.conversations, [("participants", 1), ("lastMessageTime", -1)])
+        await create_index(self.db.blocked_users, [("blockerId", 1), ("blockedId", 1)])
+        await create_index(self.db.blocked_users, [("blockedId", 1)])
+
+    async def _audience(self, uid: str) -> tuple:
+        """(topluluklar, konuşma ortakları, engelli kullanıcılar)"""
+        user = await self.db.users.find_one({"uid": uid}, {"_id": 0, "communities": 1})
+        communities = set((user or {}).get('communities') or [])
+
+        conversations = await self.db.conversations.find(
+            {"participants": uid}, {"_id": 0, "participants": 1}
+        ).sort("lastMessageTime", -1).limit(MAX_CONVERSATIONS).to_list(MAX_CONVERSATIONS)
+        partners = {p for c in conversations for p in c.get('participants') or [] if p != uid}
+
+        # Engelleme her iki yönde de hikayeleri gizler
+        blocks = await self.db.blocked_users.find(
+            {"$or": [{"blockerId": uid}, {"blockedId": uid}]}, {"_id": 0, "blockerId": 1, "blockedId": 1}
+        ).to_list(None)
+        blocked = {b['blockedId'] if b.get('blockerId') == uid else b.get('blockerId') for b in blocks}
+        return communities, partners, blocked
+
+    async def _build(self, uid: str, communities: set, partners: set, blocked: set) -> List[dict]:
+        match = {
+            "expiresAt": {"$gt": datetime.utcnow()},
+            "$or": [
+                {"userId": uid},
+                {"communityIds": {"$in": list(communities)}},
+                {"userId": {"$in": list(partners)}},
+            ],
+        }
+        if blocked:
+            match["userId"] = {"$nin": list(blocked)}
+        pipeline = [
+            {"$match": match},
+            {"$project": {
+                "_id": 0, "id": 1, "userId": 1, "userName": 1, "userProfileImage": 1,
+                "caption": 1, "createdAt": 1, "viewCount": 1,
+            }},
+            {"$sort": {"createdAt": -1}},
+            {"$group": {
+                "_id": "$userId",
+                "userName": {"$first": "$userName"},
+                "userProfileImage": {"$first": "$userProfileImage"},
+                "latest": {"$first": "$createdAt"},
+                "stories": {"$push": {
+                    "id": "$id",
+                    "caption": "$caption",
+                    "createdAt": "$createdAt",
+                    "viewCount": "$viewCount",
+                }},
+            }},
+            {"$sort": {"latest": -1}},
+            {"$limit": MAX_TRAY_AUTHORS},
+            {"$project": {
+                "userName": 1, "userProfileImage": 1, "latest": 1,
+                "stories": {"$slice": ["$stories", MAX_STORIES_PER_AUTHOR]},
+            }},
+        ]
+        groups = await self.db.stories.aggregate(pipeline).to_list(MAX_TRAY_AUTHORS)
+
+        story_ids = [s['id'] for g in groups if g['_id'] != uid for s in g['stories']]
+        viewed = set()
+        if story_ids:
+            views = await self.db.story_views.find(
+                {"viewerId": uid, "storyId": {"$in": story_ids}}, {"_id": 0, "storyId": 1}
+            ).to_list(len(story_ids))
+            viewed = {v['storyId'] for v in views}
+
+        tray = []
+        for group in groups:
+            own = group['_id'] == uid
+            stories = []
+            for story in group['stories']:
+                created_at = story.get('createdAt')
+                stories.append({
+                    **story,
+                    "caption": story.get('caption') or '',
+                    "createdAt": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+                    "viewCount": story.get('viewCount') or 0,
+                    "hasViewed": own or story['id'] in viewed,
+                })
+            tray.append({
+                "userId": group['_id'],
+                "userName": group.get('userName') or '',
+                "userProfileImage": group.get('userProfileImage'),
+                "stories": stories,
+                "hasViewed": all(s['hasViewed'] for s in stories),
+                "_own": own,
+                "_latest": group.get('latest'),
+            })
+
+        # Kendi hikayeleri başta, sonra görülmemişler; her grup kendi içinde en yeniden eskiye
+        tray.sort(key=lambda g: (not g['_own'], g['hasViewed']))
+        for group in tray:
+            del group['_own'], group['_latest']
+        return tray
+
+    async def get(self, uid: str) -> List[dict]:
+        now = time.monotonic()
+        cached = self._cache.get(uid)
+        if cached and cached['expires'] > now:
+            return cached['tray']
+
+        communities, partners, blocked = await self._audience(uid)
+        tray = await self._build(uid, communities, partners, blocked)
+        self._store(uid, {
+            "expires": now + TRAY_CACHE_SECONDS,
+            "communities": communities,
+            "partners": partners,
+            "authors": {g['userId'] for g in tray},
+            "tray": tray,
+        })
+        return tray
+
+    def _store(self, uid: str, entry: dict):
+        if len(self._cache) >= MAX_CACHED_TRAYS:
+            now = time.monotonic()
+            for key in [k for k, v in self._cache.items() if v['expires'] <= now]:
+                del self._cache[key]
+            while len(self._cache) >= MAX_CACHED_TRAYS:
+                # En eski eklenen kayıt
+                del self._cache[next(iter(self._cache))]
+        self._cache.pop(uid, None)
+        self._cache[uid] = entry
+
+    def invalidate_viewer(self, uid: str):
+        """Kullanıcının görüntülemeleri değişti (hasViewed)"""
+        self._cache.pop(uid, None)
+
+    def invalidate_author(self, author_id: str, community_ids: Optional[List[str]] = None):
+        """Yazarın hikayesini görebilecek kullanıcıların tepsilerini düşür"""
+        communities = set(community_ids or [])
+        stale = [
+            uid for uid, entry in self._cache.items()
+            if uid == author_id
+            or author_id in entry['authors']
+            or author_id in entry['partners']
+            or communities & entry['communities']
+        ]
+        for uid in stale:
+            del self._cache[uid]
@@ -0,0 +1,175 @@
+"""
+Topluluk Zaman Akışları (fan-out on write)
+- Her gönderi, yazarın topluluklarının sınırlı (capped) akış kovalarına eklenir
+- Ekleme arka planda yapılır; gönderi isteğini bekletmez
+- "Benim akışım" = kullanıcının topluluk kovalarının birleştirilmesi
+- Kova penceresi dışına çıkıldığında veya çok fazla topluluk varsa
+  posts.communityIds index'i üzerinden çekme (pull) sorgusuna düşülür
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Kova başına tutulan en yeni gönderi sayısı
+TIMELINE_BUCKET_SIZE = 500
+# Bundan fazla topluluğu olan kullanıcılar için birleştirme yerine doğrudan sorgu
+MAX_MERGED_BUCKETS = 20
+
+
+class TimelineEngine:
+    def __init__(self, db):
+        self.db = db
+        self._tasks = set()
+        # Arka planda doldurulmakta olan topluluk kovaları
+        self._seeding = set()
+        # Eski gönderilerin communityIds doldurması bitene kadar kovalar kullanılmaz
+        self.ready = False
+
+    @property
+    def buckets(self):
+        return self.db.community_timelines
+
+    async def ensure_indexes(self, create_index):
+        await create_index(self.db.posts, [("communityIds", 1), ("timestamp", -1), ("id", -1)])
+
+    @staticmethod
+    def _entry(post: dict) -> dict:
+        return {"postId": post['id'], "ts": post['timestamp']}
+
+    def fan_out(self, post: dict):
+        """Gönderiyi topluluk kovalarına arka planda ekle"""
+        if not post.get('communityIds'):
+            return
+        task = asyncio.create_task(self._fan_out(post))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fan_out(self, post: dict):
+        try:
+            entry = self._entry(post)
+            operations = [
+                UpdateOne(
+                    {"_id": community_id},
+                    {
+                        "$push": {"entries": {
+                            "$each": [entry],
+                            "$sort": {"ts": -1, "postId": -1},
+                            "$slice": TIMELINE_BUCKET_SIZE,
+                        }},
+                        "$set": {"updatedAt": datetime.utcnow()},
+                    },
+                    upsert=True,
+                )
+                for community_id in post['communityIds']
+            ]
+            await self.buckets.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Timeline fan-out error for post {post.get('id')}: {e}")
+
+    async def remove(self, post_id: str, community_ids: List[str]):
+        if community_ids:
+            await self.buckets.update_many(
+                {"_id": {"$in": community_ids}}, {"$pull": {"entries": {"postId": post_id}}}
+            )
+
+    async def seed_bucket(self, community_id: str):
+        """Kovayı son gönderilerle doldur; sadece 'seeded' kovalar okunur.
+
+        Girdiler üzerine yazılmaz, birleştirilir: bu sırada _fan_out'un
+        eklediği yeni gönderiler kaybolmaz.
+        """
+        posts = await self.db.posts.find(
+            {"communityIds": community_id}, {"_id": 0, "id": 1, "timestamp": 1}
+        ).sort([("timestamp", -1), ("id", -1)]).limit(TIMELINE_BUCKET_SIZE).to_list(TIMELINE_BUCKET_SIZE)
+        bucket = await self.buckets.find_one({"_id": community_id}, {"entries.postId": 1}) or {}
+        present = {e['postId'] for e in bucket.get('entries') or []}
+        try:
+            await self.buckets.update_one(
+                {"_id": community_id, "seeded": {"$ne": True}},
+                {
+                    "$push": {"entries": {
+                        "$each": [self._entry(p) for p in posts if p['id'] not in present],
+                        "$sort": {"ts": -1, "postId": -1},
+                        "$slice": TIMELINE_BUCKET_SIZE,
+                    }},
+                    "$set": {"seeded": True, "updatedAt": datetime.utcnow()},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Başka bir işçi kovayı zaten doldurdu
+            pass
+
+    async def seed_missing(self, community_ids: List[str]) -> int:
+        seeded = {d['_id'] for d in await self.buckets.find(
+            {"_id": {"$in": community_ids}, "seeded": True}, {"_id": 1}
+        ).to_list(len(community_ids))}
+        missing = [c for c in community_ids if c not in seeded]
+        for community_id in missing:
+            await self.seed_bucket(community_id)
+        return len(missing)
+
+    def _seed_in_background(self, community_ids: List[str]):
+        pending = [c for c in community_ids if c not in self._seeding]
+        if not pending:
+            return
+        self._seeding.update(pending)
+        task = asyncio.create_task(self.seed_missing(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._seeding.difference_update(pending))
+
+    async def page(self, community_ids: List[str], cursor: Optional[Tuple[datetime, str]],
+                   limit: int) -> Optional[Tuple[List[str], bool]]:
+        """Kovalardan bir sayfa gönderi id'si.
+
+        Dönen değer (post_ids, has_more); kovalar bu sayfayı karşılayamıyorsa
+        (pencere dışı, eksik kova veya çok fazla topluluk) None -> pull sorgusu.
+        """
+        if not self.ready or len(community_ids) > MAX_MERGED_BUCKETS:
+            return None
+        docs = await self.buckets.find(
+            {"_id": {"$in": community_ids}, "seeded": True}, {"entries": 1}
+        ).to_list(len(community_ids))
+        if len(docs) < len(community_ids):
+            # Yeni topluluk kovası - bu istek çekme sorgusuyla, sonrakiler kovadan
+            self._seed_in_background(community_ids)
+            return None
+
+        # Dolu bir kovanın en eski girdisinden daha eskisi kovalarda eksik olabilir
+        horizon = max(
+            ((d['entries'][-1]['ts'], d['entries'][-1]['postId']) for d in docs
+             if len(d.get('entries') or []) >= TIMELINE_BUCKET_SIZE),
+            default=None,
+        )
+        merged = heapq.merge(
+            *[d.get('entries') or [] for d in docs],
+            key=lambda e: (e['ts'], e['postId']),
+            reverse=True,
+        )
+        post_ids: List[str] = []
+        seen = set()
+        for entry in merged:
+            key = (entry['ts'], entry['postId'])
+            if cursor and key >= cursor:
+                continue
+            if horizon and key < horizon:
+                break
+            if entry['postId'] in seen:
+                continue
+            seen.add(entry['postId'])
+            post_ids.append(entry['postId'])
+            if len(post_ids) > limit:
+                return post_ids[:limit], True
+        if horizon:
+            # Pencere bitti ama daha eski gönderiler olabilir
+            return None if len(post_ids) < limit else (post_ids, True)
+        return post_ids, False
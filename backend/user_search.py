@@ -0,0 +1,331 @@
+"""
+Kullanıcı Arama İndeksi
+- Türkçe büyük/küçük harf katlama ve aksan sadeleştirme (İ/ı, ş, ğ, ç, ö, ü)
+- Önek (edge n-gram) eşleşmesi + yazım hatalarına karşı trigram yedeği
+- Alan ağırlıklı ilgi puanı (isim > meslek/beceri > şirket/unvan > bio)
+- Sonuçlar, toplam ve facet sayıları tek $facet sorgusunda
+
+Her kullanıcı belgesinde 'searchIndex' alt belgesi ve index'li
+'totalExperienceYears' alanı tutulur; profil güncellemesinde yeniden
+hesaplanır, eski belgeler açılışta doldurulur.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# İndeks yapısı değişirse artırılır; eski sürümlü belgeler yeniden hesaplanır
+# v2: totalExperienceYears alanı eklendi
+SEARCH_INDEX_VERSION = 2
+
+MIN_PREFIX_LENGTH = 1
+MAX_PREFIX_LENGTH = 10
+TRIGRAM_MATCH_RATIO = 0.5
+FACET_LIMIT = 10
+
+# İlgi puanı ağırlıkları
+NAME_EXACT_WEIGHT = 6
+NAME_PREFIX_WEIGHT = 4
+PROFESSION_PREFIX_WEIGHT = 3
+EXPERIENCE_PREFIX_WEIGHT = 2
+BIO_TOKEN_WEIGHT = 1
+
+_TURKISH_FOLD = str.maketrans({
+    'İ': 'i', 'I': 'i', 'ı': 'i',
+    'Ş': 's', 'ş': 's',
+    'Ğ': 'g', 'ğ': 'g',
+    'Ç': 'c', 'ç': 'c',
+    'Ö': 'o', 'ö': 'o',
+    'Ü': 'u', 'ü': 'u',
+    'Â': 'a', 'â': 'a',
+    'Î': 'i', 'î': 'i',
+    'Û': 'u', 'û': 'u',
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def fold_turkish(text: Optional[str]) -> str:
+    """Türkçe'ye duyarlı katlama: 'İSTANBUL', 'istanbul', 'Istanbul' -> 'istanbul'"""
+    if not text:
+        return ""
+    return text.translate(_TURKISH_FOLD).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(fold_turkish(text))
+
+
+def edge_ngrams(token: str) -> List[str]:
+    return [token[:i] for i in range(MIN_PREFIX_LENGTH, min(len(token), MAX_PREFIX_LENGTH) + 1)]
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f"  {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _prefixes(tokens: List[str]) -> List[str]:
+    result = set()
+    for token in tokens:
+        result.update(edge_ngrams(token))
+    return sorted(result)
+
+
+def _parse_year(value) -> Optional[int]:
+    """'MM/YYYY', 'YYYY-MM-DD' veya 'YYYY' biçimlerinden yılı al"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return int(value.split('/')[-1]) if '/' in value else int(value[:4])
+    except ValueError:
+        return None
+
+
+def compute_experience_years(work_experience, now: Optional[datetime] = None) -> int:
+    """İş deneyimlerinden toplam yıl; devam eden işler yazma anındaki yıla kadar sayılır"""
+    current_year = (now or datetime.utcnow()).year
+    total = 0
+    for exp in work_experience or []:
+        if not isinstance(exp, dict):
+            continue
+        start = _parse_year(exp.get('startDate'))
+        end = current_year if exp.get('current') else _parse_year(exp.get('endDate'))
+        if start and end:
+            total += max(0, end - start)
+    return total
+
+
+def build_search_index(user: dict) -> dict:
+    """Kullanıcı belgesinden 'searchIndex' alt belgesini üret"""
+    name_tokens = tokenize(f"{user.get('firstName') or ''} {user.get('lastName') or ''}")
+    occupation = user.get('occupation') or ''
+    skills = [s for s in (user.get('skills') or []) if isinstance(s, str) and s]
+    experiences = [e for e in (user.get('workExperience') or []) if isinstance(e, dict)]
+    companies = [e.get('company') or '' for e in experiences if e.get('company')]
+    titles = [e.get('title') or '' for e in experiences if e.get('title')]
+
+    profession_tokens = tokenize(occupation) + [t for s in skills for t in tokenize(s)]
+    experience_tokens = [t for v in companies + titles for t in tokenize(v)]
+    # Sorgu kelimeleri MAX_PREFIX_LENGTH'e kısaltıldığı için tam kelimeler de kısaltılır
+    bio_tokens = sorted({t[:MAX_PREFIX_LENGTH] for t in tokenize(user.get('bio'))})
+
+    name_prefixes = _prefixes(name_tokens)
+    profession_prefixes = _prefixes(profession_tokens)
+    experience_prefixes = _prefixes(experience_tokens)
+
+    grams = set()
+    for token in name_tokens + profession_tokens:
+        grams.update(trigrams(token))
+
+    return {
+        "v": SEARCH_INDEX_VERSION,
+        "nameTokens": sorted({t[:MAX_PREFIX_LENGTH] for t in name_tokens}),
+        "namePrefixes": name_prefixes,
+        "professionPrefixes": profession_prefixes,
+        "experiencePrefixes": experience_prefixes,
+        "bioTokens": bio_tokens,
+        # Aday seçimi için birleşik önek listesi (multikey index)
+        "prefixes": sorted(set(name_prefixes) | set(profession_prefixes) | set(experience_prefixes) | set(bio_tokens)),
+        "grams": sorted(grams),
+        # Filtreler için katlanmış değerler
+        "city": fold_turkish(user.get('city')),
+        "occupation": fold_turkish(occupation),
+        "skills": sorted({fold_turkish(s) for s in skills}),
+        "companies": sorted({fold_turkish(c) for c in companies}),
+        "titles": sorted({fold_turkish(t) for t in titles}),
+        "name": " ".join(name_tokens),
+    }
+
+
+async def ensure_indexes(db, create_index):
+    await create_index(db.users, [("searchIndex.prefixes", 1)])
+    await create_index(db.users, [("searchIndex.grams", 1)])
+    await create_index(db.users, [("searchIndex.city", 1)])
+    await create_index(db.users, [("searchIndex.occupation", 1)])
+    await create_index(db.users, [("searchIndex.skills", 1)])
+    await create_index(db.users, [("searchIndex.companies", 1)])
+    await create_index(db.users, [("searchIndex.v", 1)])
+    await create_index(db.users, [("totalExperienceYears", 1)])
+    # Sorgusuz arama (ilk yükleme) sıralamaları
+    await create_index(db.users, [("createdAt", -1), ("uid", 1)])
+    await create_index(db.users, [("searchIndex.name", 1), ("uid", 1)])
+
+
+async def backfill_search_index(db, batch_size: int = 500) -> int:
+    """searchIndex'i olmayan veya eski sürümlü kullanıcıları doldur (totalExperienceYears dahil)"""
+    updated = 0
+    query = {"$or": [{"searchIndex": {"$exists": False}}, {"searchIndex.v": {"$ne": SEARCH_INDEX_VERSION}}]}
+    projection = {"_id": 1, "firstName": 1, "lastName": 1, "occupation": 1, "skills": 1,
+                  "workExperience": 1, "bio": 1, "city": 1}
+    while True:
+        users = await db.users.find(query, projection).limit(batch_size).to_list(batch_size)
+        if not users:
+            return updated
+        for user in users:
+            await db.users.update_one({"_id": user["_id"]}, {"$set": {
+                "searchIndex": build_search_index(user),
+                "totalExperienceYears": compute_experience_years(user.get("workExperience")),
+            }})
+        updated += len(users)
+
+
+def _prefix_regex(value: str) -> dict:
+    return {"$regex": f"^{re.escape(fold_turkish(value).strip())}"}
+
+
+def build_filter_query(exclude_uid: Optional[str] = None, city: Optional[str] = None,
+                       occupation: Optional[str] = None, skills: Optional[List[str]] = None,
+                       company: Optional[str] = None, title: Optional[str] = None,
+                       min_experience_years: Optional[int] = None) -> dict:
+    """Katlanmış alanlar üzerinde index dostu (çapalı) filtreler"""
+    query: Dict = {}
+    if exclude_uid:
+        query["uid"] = {"$ne": exclude_uid}
+    if city and city.strip():
+        query["searchIndex.city"] = fold_turkish(city).strip()
+    if occupation and occupation.strip():
+        query["searchIndex.occupation"] = _prefix_regex(occupation)
+    if skills:
+        folded_skills = [fold_turkish(s).strip() for s in skills if s and s.strip()]
+        if folded_skills:
+            query["searchIndex.skills"] = {"$all": folded_skills}
+    if company and company.strip():
+        query["searchIndex.companies"] = _prefix_regex(company)
+    if title and title.strip():
+        query["searchIndex.titles"] = _prefix_regex(title)
+    if min_experience_years and min_experience_years > 0:
+        query["totalExperienceYears"] = {"$gte": min_experience_years}
+    return query
+
+
+def _score_expression(tokens: List[str]) -> dict:
+    """Her arama kelimesi için alan ağırlıklı puan toplamı"""
+    terms = []
+    for token in tokens:
+        terms.append({"$cond": [{"$in": [token, {"$ifNull": ["$searchIndex.nameTokens", []]}]}, NAME_EXACT_WEIGHT, 0]})
+        terms.append({"$cond": [{"$in": [token, {"$ifNull": ["$searchIndex.namePrefixes", []]}]}, NAME_PREFIX_WEIGHT, 0]})
+        terms.append({"$cond": [{"$in": [token, {"$ifNull": ["$searchIndex.professionPrefixes", []]}]}, PROFESSION_PREFIX_WEIGHT, 0]})
+        terms.append({"$cond": [{"$in": [token, {"$ifNull": ["$searchIndex.experiencePrefixes", []]}]}, EXPERIENCE_PREFIX_WEIGHT, 0]})
+        terms.append({"$cond": [{"$in": [token, {"$ifNull": ["$searchIndex.bioTokens", []]}]}, BIO_TOKEN_WEIGHT, 0]})
+    return {"$add": terms} if terms else {"$literal": 0}
+
+
+# Sıralama ve facet'ler için yeterli ince belge; profil görseli (base64) gibi ağır
+# alanlar sıralamaya girmez, sadece sayfadaki kullanıcılar için $lookup ile okunur
+SLIM_FIELDS = {
+    "_id": 1, "uid": 1, "city": 1, "occupation": 1, "skills": 1, "createdAt": 1,
+    "totalExperienceYears": 1, "rating.average": 1, "searchIndex.name": 1,
+}
+# ensure_indexes'teki (createdAt, uid) ve (searchIndex.name, uid) index'leri
+INDEXED_SORTS = ("recent", "name")
+
+
+def build_search_pipeline(q: Optional[str], filters: dict, sort_by: str, skip: int, limit: int,
+                          projection: dict, fuzzy: bool = False, facets: bool = True) -> List[dict]:
+    """Arama + toplam + facet'ler tek aggregate ile.
+
+    fuzzy=False: her kelime bir önekle eşleşmeli ($all, multikey index)
+    fuzzy=True : trigram örtüşmesi (yazım hatası yedeği)
+    facets=False: sadece sonuçlar + toplam (şehir/meslek/beceri sayımları atlanır)
+
+    $sort, $facet'ten önce ve ince belgeler üzerinde çalışır; q boşsa $match'ten
+    hemen sonra gelir ve createdAt / isim index'iyle karşılanır.
+    """
+    tokens = [t[:MAX_PREFIX_LENGTH] for t in tokenize(q)][:8]
+    match = dict(filters)
+    pipeline: List[dict] = []
+
+    if tokens and not fuzzy:
+        match["searchIndex.prefixes"] = {"$all": tokens}
+        pipeline.append({"$match": match})
+        pipeline.append({"$addFields": {"_score": _score_expression(tokens)}})
+    elif tokens:
+        query_grams = sorted({g for t in tokens for g in trigrams(t)})
+        match["searchIndex.grams"] = {"$in": query_grams}
+        min_overlap = max(1, int(len(query_grams) * TRIGRAM_MATCH_RATIO))
+        pipeline.append({"$match": match})
+        pipeline.append({"$addFields": {"_score": {"$size": {"$setIntersection": [
+            {"$ifNull": ["$searchIndex.grams", []]}, query_grams
+        ]}}}})
+        pipeline.append({"$match": {"_score": {"$gte": min_overlap}}})
+    else:
+        pipeline.append({"$match": match})
+
+    sort_options = {
+        "relevance": {"_score": -1, "createdAt": -1, "uid": 1},
+        "name": {"searchIndex.name": 1, "uid": 1},
+        "recent": {"createdAt": -1, "uid": 1},
+        "rating": {"rating.average": -1, "_score": -1, "uid": 1},
+        "experience": {"totalExperienceYears": -1, "_score": -1, "uid": 1},
+    }
+    sort_stage = sort_options.get(sort_by, sort_options["relevance"])
+    if not tokens:
+        if sort_by == "relevance":
+            sort_by, sort_stage = "recent", sort_options["recent"]
+        sort_stage = {k: v for k, v in sort_stage.items() if k != "_score"}
+
+    if not tokens and sort_by in INDEXED_SORTS:
+        # Puan yok: $match'ten hemen sonraki $sort index'ten karşılanır, ardından inceltilir
+        pipeline.append({"$sort": sort_stage})
+        pipeline.append({"$project": SLIM_FIELDS})
+    else:
+        pipeline.append({"$project": {**SLIM_FIELDS, "_score": 1} if tokens else SLIM_FIELDS})
+        pipeline.append({"$sort": sort_stage})
+
+    stages = {
+        "users": [
+            {"$skip": skip},
+            {"$limit": limit},
+            # Sadece sayfadaki kullanıcıların tam alanları
+            {"$lookup": {"from": "users", "localField": "_id", "foreignField": "_id", "as": "_doc"}},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": [{"$arrayElemAt": ["$_doc", 0]}]}}},
+            {"$project": {**projection, "_id": 0}},
+        ],
+        "total": [{"$count": "count"}],
+    }
+    if facets:
+        stages.update(_facet_stages())
+    pipeline.append({"$facet": stages})
+    return pipeline
+
+
+def _facet_stages() -> dict:
+    return {
+        "cities": [
+            {"$match": {"city": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$city", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT},
+        ],
+        "occupations": [
+            {"$match": {"occupation": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$occupation", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT},
+        ],
+        "skills": [
+            {"$unwind": "$skills"},
+            {"$group": {"_id": "$skills", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT},
+        ],
+    }
+
+
+def parse_search_result(result: List[dict]) -> dict:
+    facet = result[0] if result else {}
+    total = facet.get("total") or []
+
+    def buckets(name, key):
+        return [{key: b["_id"], "count": b["count"]} for b in facet.get(name, [])]
+
+    return {
+        "users": facet.get("users", []),
+        "total": total[0]["count"] if total else 0,
+        "facets": {
+            "cities": buckets("cities", "city"),
+            "occupations": buckets("occupations", "occupation"),
+            "skills": buckets("skills", "skill"),
+        },
+    }
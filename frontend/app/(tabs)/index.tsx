@@ -49,8 +49,6 @@ interface Story {
   userProfileImage?: string;
   stories: {
     id: string;
-    imageUrl?: string;
-    videoUrl?: string;
     caption?: string;
     createdAt: string;
     viewCount: number;
@@ -281,8 +279,8 @@ export default function HomeScreen() {
   const [welcomeDismissed, setWelcomeDismissed] = useState(false);
   const [showAnnouncement, setShowAnnouncement] = useState(true);
   const [hasMorePosts, setHasMorePosts] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loadingMore, setLoadingMore] = useState(false);
-  const [currentPage, setCurrentPage] = useState(0);
   const POSTS_PER_PAGE = 20;
   
   // Story States - Instagram tarzı
@@ -296,6 +294,8 @@ export default function HomeScreen() {
   const [selectedStoryVideo, setSelectedStoryVideo] = useState<string | null>(null);
   const [uploadingStory, setUploadingStory] = useState(false);
   const [storyPaused, setStoryPaused] = useState(false);
+  // Hikaye medyası (id -> görsel/video), görüntülenirken yüklenir
+  const [storyMedia, setStoryMedia] = useState<Record<string, { imageUrl?: string; videoUrl?: string }>>({});
   
   // Story interaction states
   const [showStoryReply, setShowStoryReply] = useState(false);
@@ -327,13 +327,13 @@ export default function HomeScreen() {
       }
       
       // Posts yükle - ilk sayfa
-      const postsResponse = await postApi.getAll(0, POSTS_PER_PAGE);
+      const postsResponse = await postApi.getAll(null, POSTS_PER_PAGE);
       const postsData = postsResponse.data;
       
-      // Yeni API formatı: { posts: [], total: number, hasMore: boolean }
+      // API formatı: { posts: [], nextCursor: string | null, hasMore: boolean }
       const allPosts = postsData.posts || postsData || [];
       setHasMorePosts(postsData.hasMore ?? true);
-      setCurrentPage(0);
+      setNextCursor(postsData.nextCursor ?? null);
       
       // Sabitlenmiş gönderileri ayır
       const pinned = allPosts.filter((p: any) => p.isPinned === true);
@@ -386,14 +386,11 @@ export default function HomeScreen() {
 
   // Daha fazla post yükle
   const loadMorePosts = useCallback(async () => {
-    if (loadingMore || !hasMorePosts) return;
+    if (loadingMore || !hasMorePosts || !nextCursor) return;
     
     setLoadingMore(true);
     try {
-      const nextPage = currentPage + 1;
-      const skip = nextPage * POSTS_PER_PAGE;
-      
-      const response = await postApi.getAll(skip, POSTS_PER_PAGE);
+      const response = await postApi.getAll(nextCursor, POSTS_PER_PAGE);
       const postsData = response.data;
       
       const newPosts = postsData.posts || postsData || [];
@@ -401,16 +398,16 @@ export default function HomeScreen() {
       if (newPosts.length > 0) {
         const unpinned = newPosts.filter((p: any) => !p.isPinned);
         setPosts(prev => [...prev, ...unpinned]);
-        setCurrentPage(nextPage);
       }
       
-      setHasMorePosts(postsData.hasMore ?? (newPosts.length === POSTS_PER_PAGE));
+      setNextCursor(postsData.nextCursor ?? null);
+      setHasMorePosts(postsData.hasMore ?? false);
     } catch (error) {
       console.error('Error loading more posts:', error);
     } finally {
       setLoadingMore(false);
     }
-  }, [currentPage, hasMorePosts, loadingMore]);
+  }, [nextCursor, hasMorePosts, loadingMore]);
 
   useEffect(() => {
     loadData();
@@ -757,6 +754,23 @@ export default function HomeScreen() {
     );
   };
 
+  // Açık hikayenin ve sıradakinin medyasını yükle
+  useEffect(() => {
+    if (!showStoryViewer || !currentStory) return;
+    const ids = currentStory.stories
+      .slice(currentStoryIndex, currentStoryIndex + 2)
+      .map((s) => s.id)
+      .filter((id) => !storyMedia[id]);
+    ids.forEach(async (id) => {
+      try {
+        const response = await storyApi.getMedia(id);
+        setStoryMedia((prev) => ({ ...prev, [id]: response.data }));
+      } catch (e) {
+        console.log('Story media error:', e);
+      }
+    });
+  }, [showStoryViewer, currentStory, currentStoryIndex]);
+
   // Hikaye progress timer (pause desteği ile)
   useEffect(() => {
     if (showStoryViewer && currentStory && !storyPaused && !showStoryReply && !showEmojiPicker) {
@@ -1278,11 +1292,17 @@ export default function HomeScreen() {
               </View>
 
               {/* Story Image */}
-              <Image 
-                source={{ uri: currentStory.stories[currentStoryIndex].imageUrl }}
-                style={styles.storyViewerImage}
-                resizeMode="contain"
-              />
+              {storyMedia[currentStory.stories[currentStoryIndex].id]?.imageUrl ? (
+                <Image 
+                  source={{ uri: storyMedia[currentStory.stories[currentStoryIndex].id].imageUrl }}
+                  style={styles.storyViewerImage}
+                  resizeMode="contain"
+                />
+              ) : !storyMedia[currentStory.stories[currentStoryIndex].id] ? (
+                <View style={[styles.storyViewerImage, { justifyContent: 'center', alignItems: 'center' }]}>
+                  <ActivityIndicator color="#fff" />
+                </View>
+              ) : null}
 
               {/* Caption */}
               {currentStory.stories[currentStoryIndex].caption ? (
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
   View,
   Text,
@@ -9,11 +9,12 @@ import {
   Alert,
   ActivityIndicator,
   Image,
+  TextInput,
 } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../src/services/api';
+import { adminApi } from '../../src/services/api';
 
 interface Admin {
   uid: string;
@@ -31,26 +32,74 @@ export default function AdminAdminsScreen() {
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const [showAllUsers, setShowAllUsers] = useState(false);
+  const [userSearch, setUserSearch] = useState('');
+  const [usersCursor, setUsersCursor] = useState<string | null>(null);
+  const [loadingMoreUsers, setLoadingMoreUsers] = useState(false);
+  const userSearchRef = useRef('');
   const router = useRouter();
 
+  // Yöneticiler sunucuda filtrelenir; tüm sayfalar yüklenir (yönetici sayısı az)
+  const loadAdmins = useCallback(async () => {
+    const result: Admin[] = [];
+    let cursor: string | undefined;
+    do {
+      const response = await adminApi.getUsers({ is_admin: true, limit: 100, cursor });
+      result.push(...(response.data?.users || []));
+      cursor = response.data?.nextCursor || undefined;
+    } while (cursor);
+    setAdmins(result);
+  }, []);
+
+  // Aday kullanıcılar: sunucu tarafı arama + imleçli sayfalama
+  const loadUsers = useCallback(async (search: string, cursor?: string) => {
+    const response = await adminApi.getUsers({
+      is_admin: false,
+      limit: 20,
+      search: search.trim() || undefined,
+      cursor,
+    });
+    const users = response.data?.users || [];
+    setAllUsers((prev) => (cursor ? [...prev, ...users] : users));
+    setUsersCursor(response.data?.nextCursor || null);
+  }, []);
+
   const loadData = useCallback(async () => {
     try {
-      const response = await api.get('/api/admin/users');
-      const users = response.data;
-      setAllUsers(users.filter((u: Admin) => !u.isAdmin));
-      setAdmins(users.filter((u: Admin) => u.isAdmin));
+      await Promise.all([loadAdmins(), loadUsers(userSearchRef.current)]);
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
       setLoading(false);
       setRefreshing(false);
     }
-  }, []);
+  }, [loadAdmins, loadUsers]);
 
   useEffect(() => {
     loadData();
   }, [loadData]);
 
+  // Arama metni değişince aday listesini sunucudan yeniden getir
+  useEffect(() => {
+    userSearchRef.current = userSearch;
+    if (loading) return;
+    const timer = setTimeout(() => {
+      loadUsers(userSearch).catch((error) => console.error('Error searching users:', error));
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [userSearch]);
+
+  const loadMoreUsers = async () => {
+    if (!usersCursor || loadingMoreUsers) return;
+    setLoadingMoreUsers(true);
+    try {
+      await loadUsers(userSearch, usersCursor);
+    } catch (error) {
+      console.error('Error loading users:', error);
+    } finally {
+      setLoadingMoreUsers(false);
+    }
+  };
+
   const onRefresh = useCallback(() => {
     setRefreshing(true);
     loadData();
@@ -66,7 +115,7 @@ export default function AdminAdminsScreen() {
           text: 'Evet, Yönetici Yap',
           onPress: async () => {
             try {
-              await api.post(`/api/admin/users/${userId}/make-admin`);
+              await adminApi.makeAdmin(userId);
               Alert.alert('Başarılı', 'Kullanıcı yönetici yapıldı');
               loadData();
             } catch (error: any) {
@@ -94,7 +143,7 @@ export default function AdminAdminsScreen() {
           style: 'destructive',
           onPress: async () => {
             try {
-              await api.post(`/api/admin/users/${userId}/remove-admin`);
+              await adminApi.removeAdmin(userId);
               Alert.alert('Başarılı', 'Yönetici yetkisi kaldırıldı');
               loadData();
             } catch (error: any) {
@@ -218,19 +267,36 @@ export default function AdminAdminsScreen() {
 
               {showAllUsers && (
                 <View style={styles.usersList}>
-                  {allUsers.slice(0, 20).map((user) => (
+                  <View style={styles.searchContainer}>
+                    <Ionicons name="search" size={18} color="#6b7280" />
+                    <TextInput
+                      style={styles.searchInput}
+                      placeholder="İsim, şehir veya e-posta ara..."
+                      placeholderTextColor="#6b7280"
+                      value={userSearch}
+                      onChangeText={setUserSearch}
+                      autoCapitalize="none"
+                    />
+                  </View>
+                  {allUsers.map((user) => (
                     <View key={user.uid}>
                       {renderUser({ item: user })}
                     </View>
                   ))}
                   {allUsers.length === 0 && (
-                    <Text style={styles.emptyText}>Tüm kullanıcılar zaten yönetici</Text>
-                  )}
-                  {allUsers.length > 20 && (
-                    <Text style={styles.moreText}>
-                      +{allUsers.length - 20} daha fazla kullanıcı
+                    <Text style={styles.emptyText}>
+                      {userSearch ? 'Kullanıcı bulunamadı' : 'Tüm kullanıcılar zaten yönetici'}
                     </Text>
                   )}
+                  {usersCursor && (
+                    <TouchableOpacity onPress={loadMoreUsers} disabled={loadingMoreUsers}>
+                      {loadingMoreUsers ? (
+                        <ActivityIndicator color="#6366f1" style={{ marginTop: 8 }} />
+                      ) : (
+                        <Text style={styles.moreText}>Daha fazla kullanıcı yükle</Text>
+                      )}
+                    </TouchableOpacity>
+                  )}
                 </View>
               )}
             </View>
@@ -373,6 +439,21 @@ const styles = StyleSheet.create({
   usersList: {
     marginTop: 8,
   },
+  searchContainer: {
+    flexDirection: 'row',
+    alignItems: 'center',
+    backgroundColor: '#1f2937',
+    borderRadius: 12,
+    paddingHorizontal: 12,
+    height: 44,
+    gap: 8,
+    marginBottom: 8,
+  },
+  searchInput: {
+    flex: 1,
+    color: '#fff',
+    fontSize: 15,
+  },
   userCard: {
     flexDirection: 'row',
     alignItems: 'center',
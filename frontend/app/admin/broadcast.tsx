@@ -274,7 +274,8 @@ export default function BroadcastScreen() {
                 showToast.success('Zamanlandı', `Duyuru ${formatDateTime(scheduledDate)} için zamanlandı`);
               } else {
                 response = await api.post('/api/admin/broadcast', payload);
-                showToast.success('Gönderildi', `${response.data.sentCount} gruba duyuru gönderildi!`);
+                showToast.success('Gönderiliyor', `${response.data.totalGroups} gruba duyuru gönderimi başlatıldı`);
+                pollBroadcastJob(response.data.jobId);
               }
               
               // Reset form
@@ -297,6 +298,29 @@ export default function BroadcastScreen() {
     );
   };
 
+  // Arka plandaki gönderim işini tamamlanana kadar izle
+  const pollBroadcastJob = async (jobId: string) => {
+    for (let attempt = 0; attempt < 60; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      try {
+        const { data: job } = await api.get(`/api/admin/broadcast-jobs/${jobId}`);
+        if (job.status === 'completed') {
+          showToast.success('Gönderildi', `${job.sentCount} gruba duyuru gönderildi!`);
+          loadData();
+          return;
+        }
+        if (job.status === 'failed') {
+          showToast.error('Hata', 'Duyuru gönderimi başarısız oldu');
+          return;
+        }
+      } catch (error) {
+        console.error('Broadcast job poll error:', error);
+        return;
+      }
+    }
+    showToast.info('Gönderim Sürüyor', 'Duyuru hâlâ gönderiliyor; sonucu geçmiş sekmesinden takip edebilirsiniz');
+  };
+
   const handleCancelScheduled = async (broadcastId: string) => {
     Alert.alert(
       'Zamanlanmış Duyuruyu İptal Et',
@@ -47,6 +47,7 @@ interface Member {
 }
 
 interface JoinRequest {
+  id: string;
   communityId: string;
   communityName: string;
   subgroupId: string;
@@ -65,6 +66,10 @@ export default function AdminCommunitiesScreen() {
   const [communities, setCommunities] = useState<Community[]>([]);
   const [filteredCommunities, setFilteredCommunities] = useState<Community[]>([]);
   const [joinRequests, setJoinRequests] = useState<JoinRequest[]>([]);
+  const [joinRequestsCursor, setJoinRequestsCursor] = useState<string | null>(null);
+  // Kuyruktaki toplam bekleyen istek (sayfa boyutu değil)
+  const [joinRequestsTotal, setJoinRequestsTotal] = useState(0);
+  const [loadingMoreRequests, setLoadingMoreRequests] = useState(false);
   const [cities, setCities] = useState<string[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
@@ -109,12 +114,75 @@ export default function AdminCommunitiesScreen() {
   const loadJoinRequests = useCallback(async () => {
     try {
       const response = await adminApi.getAllJoinRequests();
-      setJoinRequests(response.data);
+      setJoinRequests(response.data.requests || []);
+      setJoinRequestsCursor(response.data.nextCursor || null);
+      setJoinRequestsTotal(response.data.total ?? (response.data.requests || []).length);
     } catch (error) {
       console.error('Error loading join requests:', error);
     }
   }, []);
 
+  const loadMoreJoinRequests = useCallback(async () => {
+    if (!joinRequestsCursor || loadingMoreRequests) return;
+    setLoadingMoreRequests(true);
+    try {
+      const response = await adminApi.getAllJoinRequests({ cursor: joinRequestsCursor });
+      setJoinRequests(prev => [...prev, ...(response.data.requests || [])]);
+      setJoinRequestsCursor(response.data.nextCursor || null);
+    } catch (error) {
+      console.error('Error loading join requests:', error);
+    } finally {
+      setLoadingMoreRequests(false);
+    }
+  }, [joinRequestsCursor, loadingMoreRequests]);
+
+  const handleApproveAllRequests = () => {
+    if (joinRequests.length === 0) return;
+    Alert.alert(
+      'Tümünü Onayla',
+      `Listelenen ${joinRequests.length} katılım isteğini onaylamak istediğinize emin misiniz?`,
+      [
+        { text: 'İptal', style: 'cancel' },
+        {
+          text: 'Onayla',
+          onPress: async () => {
+            try {
+              const response = await adminApi.bulkApproveJoinRequests(joinRequests.map(r => r.id));
+              Alert.alert('Başarılı', `${response.data.processed} istek onaylandı`);
+              loadJoinRequests();
+            } catch (error: any) {
+              Alert.alert('Hata', error.response?.data?.detail || 'İşlem başarısız');
+            }
+          },
+        },
+      ]
+    );
+  };
+
+  const handleRejectAllRequests = () => {
+    if (joinRequests.length === 0) return;
+    Alert.alert(
+      'Tümünü Reddet',
+      `Listelenen ${joinRequests.length} katılım isteğini reddetmek istediğinize emin misiniz?`,
+      [
+        { text: 'İptal', style: 'cancel' },
+        {
+          text: 'Reddet',
+          style: 'destructive',
+          onPress: async () => {
+            try {
+              const response = await adminApi.bulkRejectJoinRequests(joinRequests.map(r => r.id));
+              Alert.alert('Başarılı', `${response.data.processed} istek reddedildi`);
+              loadJoinRequests();
+            } catch (error: any) {
+              Alert.alert('Hata', error.response?.data?.detail || 'İşlem başarısız');
+            }
+          },
+        },
+      ]
+    );
+  };
+
   const loadCities = useCallback(async () => {
     try {
       const response = await generalApi.getCities();
@@ -534,7 +602,7 @@ export default function AdminCommunitiesScreen() {
       {/* Tabs */}
       <View style={styles.tabsContainer}>
         {renderTab('communities', 'Topluluklar', 'people', communities.length)}
-        {renderTab('requests', 'İstekler', 'time', joinRequests.length)}
+        {renderTab('requests', 'İstekler', 'time', joinRequestsTotal)}
       </View>
 
       {activeTab === 'communities' && (
@@ -566,8 +634,29 @@ export default function AdminCommunitiesScreen() {
         <FlatList
           data={joinRequests}
           renderItem={renderJoinRequest}
-          keyExtractor={(item) => `${item.subgroupId}-${item.userId}`}
+          keyExtractor={(item) => item.id || `${item.subgroupId}-${item.userId}`}
           contentContainerStyle={styles.listContent}
+          onEndReached={loadMoreJoinRequests}
+          onEndReachedThreshold={0.5}
+          ListHeaderComponent={
+            joinRequests.length > 1 ? (
+              <View style={{ flexDirection: 'row', justifyContent: 'flex-end', gap: 8, marginBottom: 12 }}>
+                <TouchableOpacity
+                  style={[styles.requestActionBtn, styles.rejectBtn]}
+                  onPress={handleRejectAllRequests}
+                >
+                  <Ionicons name="close-circle" size={20} color="#fff" />
+                </TouchableOpacity>
+                <TouchableOpacity
+                  style={[styles.requestActionBtn, styles.approveBtn]}
+                  onPress={handleApproveAllRequests}
+                >
+                  <Ionicons name="checkmark-done" size={20} color="#fff" />
+                </TouchableOpacity>
+              </View>
+            ) : null
+          }
+          ListFooterComponent={loadingMoreRequests ? <ActivityIndicator color="#6366f1" style={{ marginVertical: 16 }} /> : null}
           refreshControl={
             <RefreshControl refreshing={refreshing} onRefresh={onRefresh} tintColor="#6366f1" />
           }
@@ -14,6 +14,8 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useAuth } from '../../src/contexts/AuthContext';
 import api from '../../src/services/api';
+import { formatDistanceToNow } from 'date-fns';
+import { tr } from 'date-fns/locale';
 
 interface DashboardStats {
   totalUsers: number;
@@ -28,6 +30,7 @@ interface DashboardStats {
 
 export default function AdminDashboard() {
   const [stats, setStats] = useState<DashboardStats | null>(null);
+  const [generatedAt, setGeneratedAt] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const { userProfile } = useAuth();
@@ -37,6 +40,7 @@ export default function AdminDashboard() {
     try {
       const response = await api.get('/api/admin/dashboard');
       setStats(response.data.stats);
+      setGeneratedAt(response.data.generatedAt || null);
     } catch (error) {
       console.error('Error loading dashboard:', error);
     } finally {
@@ -190,6 +194,12 @@ export default function AdminDashboard() {
           <RefreshControl refreshing={refreshing} onRefresh={onRefresh} tintColor="#6366f1" />
         }
       >
+        {generatedAt && (
+          <Text style={styles.generatedAt}>
+            Güncellendi: {formatDistanceToNow(new Date(generatedAt + 'Z'), { addSuffix: true, locale: tr })}
+          </Text>
+        )}
+
         {/* Stats Grid */}
         <View style={styles.statsGrid}>
           <View style={styles.statCard}>
@@ -394,6 +404,12 @@ const styles = StyleSheet.create({
   menuSection: {
     padding: 16,
   },
+  generatedAt: {
+    fontSize: 12,
+    color: '#6b7280',
+    paddingHorizontal: 16,
+    paddingTop: 12,
+  },
   sectionTitle: {
     fontSize: 16,
     fontWeight: '600',
@@ -39,39 +39,47 @@ export default function AdminUsersScreen() {
   const [selectedUser, setSelectedUser] = useState<User | null>(null);
   const [modalVisible, setModalVisible] = useState(false);
   const [actionLoading, setActionLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const router = useRouter();
 
-  const loadUsers = useCallback(async () => {
+  // Sunucu tarafı arama + imleçli sayfalama
+  const loadUsers = useCallback(async (cursor?: string) => {
     try {
-      const response = await api.get('/api/admin/users');
-      setUsers(response.data);
-      setFilteredUsers(response.data);
+      const response = await api.get('/api/admin/users', {
+        params: {
+          cursor,
+          limit: 50,
+          search: searchQuery.trim() || undefined,
+          fields: 'firstName,lastName,email,city,profileImageUrl,isAdmin,isBanned,isRestricted,restrictedUntil',
+        },
+      });
+      const page: User[] = response.data?.users || [];
+      setUsers((prev) => (cursor ? [...prev, ...page] : page));
+      setNextCursor(response.data?.nextCursor || null);
     } catch (error) {
       console.error('Error loading users:', error);
     } finally {
       setLoading(false);
       setRefreshing(false);
+      setLoadingMore(false);
     }
-  }, []);
+  }, [searchQuery]);
 
   useEffect(() => {
-    loadUsers();
+    const timer = setTimeout(() => loadUsers(), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
   }, [loadUsers]);
 
   useEffect(() => {
-    if (searchQuery) {
-      const filtered = users.filter(
-        (u) =>
-          u.firstName?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          u.lastName?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          u.email?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          u.city?.toLowerCase().includes(searchQuery.toLowerCase())
-      );
-      setFilteredUsers(filtered);
-    } else {
-      setFilteredUsers(users);
-    }
-  }, [searchQuery, users]);
+    setFilteredUsers(users);
+  }, [users]);
+
+  const loadMore = useCallback(() => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    loadUsers(nextCursor);
+  }, [nextCursor, loadingMore, loadUsers]);
 
   const onRefresh = useCallback(() => {
     setRefreshing(true);
@@ -202,6 +210,9 @@ export default function AdminUsersScreen() {
         renderItem={renderUser}
         keyExtractor={(item) => item.uid}
         contentContainerStyle={styles.listContent}
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore ? <ActivityIndicator color="#6366f1" style={{ margin: 16 }} /> : null}
         refreshControl={
           <RefreshControl refreshing={refreshing} onRefresh={onRefresh} tintColor="#6366f1" />
         }
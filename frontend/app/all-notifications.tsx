@@ -27,10 +27,10 @@ interface Notification {
   id: string;
   type: string;
   title: string;
-  message: string;
+  body: string;
   data?: any;
   isRead: boolean;
-  timestamp: string;
+  createdAt: string;
 }
 
 export default function AllNotificationsScreen() {
@@ -71,9 +71,12 @@ export default function AllNotificationsScreen() {
 
   const loadNotifications = async () => {
     try {
-      const response = await api.get('/api/notifications');
-      setNotifications(response.data.notifications || []);
-      setUnreadCount(response.data.unreadCount || 0);
+      const [listResponse, countResponse] = await Promise.all([
+        api.get('/api/notifications'),
+        api.get('/api/notifications/unread-count'),
+      ]);
+      setNotifications(listResponse.data || []);
+      setUnreadCount(countResponse.data.unreadCount || 0);
     } catch (error) {
       console.error('Error loading notifications:', error);
     } finally {
@@ -183,8 +186,8 @@ export default function AllNotificationsScreen() {
       </View>
       <View style={styles.notificationContent}>
         <Text style={styles.notificationTitle}>{item.title}</Text>
-        <Text style={styles.notificationMessage} numberOfLines={2}>{item.message}</Text>
-        <Text style={styles.notificationTime}>{formatTime(item.timestamp)}</Text>
+        <Text style={styles.notificationMessage} numberOfLines={2}>{item.body}</Text>
+        <Text style={styles.notificationTime}>{formatTime(item.createdAt)}</Text>
       </View>
       {!item.isRead && <View style={styles.unreadDot} />}
     </TouchableOpacity>
@@ -330,7 +330,7 @@ export default function GroupChatScreen() {
     try {
       const [chatsRes, usersRes] = await Promise.all([
         api.get('/api/chats'),
-        api.get('/api/users'),
+        api.get('/api/users', { params: { limit: 20 } }),
       ]);
       
       const targets: {id: string, name: string, type: 'group' | 'user'}[] = [];
@@ -345,7 +345,7 @@ export default function GroupChatScreen() {
       });
       
       // Kullanıcıları ekle (henüz sohbet başlatılmamış olanlar)
-      usersRes.data?.slice(0, 20).forEach((u: any) => {
+      usersRes.data?.users?.forEach((u: any) => {
         if (!targets.find(t => t.id.includes(u.uid))) {
           targets.push({
             id: u.uid,
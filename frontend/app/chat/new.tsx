@@ -29,61 +29,72 @@ interface User {
 export default function NewChatScreen() {
   const [query, setQuery] = useState('');
   const [users, setUsers] = useState<User[]>([]);
-  const [filteredUsers, setFilteredUsers] = useState<User[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(false);
   const { user } = useAuth();
   const router = useRouter();
 
-  useEffect(() => {
-    if (user) {
-      loadUsers();
-    } else {
-      setLoading(false);
-    }
-  }, [user]);
+  // Sunucu tarafı isim/şehir araması, imleçli sayfalama
+  const fetchUsers = async (searchQuery: string, cursor?: string) => {
+    const response = await api.get('/api/users', {
+      params: {
+        limit: 50,
+        fields: 'firstName,lastName,occupation,city,profileImageUrl',
+        search: searchQuery.trim() || undefined,
+        cursor,
+      },
+    });
+    return {
+      users: (response.data?.users || []).filter((u: User) => u.uid !== user?.uid),
+      nextCursor: response.data?.nextCursor || null,
+    };
+  };
 
-  const loadUsers = async () => {
+  const loadUsers = useCallback(async (searchQuery: string) => {
     if (!user) {
       setLoading(false);
       return;
     }
     
     setError(false);
+    setLoading(true);
     try {
-      const response = await api.get('/api/users');
-      const otherUsers = response.data.filter((u: User) => u.uid !== user?.uid);
-      setUsers(otherUsers);
-      setFilteredUsers(otherUsers);
+      const page = await fetchUsers(searchQuery);
+      setUsers(page.users);
+      setNextCursor(page.nextCursor);
     } catch (err: any) {
       console.error('Error loading users:', err?.message || err);
       setError(true);
       // Hata durumunda boş liste göster
       setUsers([]);
-      setFilteredUsers([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
-  };
+  }, [user]);
 
-  const filterUsers = useCallback((searchQuery: string) => {
-    if (!searchQuery.trim()) {
-      setFilteredUsers(users);
-      return;
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchUsers(query, nextCursor);
+      setUsers((prev) => [...prev, ...page.users]);
+      setNextCursor(page.nextCursor);
+    } catch (err: any) {
+      console.error('Error loading more users:', err?.message || err);
+    } finally {
+      setLoadingMore(false);
     }
-    const filtered = users.filter((u) =>
-      `${u.firstName} ${u.lastName}`.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      u.city?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      u.occupation?.toLowerCase().includes(searchQuery.toLowerCase())
-    );
-    setFilteredUsers(filtered);
-  }, [users]);
+  };
 
-  const debouncedFilter = useCallback(debounce(filterUsers, 300), [filterUsers]);
+  const debouncedLoad = useCallback(debounce(loadUsers, 300), [loadUsers]);
 
   useEffect(() => {
-    debouncedFilter(query);
-  }, [query, debouncedFilter]);
+    debouncedLoad(query);
+    return () => debouncedLoad.cancel();
+  }, [query, debouncedLoad]);
 
   const handleSelectUser = (selectedUser: User) => {
     router.replace(`/chat/${selectedUser.uid}`);
@@ -149,17 +160,20 @@ export default function NewChatScreen() {
         <View style={styles.errorContainer}>
           <Ionicons name="cloud-offline-outline" size={64} color="#374151" />
           <Text style={styles.errorText}>Kullanıcılar yüklenemedi</Text>
-          <TouchableOpacity style={styles.retryButton} onPress={loadUsers}>
+          <TouchableOpacity style={styles.retryButton} onPress={() => loadUsers(query)}>
             <Ionicons name="refresh" size={20} color="#fff" />
             <Text style={styles.retryText}>Tekrar Dene</Text>
           </TouchableOpacity>
         </View>
       ) : (
         <FlatList
-          data={filteredUsers}
+          data={users}
           renderItem={renderUser}
           keyExtractor={(item) => item.uid}
           contentContainerStyle={styles.userList}
+          onEndReached={loadMore}
+          onEndReachedThreshold={0.5}
+          ListFooterComponent={loadingMore ? <ActivityIndicator color="#6366f1" style={{ marginVertical: 16 }} /> : null}
           ListEmptyComponent={
             <View style={styles.emptyState}>
               <Ionicons name="people-outline" size={64} color="#374151" />
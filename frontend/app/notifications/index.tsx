@@ -21,7 +21,7 @@ interface Notification {
   title: string;
   body: string;
   isRead: boolean;
-  timestamp: string;
+  createdAt: string;
   data?: any;
 }
 
@@ -112,7 +112,7 @@ export default function NotificationsScreen() {
         <View style={styles.content}>
           <Text style={styles.title}>{item.title}</Text>
           <Text style={styles.body} numberOfLines={2}>{item.body}</Text>
-          <Text style={styles.time}>{formatTime(item.timestamp)}</Text>
+          <Text style={styles.time}>{formatTime(item.createdAt)}</Text>
         </View>
         {!item.isRead && <View style={styles.unreadDot} />}
       </TouchableOpacity>
@@ -67,10 +67,9 @@ export default function PostDetailScreen() {
   const loadData = useCallback(async () => {
     try {
       // Post'u yükle
-      const postsRes = await api.get('/api/posts');
-      const foundPost = postsRes.data.find((p: Post) => p.id === postId);
-      if (foundPost) {
-        setPost(foundPost);
+      const postRes = await api.get(`/api/posts/${postId}`);
+      if (postRes.data) {
+        setPost(postRes.data);
       }
       
       // Yorumları yükle
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import {
   View,
   Text,
@@ -23,6 +23,7 @@ import SimpleVideoPlayer from '../../src/components/SimpleVideoPlayer';
 import { postApi, userListApi } from '../../src/services/api';
 import { useAuth } from '../../src/contexts/AuthContext';
 import { incrementPostCount, shouldShowRatingPrompt, requestReview } from '../../src/utils/appRating';
+import debounce from 'lodash/debounce';
 
 interface User {
   uid: string;
@@ -41,7 +42,6 @@ export default function CreatePostScreen() {
   
   // Mention state
   const [showMentionModal, setShowMentionModal] = useState(false);
-  const [users, setUsers] = useState<User[]>([]);
   const [filteredUsers, setFilteredUsers] = useState<User[]>([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [mentions, setMentions] = useState<string[]>([]);
@@ -53,19 +53,27 @@ export default function CreatePostScreen() {
   const { userProfile } = useAuth();
   const router = useRouter();
 
-  useEffect(() => {
-    loadUsers();
-  }, []);
-
-  const loadUsers = async () => {
+  // Etiketleme listesi: sunucu tarafı isim araması, yazdıkça
+  const loadUsers = useCallback(async (query: string) => {
     try {
-      const response = await userListApi.getAll();
-      setUsers(response.data || []);
-      setFilteredUsers(response.data || []);
+      const response = await userListApi.getAll({
+        limit: 30,
+        fields: 'firstName,lastName,profileImageUrl',
+        search: query.trim() || undefined,
+      });
+      setFilteredUsers(response.data?.users || []);
     } catch (error) {
       console.error('Error loading users:', error);
     }
-  };
+  }, []);
+
+  const debouncedLoad = useCallback(debounce(loadUsers, 300), [loadUsers]);
+
+  useEffect(() => {
+    if (!showMentionModal) return;
+    debouncedLoad(searchQuery);
+    return () => debouncedLoad.cancel();
+  }, [showMentionModal, searchQuery, debouncedLoad]);
 
   const pickImage = async () => {
     const { status } = await ImagePicker.requestMediaLibraryPermissionsAsync();
@@ -140,15 +148,6 @@ export default function CreatePostScreen() {
 
   const handleMentionSearch = (query: string) => {
     setSearchQuery(query);
-    if (query.trim()) {
-      const filtered = users.filter(
-        (u) =>
-          `${u.firstName} ${u.lastName}`.toLowerCase().includes(query.toLowerCase())
-      );
-      setFilteredUsers(filtered);
-    } else {
-      setFilteredUsers(users);
-    }
   };
 
   const handleSelectUser = (user: User) => {
@@ -159,7 +158,6 @@ export default function CreatePostScreen() {
     }
     setShowMentionModal(false);
     setSearchQuery('');
-    setFilteredUsers(users);
   };
 
   const removeMention = (uid: string) => {
@@ -47,12 +47,13 @@ export default function SearchScreen() {
     try {
       // Kullanıcıları ara
       if (activeTab === 'all' || activeTab === 'users') {
-        const usersRes = await userListApi.getAll();
-        const filteredUsers = usersRes.data.filter((u: any) =>
-          `${u.firstName} ${u.lastName}`.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          u.city?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          u.occupation?.toLowerCase().includes(searchQuery.toLowerCase())
-        ).slice(0, 10);
+        // Sunucu tarafı isim/şehir araması (tüm kullanıcılar içinde)
+        const usersRes = await userListApi.getAll({
+          search: searchQuery.trim(),
+          limit: 10,
+          fields: 'firstName,lastName,city,occupation,profileImageUrl',
+        });
+        const filteredUsers = usersRes.data?.users || [];
 
         filteredUsers.forEach((u: any) => {
           allResults.push({
@@ -53,11 +53,11 @@ export default function ForwardMessageModal({
     try {
       // Kullanıcıları ve grupları yükle
       const [usersRes, communitiesRes] = await Promise.all([
-        api.get('/api/users'),
+        api.get('/api/users', { params: { limit: 20, fields: 'firstName,lastName,profileImageUrl' } }),
         api.get('/api/communities'),
       ]);
 
-      const userChats: Chat[] = (usersRes.data || []).slice(0, 20).map((u: any) => ({
+      const userChats: Chat[] = (usersRes.data?.users || []).slice(0, 20).map((u: any) => ({
         id: u.uid,
         name: `${u.firstName} ${u.lastName}`,
         type: 'dm' as const,
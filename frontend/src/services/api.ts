@@ -46,7 +46,10 @@ api.interceptors.request.use(async (config) => {
 });
 
 export const postApi = {
-  getAll: (skip?: number, limit?: number) => api.get(`/api/posts?skip=${skip || 0}&limit=${limit || 20}`),
+  // İmleçli akış: { posts, nextCursor, hasMore }
+  // scope: 'all' (herkes) | 'my' (topluluklarımın akışı)
+  getAll: (cursor?: string | null, limit?: number, scope: 'all' | 'my' = 'all') =>
+    api.get('/api/posts', { params: { cursor: cursor || undefined, limit: limit || 20, scope } }),
   getOne: (id: string) => api.get(`/api/posts/${id}`),
   create: (data: any) => api.post('/api/posts', data),
   like: (id: string) => api.post(`/api/posts/${id}/like`),
@@ -64,6 +67,8 @@ export const postApi = {
 export const storyApi = {
   getAll: () => api.get('/api/stories'),
   getUserStories: (userId: string) => api.get(`/api/stories/${userId}`),
+  // Tepsi medya taşımaz; görsel / video hikaye başına
+  getMedia: (storyId: string) => api.get(`/api/stories/${storyId}/media`),
   create: (data: { imageUrl?: string; videoUrl?: string; caption?: string }) => api.post('/api/stories', data),
   view: (storyId: string) => api.post(`/api/stories/${storyId}/view`),
   delete: (storyId: string) => api.delete(`/api/stories/${storyId}`),
@@ -167,7 +172,9 @@ export const userApi = {
 };
 
 export const userListApi = {
-  getAll: () => api.get('/api/users'),
+  // İmleçli sayfa: { users, nextCursor, hasMore }
+  getAll: (params?: { cursor?: string; limit?: number; fields?: string; search?: string }) =>
+    api.get('/api/users', { params }),
   getOne: (uid: string) => api.get(`/api/users/${uid}`),
   search: (query: string) => api.get(`/api/users/search?q=${query}`),
   // Gelişmiş arama - LinkedIn tarzı
@@ -201,6 +208,7 @@ export const userListApi = {
 
 export const notificationApi = {
   getAll: () => api.get('/api/notifications'),
+  getUnreadCount: () => api.get('/api/notifications/unread-count'),
   markAsRead: (id: string) => api.put(`/api/notifications/${id}/read`),
   markAllAsRead: () => api.put('/api/notifications/read-all'),
   send: (data: any) => api.post('/api/notifications/send', data),
@@ -229,9 +237,15 @@ export const generalApi = {
 
 export const adminApi = {
   getDashboard: () => api.get('/api/admin/dashboard'),
-  getUsers: () => api.get('/api/admin/users'),
+  getUsers: (params?: { cursor?: string; limit?: number; search?: string; fields?: string; is_admin?: boolean }) =>
+    api.get('/api/admin/users', { params }),
   getCommunities: () => api.get('/api/admin/communities'),
-  getAllJoinRequests: () => api.get('/api/admin/join-requests'),
+  getAllJoinRequests: (params?: { cursor?: string; limit?: number; community_id?: string }) =>
+    api.get('/api/admin/join-requests', { params }),
+  bulkApproveJoinRequests: (requestIds: string[]) =>
+    api.post('/api/admin/join-requests/bulk-approve', { requestIds }),
+  bulkRejectJoinRequests: (requestIds: string[]) =>
+    api.post('/api/admin/join-requests/bulk-reject', { requestIds }),
   createCommunity: (data: any) => api.post('/api/admin/communities', data),
   updateCommunity: (id: string, data: any) => api.put(`/api/admin/communities/${id}`, data),
   deleteCommunity: (id: string) => api.delete(`/api/admin/communities/${id}`),
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Mesaj Gönderme Gecikme Karşılaştırması
+Message send latency benchmark: REST POST vs Socket.IO send_message (ack)
+
+Aynı alt gruba N mesaj önce REST ile, sonra açık socket bağlantısı üzerinden
+gönderilir ve p50 / p99 gecikmeleri yazdırılır.
+
+Kullanım:
+    FIREBASE_TOKEN=... SUBGROUP_ID=... python message_latency_benchmark.py [adet]
+"""
+
+import math
+import os
+import sys
+import time
+import statistics
+
+import requests
+import socketio
+
+# Backend URL from frontend .env
+BASE_URL = os.environ.get("BASE_URL", "https://android-deploy-fix.preview.emergentagent.com")
+API_URL = f"{BASE_URL}/api"
+
+TOKEN = os.environ.get("FIREBASE_TOKEN")
+SUBGROUP_ID = os.environ.get("SUBGROUP_ID")
+
+
+def percentile(values, pct):
+    """Basit yüzdelik hesabı (en yakın sıra)"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def report(label, samples):
+    print(f"📊 {label}")
+    print(f"   adet: {len(samples)}")
+    print(f"   p50 : {percentile(samples, 50):.1f} ms")
+    print(f"   p99 : {percentile(samples, 99):.1f} ms")
+    print(f"   ort : {statistics.mean(samples):.1f} ms")
+
+
+def bench_rest(count):
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    session = requests.Session()
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        response = session.post(
+            f"{API_URL}/subgroups/{SUBGROUP_ID}/messages",
+            json={"content": f"rest benchmark {i}"},
+            headers=headers,
+            timeout=10,
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            print(f"❌ REST hata: {response.status_code} {response.text[:100]}")
+            break
+    return samples
+
+
+def bench_socket(count):
+    client = socketio.Client()
+    client.connect(BASE_URL, auth={"token": TOKEN}, transports=["websocket"])
+    client.emit("join_room", {"room": SUBGROUP_ID})
+
+    samples = []
+    try:
+        for i in range(count):
+            start = time.perf_counter()
+            ack = client.call("send_message", {
+                "roomType": "subgroup",
+                "roomId": SUBGROUP_ID,
+                "content": f"socket benchmark {i}",
+            }, timeout=10)
+            samples.append((time.perf_counter() - start) * 1000)
+            if not ack or not ack.get("success"):
+                print(f"❌ Socket hata: {ack}")
+                break
+    finally:
+        client.disconnect()
+    return samples
+
+
+def main():
+    if not TOKEN or not SUBGROUP_ID:
+        print("❌ FIREBASE_TOKEN ve SUBGROUP_ID ortam değişkenleri gerekli")
+        sys.exit(1)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"🚀 {count} mesaj ile gecikme karşılaştırması - {BASE_URL}")
+
+    rest_samples = bench_rest(count)
+    socket_samples = bench_socket(count)
+
+    if rest_samples:
+        report("REST POST /subgroups/{id}/messages", rest_samples)
+    if socket_samples:
+        report("Socket.IO send_message (ack)", socket_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Reaksiyon Eşzamanlılık Testi
+Reaction concurrency test for backend/reactions.py
+
+Tek bir mesaja çok sayıda coroutine'den aynı anda reaksiyon gönderilir ve
+sayaçların (reactionCounts) kullanıcı listeleriyle tutarlı kaldığı, hiçbir
+güncellemenin kaybolmadığı doğrulanır.
+
+Geçici bir koleksiyon kullanır ve sonunda siler.
+
+Kullanım:
+    MONGO_URL=mongodb://localhost:27017/network_solution_test python reaction_concurrency_test.py [kullanıcı_sayısı]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from reactions import toggle_reaction  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017/network_solution_test")
+EMOJIS = ["👍", "❤️", "😂", "😮", "😢", "🙏"]
+
+
+def check(condition, description):
+    if condition:
+        print(f"   ✅ {description}")
+    else:
+        print(f"   ❌ {description}")
+    return condition
+
+
+def check_consistent(doc):
+    """Her emoji için sayaç == kullanıcı sayısı (kayıp veya çift sayılmış güncelleme yok)"""
+    reactions = doc.get("reactions") or {}
+    counts = doc.get("reactionCounts") or {}
+    ok = True
+    for emoji, users in reactions.items():
+        ok &= len(users) == len(set(users)) == counts.get(emoji, 0)
+    for emoji, count in counts.items():
+        ok &= count == len(reactions.get(emoji, []))
+    return ok
+
+
+async def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client.get_default_database("network_solution_test")
+    collection = db[f"reaction_concurrency_{uuid.uuid4().hex[:8]}"]
+
+    message_id = str(uuid.uuid4())
+    await collection.insert_one({"id": message_id, "reactions": {}, "reactionCounts": {}})
+    doc_filter = {"id": message_id}
+    users = [f"user_{i}" for i in range(user_count)]
+    results = []
+
+    async def load():
+        return await collection.find_one(doc_filter, {"_id": 0})
+
+    try:
+        print(f"🚀 {user_count} eşzamanlı kullanıcı - {MONGO_URL}")
+
+        print("1️⃣  Herkes aynı anda 👍 ekliyor")
+        await asyncio.gather(*[toggle_reaction(collection, doc_filter, uid, "👍") for uid in users])
+        doc = await load()
+        results.append(check(doc["reactionCounts"].get("👍") == user_count, f"👍 sayısı {user_count}"))
+        results.append(check(check_consistent(doc), "sayaçlar tutarlı"))
+
+        print("2️⃣  Herkes aynı anda ❤️'ye geçiyor")
+        await asyncio.gather(*[toggle_reaction(collection, doc_filter, uid, "❤️") for uid in users])
+        doc = await load()
+        results.append(check("👍" not in doc["reactionCounts"], "👍 tamamen kaldırıldı"))
+        results.append(check(doc["reactionCounts"].get("❤️") == user_count, f"❤️ sayısı {user_count}"))
+
+        print("3️⃣  Yarısı aynı anda ❤️'yi kaldırıyor")
+        half = users[: user_count // 2]
+        await asyncio.gather(*[toggle_reaction(collection, doc_filter, uid, "❤️") for uid in half])
+        doc = await load()
+        expected = user_count - len(half)
+        results.append(check(doc["reactionCounts"].get("❤️") == expected, f"❤️ sayısı {expected}"))
+
+        print("4️⃣  Rastgele karışık işlemler (her kullanıcı 5 kez)")
+        operations = [
+            toggle_reaction(collection, doc_filter, uid, random.choice(EMOJIS))
+            for uid in users for _ in range(5)
+        ]
+        random.shuffle(operations)
+        await asyncio.gather(*operations)
+        doc = await load()
+        results.append(check(check_consistent(doc), "sayaçlar ve kullanıcı listeleri tutarlı"))
+    finally:
+        await collection.drop()
+        client.close()
+
+    passed = sum(1 for r in results if r)
+    print(f"\n📊 {passed}/{len(results)} kontrol başarılı")
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
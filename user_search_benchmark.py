@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Kullanıcı Arama Performans Testi
+User search benchmark for backend/user_search.py
+
+Geçici bir veritabanına sentetik Türkçe kullanıcılar (varsayılan 100.000)
+yazılır, arama index'leri oluşturulur ve /users/search ile aynı aggregate
+hattı (sonuçlar + toplam + facet'ler) farklı sorgu tipleriyle çalıştırılır.
+Her senaryo için p50 / p95 gecikmesi yazdırılır.
+
+Kullanıcıların bir kısmına gerçekçi boyutta base64 profil fotoğrafı eklenir;
+boş sorgu (ilk yükleme) senaryoları bu belgelerin sıralamaya taşınmadığını ölçer.
+
+Kullanım:
+    MONGO_URL=mongodb://localhost:27017 python user_search_benchmark.py [kullanıcı_sayısı] [sorgu_sayısı]
+
+    BENCH_IMAGE_KB=60        profil fotoğrafı boyutu (KB)
+    BENCH_IMAGE_RATIO=0.5    fotoğraflı kullanıcı oranı
+"""
+
+import asyncio
+import base64
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+import user_search  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = f"user_search_benchmark_{uuid.uuid4().hex[:8]}"
+IMAGE_KB = int(os.environ.get("BENCH_IMAGE_KB", "60"))
+IMAGE_RATIO = float(os.environ.get("BENCH_IMAGE_RATIO", "0.5"))
+
+FIRST_NAMES = ["Ahmet", "Mehmet", "Ayşe", "Fatma", "İsmail", "Şule", "Çağla", "Gökhan", "Özge", "Ümit",
+               "Işıl", "Emre", "Zeynep", "Burak", "Elif", "Oğuz", "Derya", "Serkan", "Gülşen", "Kübra"]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Özdemir", "Arslan",
+              "Doğan", "Kılıç", "Aslan", "Çetin", "Kara", "Koç", "Kurt", "Özkan", "Şimşek", "Polat"]
+OCCUPATIONS = ["Yazılım Mühendisi", "Avukat", "Doktor", "Öğretmen", "Muhasebeci", "Grafik Tasarımcı",
+               "Pazarlama Uzmanı", "İnşaat Mühendisi", "Eczacı", "Girişimci", "Mimar", "Satış Müdürü"]
+SKILLS = ["Python", "React", "Satış", "Pazarlama", "Liderlik", "Excel", "Tasarım", "Muhasebe",
+          "İletişim", "Proje Yönetimi", "Java", "SEO", "Finans", "Hukuk", "Eğitim", "Girişimcilik"]
+COMPANIES = ["Türk Telekom", "Koç Holding", "Sabancı", "Turkcell", "Aselsan", "Getir", "Trendyol",
+             "Hepsiburada", "Arçelik", "Şişecam", "Garanti BBVA", "İş Bankası"]
+CITIES = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Konya", "Eskişehir", "Şanlıurfa",
+          "Muğla", "Çanakkale", "Kayseri", "Gaziantep"]
+
+PROJECTION = {"uid": 1, "firstName": 1, "lastName": 1, "occupation": 1, "city": 1, "skills": 1,
+              "profileImageUrl": 1}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def make_image():
+    # Uygulamanın yüklediği gibi data URI olarak inline base64 JPEG
+    payload = base64.b64encode(os.urandom(IMAGE_KB * 1024 * 3 // 4)).decode()
+    return f"data:image/jpeg;base64,{payload}"
+
+
+def make_user(i):
+    now = datetime.utcnow()
+    user = {
+        "uid": f"bench_{i}",
+        "firstName": random.choice(FIRST_NAMES),
+        "lastName": random.choice(LAST_NAMES),
+        "occupation": random.choice(OCCUPATIONS),
+        "city": random.choice(CITIES),
+        "skills": random.sample(SKILLS, random.randint(0, 5)),
+        "workExperience": [{"title": random.choice(OCCUPATIONS), "company": random.choice(COMPANIES)}
+                           for _ in range(random.randint(0, 3))],
+        "bio": f"{random.choice(CITIES)} merkezli {random.choice(OCCUPATIONS).lower()}",
+        "createdAt": now - timedelta(days=random.randint(0, 1000)),
+        "totalExperienceYears": random.randint(0, 30),
+        "rating": {"average": round(random.uniform(1, 5), 1)},
+    }
+    if random.random() < IMAGE_RATIO:
+        user["profileImageUrl"] = make_image()
+    user["searchIndex"] = user_search.build_search_index(user)
+    return user
+
+
+def random_prefix(word, min_len=2):
+    folded = word.split()[0]
+    return folded[:random.randint(min_len, len(folded))]
+
+
+SCENARIOS = {
+    "isim öneki (tek kelime)": lambda: dict(q=random_prefix(random.choice(FIRST_NAMES))),
+    "ad + soyad öneki": lambda: dict(q=f"{random_prefix(random.choice(FIRST_NAMES))} {random_prefix(random.choice(LAST_NAMES))}"),
+    "aksansız yazım (ozturk)": lambda: dict(q=user_search.fold_turkish(random.choice(LAST_NAMES))),
+    "meslek + şehir filtresi": lambda: dict(q=random_prefix(random.choice(OCCUPATIONS)), city=random.choice(CITIES)),
+    "beceri + şirket filtresi": lambda: dict(q=None, skills=[random.choice(SKILLS)], company=random.choice(COMPANIES)),
+    "yazım hatası (trigram)": lambda: dict(q=random.choice(LAST_NAMES)[:-1] + "x", fuzzy=True),
+    "boş sorgu (ilk yükleme)": lambda: dict(q=None),
+    "boş sorgu + isim sıralaması": lambda: dict(q=None, sort="name"),
+    "boş sorgu + puan sıralaması": lambda: dict(q=None, sort="rating"),
+}
+
+
+async def run_search(db, params):
+    fuzzy = params.pop("fuzzy", False)
+    q = params.pop("q", None)
+    sort_by = params.pop("sort", "relevance")
+    filters = user_search.build_filter_query(exclude_uid="bench_0", **params)
+    pipeline = user_search.build_search_pipeline(q, filters, sort_by, 0, 20, PROJECTION, fuzzy=fuzzy)
+    return user_search.parse_search_result(await db.users.aggregate(pipeline).to_list(1))
+
+
+async def create_index(collection, keys, **kwargs):
+    await collection.create_index(keys, **kwargs)
+
+
+async def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        print(f"🚀 {user_count} kullanıcı oluşturuluyor - {MONGO_URL}/{DB_NAME}")
+        start = time.perf_counter()
+        batch = []
+        for i in range(user_count):
+            batch.append(make_user(i))
+            if len(batch) == 5000:
+                await db.users.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await db.users.insert_many(batch, ordered=False)
+        await user_search.ensure_indexes(db, create_index)
+        print(f"   ✅ Veri + index hazır ({time.perf_counter() - start:.1f} sn)")
+
+        for name, make_params in SCENARIOS.items():
+            samples = []
+            totals = []
+            for _ in range(query_count):
+                params = make_params()
+                started = time.perf_counter()
+                result = await run_search(db, params)
+                samples.append((time.perf_counter() - started) * 1000)
+                totals.append(result["total"])
+            print(f"📊 {name}")
+            print(f"   p50: {percentile(samples, 50):.1f} ms   p95: {percentile(samples, 95):.1f} ms   "
+                  f"ort. sonuç: {sum(totals) / len(totals):.0f}")
+    finally:
+        await client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())